@@ -1,26 +1,31 @@
+import os
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-
-# Load and prepare data
-def load_data(base_path):
-    event_data = pd.read_csv(base_path + 'ufc_event_data.csv')
-    fight_data = pd.read_csv(base_path + 'ufc_fight_data.csv')
-    fighter_data = pd.read_csv(base_path + 'ufc_fighter_data.csv')
-    fight_stat_data = pd.read_csv(base_path + 'ufc_fight_stat_data.csv')
-    return event_data, fight_data, fighter_data, fight_stat_data
-
+from data_loader import load_tables
+import career_metrics
+from plot_renderer import histogram_figure, pairgrid_figure, render_figures
+from instrumentation import traced
+from stat_aggregation import aggregate_fight_stats, injury_summary as summarize_injuries
+
+# Load and prepare data; the stat table is left out when it is streamed instead
+@traced
+def load_data(base_path, preloaded=None, fight_stats=True):
+    tables = ['event', 'fight', 'fighter'] + (['fight_stat'] if fight_stats else [])
+    return load_tables(base_path, *tables, preloaded=preloaded)
+
+@traced
 def preprocess_event_data(event_data):
     event_data['event_date'] = pd.to_datetime(event_data['event_date'])
     return event_data
 
 # Calculate fight frequency for each fighter
+@traced
 def calculate_fight_frequency(fighter_data):
     fight_frequency = fighter_data.groupby('fighter_id').size().reset_index(name='fight_count')
     return fight_frequency
 
 # Analyze injury history
+@traced
 def analyze_injury_history(fight_stat_data):
     # Assuming injury history is represented by columns like knockdowns, reversals, etc.
     injury_history = fight_stat_data[['fighter_id', 'knockdowns', 'reversals']]
@@ -28,36 +33,44 @@ def analyze_injury_history(fight_stat_data):
     injury_summary = injury_history.groupby('fighter_id').sum().reset_index()
     return injury_summary
 
+# Same summary, streaming the stat table in chunks so memory does not grow with its size
+@traced
+def analyze_injury_history_streaming(base_path, chunk_size=100_000):
+    return summarize_injuries(aggregate_fight_stats(base_path, chunk_size))
+
 # Calculate fighter longevity based on total number of fights
+@traced
 def calculate_fighter_longevity(fighter_data):
-    print(fighter_data.columns)
     fighter_longevity = fighter_data.groupby('fighter_id').size().reset_index(name='fighter_longevity')
     return fighter_longevity
 
-# Explore relationship between fight frequency, injury history, and fighter longevity
-def analyze_longevity(fight_frequency, injury_summary, fighter_longevity, fighter_data):
-    # Merge fight frequency, injury summary, and fighter longevity with fighter data
+# Merge fight frequency, injury summary, and fighter longevity with fighter data
+def longevity_table(fight_frequency, injury_summary, fighter_longevity, fighter_data):
     fighter_data = pd.merge(fighter_data, fight_frequency, on='fighter_id', how='left')
     fighter_data = pd.merge(fighter_data, injury_summary, on='fighter_id', how='left')
     fighter_data = pd.merge(fighter_data, fighter_longevity, on='fighter_id', how='left')
     
     # Drop rows with missing values
-    fighter_data.dropna(inplace=True)
+    return fighter_data.dropna()
+
+# Explore relationship between fight frequency, injury history, and fighter longevity
+@traced
+def analyze_longevity(fight_frequency, injury_summary, fighter_longevity, fighter_data, figure_dir='.'):
+    fighter_data = longevity_table(fight_frequency, injury_summary, fighter_longevity, fighter_data)
     
     # Display descriptive statistics of relevant columns
     print("Descriptive Statistics:")
     print(fighter_data[['fight_count', 'knockdowns', 'fighter_longevity']].describe())
     
-    # Visualize the relationship using scatter plots or other appropriate plots
-    sns.pairplot(fighter_data[['fight_count', 'knockdowns', 'fighter_longevity']])
-    plt.savefig('pairplot.png')
-    plt.close()
-    
     # Calculate correlation matrix
     correlation_matrix = fighter_data[['fight_count', 'knockdowns', 'fighter_longevity']].corr()
     print("\nCorrelation Matrix:")
     print(correlation_matrix)
 
+    # Pair plot of the relationship; binned once the data is too large to scatter
+    return pairgrid_figure(fighter_data, ['fight_count', 'knockdowns', 'fighter_longevity'], os.path.join(figure_dir, 'pairplot.png'))
+
+@traced
 def check_data_quality(fighter_data):
     # Check for missing values
     print("Missing Values:")
@@ -68,22 +81,9 @@ def check_data_quality(fighter_data):
     constant_cols = fighter_data.columns[fighter_data.nunique() == 1]
     print(constant_cols)
 
-def calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data):
-    fight_data = pd.merge(fight_data, event_data[['event_id', 'event_date']], on='event_id', how='left')
-    fights_f1 = fight_data[['f_1', 'event_date']].rename(columns={'f_1': 'fighter_id'})
-    fights_f2 = fight_data[['f_2', 'event_date']].rename(columns={'f_2': 'fighter_id'})
-    all_fights = pd.concat([fights_f1, fights_f2])
-
-    last_fights = all_fights.groupby('fighter_id')['event_date'].max().reset_index().rename(columns={'event_date': 'event_date_last'})
-    first_fights = all_fights.groupby('fighter_id')['event_date'].min().reset_index().rename(columns={'event_date': 'event_date_first'})
-
-    fighter_data = pd.merge(fighter_data, last_fights, on='fighter_id', how='left')
-    fighter_data = pd.merge(fighter_data, first_fights, on='fighter_id', how='left')
-
-    fighter_data['fighter_dob'] = pd.to_datetime(fighter_data['fighter_dob'])
-    fighter_data['age_at_last_fight'] = (fighter_data['event_date_last'].dt.year - fighter_data['fighter_dob'].dt.year)
-    fighter_data['career_length_years'] = (fighter_data['event_date_last'] - fighter_data['event_date_first']).dt.days / 365.25
-    fighter_data['age_at_debut'] = (fighter_data['event_date_first'] - fighter_data['fighter_dob']).dt.days / 365.25
+def calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, index=None, metrics=None, state=None):
+    fighter_data = career_metrics.calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, index=index,
+                                                                          metrics=metrics, state=state)
 
     # Drop rows with missing values
     fighter_data.dropna(subset=['event_date_last', 'event_date_first', 'age_at_last_fight', 'career_length_years', 'age_at_debut'], inplace=True)
@@ -91,19 +91,27 @@ def calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data
     return fighter_data
 
 # Main function
-def main():
-    base_path = ',/data/' 
-    event_data, fight_data, fighter_data, fight_stat_data = load_data(base_path)
+@traced
+def main(base_path='./data/', preloaded=None, figure_dir='.', stream_chunk_size=None):
+    if stream_chunk_size:
+        event_data, fight_data, fighter_data = load_data(base_path, preloaded, fight_stats=False)
+        injury_summary = analyze_injury_history_streaming(base_path, stream_chunk_size)
+    else:
+        event_data, fight_data, fighter_data, fight_stat_data = load_data(base_path, preloaded)
+        injury_summary = analyze_injury_history(fight_stat_data)
     event_data = preprocess_event_data(event_data)
     fight_frequency = calculate_fight_frequency(fighter_data)
-    injury_summary = analyze_injury_history(fight_stat_data)
     fighter_longevity = calculate_fighter_longevity(fighter_data)
     
     # Calculate fighter age and career length
-    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data)
+    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, state=career_metrics.load_career_state(base_path, event_data, fight_data),
+                                                           metrics=preloaded.get('career') if preloaded else None)
     
     check_data_quality(fighter_data)
-    analyze_longevity(fight_frequency, injury_summary, fighter_longevity, fighter_data)
+    pairplot = analyze_longevity(fight_frequency, injury_summary, fighter_longevity, fighter_data, figure_dir)
+    injury_counts = histogram_figure(injury_summary['knockdowns'], os.path.join(figure_dir, 'injury_count_distribution.png'),
+                                     bins=20, title='Distribution of Knockdowns per Fighter', xlabel='Knockdowns', ylabel='Fighters')
+    render_figures([pairplot, injury_counts])
 
 if __name__ == "__main__":
     """
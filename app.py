@@ -1,71 +1,205 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from datetime import datetime
+import argparse
+import importlib
+import re
+import subprocess
+import sys
+
+import instrumentation
+from instrumentation import traced
+
+# Single entry point for the analyses. Heavy libraries (pandas, matplotlib, sklearn,
+# statsmodels) are only imported inside the subcommand that needs them, so
+# `python app.py --help` and the lighter subcommands start quickly.
+#
+#   python app.py career-length [--no-plots]
+#   python app.py eda | clustering | regression-age | regression-physical | survival
+#   python app.py all                 every analysis in one process on one loaded dataset
+#   python app.py parallel [--jobs N] [--output-dir DIR]
+#                                     the analyses concurrently on one dataset in shared memory
+#   python app.py validate            data-quality and referential-integrity report
+#   python app.py divisions [--jobs N]
+#                                     per-division analyses on the division-partitioned fighter table
+#   python app.py serve [--port N | --socket PATH]
+#                                     local HTTP query service over the derived fighter table
+#   python app.py importtime [name]   -X importtime cost of each subcommand's imports
+#   python app.py --trace trace.json [--trace-memory] [--profile-dir DIR] <subcommand>
+
+# Subcommand -> (module, function, modules its imports pull in)
+COMMANDS = {
+    'career-length': ('app', 'career_length', ['data_loader', 'career_metrics']),
+    'eda': ('EDA_fightfreq_and_injury', 'main', ['EDA_fightfreq_and_injury']),
+    'clustering': ('clustering_analysis_weight_class', 'main', ['clustering_analysis_weight_class']),
+    'regression-age': ('linear_regression_age_at_debut', 'main', ['linear_regression_age_at_debut']),
+    'regression-physical': ('linear_regression_physical_attributes_careerlength', 'main',
+                            ['linear_regression_physical_attributes_careerlength']),
+    'survival': ('survival_analysis', 'main', ['survival_analysis']),
+}
+PLOT_MODULES = ['plot_renderer']
+# Subcommands that write figures and so take a figure_dir
+FIGURE_COMMANDS = {'career-length', 'eda', 'clustering', 'regression-age'}
+HEAVY_MODULES = ['pandas', 'matplotlib.pyplot', 'sklearn', 'statsmodels.api']
 
 # Code to to find career length and age at last fight
 
-def load_data(base_path):
-    event_data = pd.read_csv(base_path + 'ufc_event_data.csv')
-    fight_data = pd.read_csv(base_path + 'ufc_fight_data.csv')
-    fighter_data = pd.read_csv(base_path + 'ufc_fighter_data.csv')
-    fight_stat_data = pd.read_csv(base_path + 'ufc_event_data.csv')
-    return event_data, fight_data, fighter_data, fight_stat_data
+@traced
+def load_data(base_path, preloaded=None):
+    from data_loader import load_tables
+    return load_tables(base_path, 'event', 'fight', 'fighter', 'fight_stat', preloaded=preloaded)
 
+@traced
 def preprocess_event_data(event_data):
     """Ensure event_date is in datetime format."""
+    import pandas as pd
     event_data['event_date'] = pd.to_datetime(event_data['event_date'])
     return event_data
 
-def calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data):
-    """Calculate age at last fight and career length by merging fight, event, and fighter data."""
-    # Merge event data with fight data to get the event dates
-    fight_data = pd.merge(fight_data, event_data[['event_id', 'event_date']], on='event_id', how='left')
-    
-    # Reshape fight data for analysis
-    fights_f1 = fight_data[['f_1', 'event_date']].rename(columns={'f_1': 'fighter_id'})
-    fights_f2 = fight_data[['f_2', 'event_date']].rename(columns={'f_2': 'fighter_id'})
-    all_fights = pd.concat([fights_f1, fights_f2])
-    
-    # Find the first and last fight dates for each fighter
-    last_fights = all_fights.groupby('fighter_id')['event_date'].max().reset_index().rename(columns={'event_date': 'event_date_last'})
-    first_fights = all_fights.groupby('fighter_id')['event_date'].min().reset_index().rename(columns={'event_date': 'event_date_first'})
-    
-    # Merge first and last fight dates with fighter data
-    fighter_data = pd.merge(fighter_data, last_fights, on='fighter_id', how='left')
-    fighter_data = pd.merge(fighter_data, first_fights, on='fighter_id', how='left')
-    
-    # Calculate the age at last fight and career length in years
-    fighter_data['fighter_dob'] = pd.to_datetime(fighter_data['fighter_dob'])
-    fighter_data['age_at_last_fight'] = (fighter_data['event_date_last'].dt.year - fighter_data['fighter_dob'].dt.year)
-    fighter_data['career_length_years'] = (fighter_data['event_date_last'] - fighter_data['event_date_first']).dt.days / 365.25
-    
-    return fighter_data
-
-
-def plot_histogram(data, column, bins=20, kde=False, title="", xlabel="", ylabel=""):
-    """Plot histogram for the specified column."""
-    sns.histplot(data=data, x=column, bins=bins, kde=kde)
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.show()
-
-def main():
-    base_path = './data/'
-    event_data, fight_data, fighter_data, fight_stat_data = load_data(base_path)
+@traced
+def career_length(base_path='./data/', preloaded=None, plots=True, figure_dir='.'):
+    """Age at last fight and career length per fighter; only pandas is needed unless plots are on."""
+    from career_metrics import calculate_fighter_age_and_career_length, load_career_state
+
+    event_data, fight_data, fighter_data, fight_stat_data = load_data(base_path, preloaded)
     event_data = preprocess_event_data(event_data)
-    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data)
-    
+    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, state=load_career_state(base_path, event_data, fight_data),
+                                                           metrics=preloaded.get('career') if preloaded else None)
+
   # Display data and plot histogram
     print("\nMissing or Incorrect Data in Final Dataset:")
     print(fighter_data[['fighter_id', 'event_date_last', 'age_at_last_fight', 'career_length_years']].isnull().sum())
     print("\nSample Data with Ages and Career Lengths at Last Fight:")
     print(fighter_data[['fighter_id', 'event_date_last', 'age_at_last_fight', 'career_length_years']].head())
-    
-    # Plotting the histogram of ages and career lengths at last fight
-    plot_histogram(fighter_data, 'age_at_last_fight', bins=20, kde=True, title='Distribution of Fighter Ages at Last Fight', xlabel='Age at Last Fight', ylabel='Frequency')
-    plot_histogram(fighter_data, 'career_length_years', bins=20, kde=True, title='Distribution of UFC Career Lengths', xlabel='Career Length (years)', ylabel='Frequency')
+
+    if plots:
+        from career_metrics import career_length_figures
+        from plot_renderer import render_figures
+
+        # Histograms of ages and career lengths at last fight, written to figure_dir
+        render_figures(career_length_figures(fighter_data, figure_dir))
+
+def run_command(name, base_path='./data/', preloaded=None, figure_dir='.', **kwargs):
+    """Import a subcommand's module on demand and run it."""
+    module_name, function_name, _ = COMMANDS[name]
+    function = getattr(importlib.import_module(module_name), function_name)
+    if name in FIGURE_COMMANDS:
+        kwargs['figure_dir'] = figure_dir
+    return function(base_path=base_path, preloaded=preloaded, **kwargs)
+
+def run_all(base_path='./data/', figure_dir='.'):
+    """Load the four tables once and run every analysis on copies of them."""
+    from data_loader import TABLES, load_tables
+
+    preloaded = dict(zip(TABLES, load_tables(base_path, *TABLES)))
+    for name in COMMANDS:
+        print(f"\n===== {name} =====")
+        # regression-age draws the same histograms as career-length; draw them once
+        kwargs = {'plots': False} if name == 'regression-age' else {}
+        run_command(name, base_path, preloaded, figure_dir=figure_dir, **kwargs)
+
+def measure_import_time(modules):
+    """
+    Import modules in a fresh interpreter under -X importtime.
+
+    Returns the total cumulative import time of the given modules in seconds, and the
+    cumulative time of each heavy library they pulled in (where it was first imported).
+    """
+    code = 'import ' + ', '.join(modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, check=True)
+    total, heavy = 0.0, {}
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)', line)
+        if not match:
+            continue
+        seconds, indent, module = int(match.group(2)) / 1e6, match.group(3), match.group(4)
+        if indent == '' and module in modules:
+            total += seconds
+        if module in HEAVY_MODULES:
+            heavy[module] = seconds
+    return total, heavy
+
+def import_time_report(names):
+    """Print the import cost of each subcommand, measured in a fresh interpreter."""
+    rows = [(name, COMMANDS[name][2] + (PLOT_MODULES if name == 'career-length' else [])) for name in names]
+    rows += [('career-length --no-plots', COMMANDS['career-length'][2]), ('app (CLI only)', ['app'])]
+    for label, modules in rows:
+        total, heavy = measure_import_time(modules)
+        print(f"{label:<26} {total:7.3f}s  " + ', '.join(f"{module} {seconds:.3f}s" for module, seconds in heavy.items()))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="UFC career-length analyses.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--figure-dir', default='.', help="directory the figures are written to")
+    parser.add_argument('--trace', metavar='PATH', help="write a JSON trace of every pipeline stage to PATH")
+    parser.add_argument('--trace-memory', action='store_true', help="with --trace, also record tracemalloc peaks")
+    parser.add_argument('--profile-dir', help="with --trace, write a cProfile dump per top-level stage here")
+    subparsers = parser.add_subparsers(dest='command')
+    career = subparsers.add_parser('career-length', help="age at last fight and career length per fighter")
+    career.add_argument('--no-plots', action='store_true', help="print the numeric output only (pandas only)")
+    eda = subparsers.add_parser('eda', help="fight frequency / injury EDA")
+    eda.add_argument('--stream-stats', type=int, metavar='CHUNK_ROWS',
+                     help="aggregate the fight stat table in chunks of this many rows instead of loading it")
+    subparsers.add_parser('clustering', help="weight-class clustering")
+    subparsers.add_parser('regression-age', help="career length ~ age at debut")
+    subparsers.add_parser('regression-physical', help="career length ~ physical attributes")
+    subparsers.add_parser('survival', help="Kaplan-Meier and Cox PH on censored career lengths")
+    subparsers.add_parser('all', help="run every analysis in one process on one loaded dataset")
+    parallel = subparsers.add_parser('parallel', help="run the analyses concurrently on one dataset in shared memory")
+    parallel.add_argument('--jobs', type=int, help="worker processes (default: one per analysis, up to the CPU count)")
+    parallel.add_argument('--output-dir', default='results', help="figures, printed output and summary.json go here")
+    validate = subparsers.add_parser('validate', help="data-quality and referential-integrity checks")
+    validate.add_argument('--json', metavar='PATH', help="also write the report to PATH")
+    validate.add_argument('--no-cache', action='store_true', help="re-run every check even if its tables are unchanged")
+    divisions = subparsers.add_parser('divisions', help="per-division analyses, one job per division")
+    divisions.add_argument('--jobs', type=int, help="worker processes (default: one per division, up to the CPU count)")
+    divisions.add_argument('--divisions', nargs='+', help="divisions to run (default: every division with enough fighters)")
+    serve = subparsers.add_parser('serve', help="local HTTP query service over the derived fighter table")
+    serve.add_argument('--port', type=int, help="TCP port on 127.0.0.1 (default 8765)")
+    serve.add_argument('--socket', help="listen on this Unix socket instead of TCP")
+    importtime = subparsers.add_parser('importtime', help="measure the import cost of each subcommand")
+    importtime.add_argument('names', nargs='*', metavar='name', help=f"subcommands to measure (default: all of {', '.join(COMMANDS)})")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        instrumentation.enable(args.trace, memory=args.trace_memory, profile_dir=args.profile_dir)
+    command = args.command or 'career-length'
+    if command == 'career-length':
+        career_length(args.base_path, plots=not getattr(args, 'no_plots', False), figure_dir=args.figure_dir)
+    elif command == 'all':
+        run_all(args.base_path, args.figure_dir)
+    elif command == 'parallel':
+        from parallel_runner import run_parallel
+
+        summary = run_parallel(args.base_path, args.output_dir, jobs=args.jobs)
+        for result in summary['analyses']:
+            print(f"{result['analysis']:<22} {result['seconds']:7.2f}s  {'failed' if result['error'] else 'ok'}")
+        print(f"Wall time {summary['wall_s']:.2f}s; output in {args.output_dir}")
+    elif command == 'validate':
+        import validation
+
+        argv = ['--base-path', args.base_path] + (['--json', args.json] if args.json else [])
+        validation.main(argv + (['--no-cache'] if args.no_cache else []))
+    elif command == 'divisions':
+        import pandas as pd
+        from division_store import run_divisions
+
+        tables, timings = run_divisions(args.base_path, divisions=args.divisions, jobs=args.jobs)
+        with pd.option_context('display.width', 200, 'display.max_columns', 20, 'display.float_format', '{:.3f}'.format):
+            for name, table in tables.items():
+                print(f"\n{name}:\n{table}")
+        print(f"\n{len(timings)} division jobs, {timings['seconds'].sum():.2f}s in total")
+    elif command == 'serve':
+        import query_service
+
+        argv = ['--base-path', args.base_path] + (['--port', str(args.port)] if args.port else [])
+        query_service.main(argv + (['--socket', args.socket] if args.socket else []))
+    elif command == 'importtime':
+        unknown = set(args.names) - set(COMMANDS)
+        if unknown:
+            parser.error(f"unknown subcommands: {', '.join(sorted(unknown))}")
+        import_time_report(args.names or list(COMMANDS))
+    elif command == 'eda':
+        run_command(command, args.base_path, figure_dir=args.figure_dir, stream_chunk_size=args.stream_stats)
+    else:
+        run_command(command, args.base_path, figure_dir=args.figure_dir)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,188 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+from career_metrics import calculate_fighter_age_and_career_length, load_career_state
+from clustering_analysis_weight_class import filter_outliers, impute_data, perform_clustering, prepare_fighter_data
+from data_loader import CACHE_DIR, TABLES, load_tables
+from EDA_fightfreq_and_injury import analyze_injury_history
+from join_index import load_join_index
+from linear_regression_age_at_debut import run_regression
+from linear_regression_physical_attributes_careerlength import prepare_data, run_regression_analysis
+from synthetic_data import ensure_dataset
+from weight_classes import fighter_divisions
+
+# Scaling benchmark for the analysis pipeline on synthetic datasets (synthetic_data.py).
+# Every stage runs on the output of the earlier ones, as the scripts do. The pipeline
+# runs twice per scale: once untraced for wall time and once under tracemalloc for
+# the peak memory each stage allocates, since tracing slows allocation-heavy code.
+# The analysis modules are imported up front so their import time is not charged
+# to the first scale. Results can be saved as JSON and compared against a baseline.
+#
+#   python benchmark_suite.py --multipliers 1 10 100 --output bench.json
+#   python benchmark_suite.py --baseline bench.json   exits 1 when a stage regressed
+
+
+def _load_data(ctx):
+    # Cold load: CSV parsing and cache build, which also drops the cached join index
+    shutil.rmtree(os.path.join(ctx['path'], CACHE_DIR), ignore_errors=True)
+    ctx['tables'] = dict(zip(TABLES, load_tables(ctx['path'], *TABLES)))
+    return len(ctx['tables']['fight'])
+
+
+def _load_data_cached(ctx):
+    ctx['tables'] = dict(zip(TABLES, load_tables(ctx['path'], *TABLES)))
+    return len(ctx['tables']['fight'])
+
+
+def _career_length(ctx):
+    # The persisted career state, as the analyses use it; the cold load dropped it, so
+    # this includes building and saving it
+    tables = ctx['tables']
+    state = load_career_state(ctx['path'], tables['event'], tables['fight'])
+    ctx['career'] = calculate_fighter_age_and_career_length(tables['fight'], tables['event'], tables['fighter'], state=state)
+    return len(ctx['career'])
+
+
+def _career_length_index(ctx):
+    tables = ctx['tables']
+    career = calculate_fighter_age_and_career_length(tables['fight'], tables['event'], tables['fighter'],
+                                                     index=load_join_index(ctx['path']))
+    return len(career)
+
+
+def _analyze_injury_history(ctx):
+    return len(analyze_injury_history(ctx['tables']['fight_stat']))
+
+
+def _impute_data(ctx):
+    tables = ctx['tables']
+    fighters = prepare_fighter_data(filter_outliers(ctx['career']))
+    fighters = fighter_divisions(fighters, tables['fight'], load_join_index(ctx['path']))
+    ctx['imputed'] = impute_data(fighters)
+    return len(ctx['imputed'])
+
+
+def _perform_clustering(ctx):
+    return len(perform_clustering(ctx['imputed'], mode=ctx['cluster_mode']))
+
+
+def _regression_age(ctx):
+    run_regression(ctx['career'])
+    return len(ctx['career'])
+
+
+def _regression_physical(ctx):
+    # The f_1-only first/last dates come from the join index, as in its main()
+    tables = ctx['tables']
+    fighters = prepare_data(tables['fighter'], tables['fight'], tables['event'], index=load_join_index(ctx['path']))
+    run_regression_analysis(fighters)
+    return len(fighters)
+
+
+STAGES = [
+    ('load_data', _load_data),
+    ('load_data (cached)', _load_data_cached),
+    ('career_length', _career_length),
+    ('career_length (join index)', _career_length_index),
+    ('analyze_injury_history', _analyze_injury_history),
+    ('impute_data', _impute_data),
+    ('perform_clustering', _perform_clustering),
+    ('regression_age', _regression_age),
+    ('regression_physical', _regression_physical),
+]
+
+
+def run_pipeline(path, trace_memory=False, cluster_mode='full'):
+    """Run every stage once; returns {stage: (seconds, peak MB or None, rows out)}."""
+    ctx = {'path': path, 'cluster_mode': cluster_mode}
+    results = {}
+    for name, stage in STAGES:
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        # The analysis functions print their summaries; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            rows = stage(ctx)
+        seconds = time.perf_counter() - start
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] / 1e6
+            tracemalloc.stop()
+        results[name] = (seconds, peak, rows)
+    return results
+
+
+def benchmark(base_path, data_root, multipliers, memory=True, cluster_mode='full', seed=0):
+    """Wall time and peak traced memory of every stage at each scale, one row per (scale, stage)."""
+    rows = []
+    for multiplier in multipliers:
+        path = os.path.join(data_root, f'x{multiplier}')
+        sizes = ensure_dataset(base_path, path, multiplier, seed)
+        timed = run_pipeline(path, cluster_mode=cluster_mode)
+        traced = run_pipeline(path, trace_memory=True, cluster_mode=cluster_mode) if memory else {}
+        for name, _ in STAGES:
+            seconds, _, out_rows = timed[name]
+            rows.append({'multiplier': multiplier, 'fighters': sizes['fighter'], 'fights': sizes['fight'],
+                         'stage': name, 'wall_s': seconds,
+                         'peak_mb': traced[name][1] if memory else float('nan'), 'rows_out': out_rows})
+    return pd.DataFrame(rows)
+
+
+def compare(results, baseline, tolerance=0.25, min_seconds=0.05):
+    """
+    Stages whose wall time or peak memory grew by more than `tolerance` over the baseline.
+
+    Stages faster than min_seconds in both runs are ignored for wall time; their timings
+    are mostly noise.
+    """
+    merged = results.merge(baseline, on=['multiplier', 'stage'], suffixes=('', '_baseline'))
+    slower = (merged['wall_s'] > merged['wall_s_baseline'] * (1 + tolerance)) & \
+             (merged[['wall_s', 'wall_s_baseline']].max(axis=1) >= min_seconds)
+    bigger = merged['peak_mb'] > merged['peak_mb_baseline'] * (1 + tolerance)
+    return merged.loc[slower | bigger, ['multiplier', 'stage', 'wall_s_baseline', 'wall_s',
+                                        'peak_mb_baseline', 'peak_mb']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic datasets of growing size.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--data-root', default='./data/synthetic/', help="synthetic datasets live in <data-root>/x<multiplier>/")
+    parser.add_argument('--multipliers', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--cluster-mode', choices=['full', 'minibatch'], default='full')
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    results = benchmark(args.base_path, args.data_root, args.multipliers, memory=not args.no_memory,
+                        cluster_mode=args.cluster_mode)
+    print(results.to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+    print(f"\nProcess peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3:.0f} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results.to_dict(orient='records'), f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = pd.DataFrame(json.load(f))
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions):
+            print(f"\nRegressions beyond {args.tolerance:.0%} of the baseline:")
+            print(regressions.to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+            sys.exit(1)
+        print(f"\nNo stage regressed beyond {args.tolerance:.0%} of the baseline.")
+
+
+if __name__ == "__main__":
+    main()
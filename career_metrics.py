@@ -0,0 +1,328 @@
+import argparse
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, load_tables, table_fingerprint
+from instrumentation import traced
+
+# Career dates per fighter (first fight, last fight, fight count), either recomputed
+# from the whole fight history or kept as a persisted state that is updated from
+# newly appended events only. event_id is monotonically increasing, so the highest
+# event_id already folded into the state works as a watermark. The state is saved
+# with the fingerprints of the event and fight CSVs and a digest of the fight history
+# it was built from: unchanged sources reuse it as-is, an append (the history up to
+# the watermark is unchanged) folds in only the new events, and any other edit
+# rebuilds it. The analyses pass state=load_career_state(base_path, ...).
+
+METRIC_COLUMNS = ['event_date_first', 'event_date_last', 'fight_count',
+                  'age_at_last_fight', 'career_length_years', 'age_at_debut']
+
+# Columns calculate_fighter_age_and_career_length adds, in the order it adds them
+DERIVED_COLUMNS = ['event_date_last', 'event_date_first', 'age_at_last_fight', 'career_length_years', 'age_at_debut']
+
+STATE_FILE = 'career_state.npz'
+STATE_TABLES = ('event', 'fight')
+
+
+@traced
+def calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, index=None, metrics=None, state=None):
+    """
+    Calculate age at last fight, age at debut and career length from the full fight history.
+
+    When a CareerState is given (see load_career_state), the first/last fight dates are
+    looked up from it. When a join_index.JoinIndex is given, they are read from its
+    fighter -> fights adjacency instead of merging and grouping the fight table. When
+    metrics (the derived columns indexed by fighter_id, e.g. computed once and shared
+    by parallel_runner) is given, the columns are looked up from it instead.
+    """
+    if metrics is not None:
+        found = metrics.reindex(fighter_data['fighter_id'].to_numpy(dtype='float64', na_value=np.nan))
+        fighter_data = fighter_data.copy()
+        fighter_data['fighter_dob'] = pd.to_datetime(fighter_data['fighter_dob'])
+        for col in DERIVED_COLUMNS:
+            fighter_data[col] = found[col].to_numpy()
+        return fighter_data
+
+    if state is not None:
+        return apply_career_metrics(fighter_data, state)
+
+    if index is not None:
+        first, last = index.first_last_dates(fighter_data['fighter_id'])
+        fighter_data = fighter_data.copy()
+        fighter_data['event_date_last'] = last
+        fighter_data['event_date_first'] = first
+        return add_age_columns(fighter_data)
+
+    # Merge event data with fight data to get the event dates
+    fight_data = pd.merge(fight_data, event_data[['event_id', 'event_date']], on='event_id', how='left')
+
+    # Reshape fight data for analysis
+    fights_f1 = fight_data[['f_1', 'event_date']].rename(columns={'f_1': 'fighter_id'})
+    fights_f2 = fight_data[['f_2', 'event_date']].rename(columns={'f_2': 'fighter_id'})
+    all_fights = pd.concat([fights_f1, fights_f2])
+
+    # Find the first and last fight dates for each fighter
+    last_fights = all_fights.groupby('fighter_id')['event_date'].max().reset_index().rename(columns={'event_date': 'event_date_last'})
+    first_fights = all_fights.groupby('fighter_id')['event_date'].min().reset_index().rename(columns={'event_date': 'event_date_first'})
+
+    # Merge first and last fight dates with fighter data
+    fighter_data = pd.merge(fighter_data, last_fights, on='fighter_id', how='left')
+    fighter_data = pd.merge(fighter_data, first_fights, on='fighter_id', how='left')
+
+    return add_age_columns(fighter_data)
+
+
+def add_age_columns(fighter_data):
+    """Derive age at last fight, career length and age at debut from the first/last fight dates."""
+    fighter_data['event_date_last'] = pd.to_datetime(fighter_data['event_date_last'])
+    fighter_data['event_date_first'] = pd.to_datetime(fighter_data['event_date_first'])
+    fighter_data['fighter_dob'] = pd.to_datetime(fighter_data['fighter_dob'])
+    fighter_data['age_at_last_fight'] = (fighter_data['event_date_last'].dt.year - fighter_data['fighter_dob'].dt.year)
+    fighter_data['career_length_years'] = (fighter_data['event_date_last'] - fighter_data['event_date_first']).dt.days / 365.25
+    fighter_data['age_at_debut'] = (fighter_data['event_date_first'] - fighter_data['fighter_dob']).dt.days / 365.25
+    return fighter_data
+
+
+def career_length_figures(fighter_data, figure_dir='.'):
+    """Figure specs of the age-at-last-fight and career-length histograms (shared by app and the age regression)."""
+    from plot_renderer import histogram_figure
+
+    return [
+        histogram_figure(fighter_data['age_at_last_fight'], os.path.join(figure_dir, 'age_at_last_fight_distribution.png'), bins=20, kde=True, title='Distribution of Fighter Ages at Last Fight', xlabel='Age at Last Fight', ylabel='Frequency'),
+        histogram_figure(fighter_data['career_length_years'], os.path.join(figure_dir, 'career_length_distribution.png'), bins=20, kde=True, title='Distribution of UFC Career Lengths', xlabel='Career Length (years)', ylabel='Frequency'),
+    ]
+
+
+def _fight_appearances(fight_data, event_data):
+    """Flatten f_1/f_2 into one (fighter_id, event_date) pair per fighter per fight."""
+    event_dates = event_data.set_index('event_id')['event_date']
+    dates = pd.to_datetime(fight_data['event_id'].map(event_dates)).to_numpy(dtype='datetime64[ns]')
+    ids = np.concatenate([fight_data['f_1'].to_numpy(dtype='float64', na_value=np.nan),
+                          fight_data['f_2'].to_numpy(dtype='float64', na_value=np.nan)])
+    dates = np.concatenate([dates, dates])
+    known = ~np.isnan(ids)
+    return ids[known].astype(np.int64), dates[known]
+
+
+class CareerState:
+    """
+    Per-fighter first/last fight dates and fight counts, sorted by fighter_id.
+
+    Parameters:
+        fighter_id (np.ndarray): Sorted int64 fighter IDs.
+        first_date, last_date (np.ndarray): datetime64[ns] first and last fight dates.
+        fight_count (np.ndarray): int64 number of fights seen per fighter.
+        watermark (int): Highest event_id already folded into the state.
+        fingerprint (dict): Source CSV hashes the state was last brought up to date with.
+        history (str): history_digest of the fights up to the watermark.
+    """
+
+    def __init__(self, fighter_id, first_date, last_date, fight_count, watermark, fingerprint=None, history=''):
+        self.fighter_id = fighter_id
+        self.first_date = first_date
+        self.last_date = last_date
+        self.fight_count = fight_count
+        self.watermark = watermark
+        self.fingerprint = fingerprint or {}
+        self.history = history
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty(0, dtype=np.int64), np.empty(0, dtype='datetime64[ns]'),
+                   np.empty(0, dtype='datetime64[ns]'), np.empty(0, dtype=np.int64), -1)
+
+    @classmethod
+    def build(cls, fight_data, event_data):
+        """Build the state from the full fight history."""
+        state = cls.empty()
+        state.update(fight_data, event_data)
+        return state
+
+    def update(self, fight_data, event_data):
+        """
+        Fold in fights from events above the watermark.
+
+        Only the new fights are grouped, and existing fighters are located with a
+        binary search and updated in place: O(new fights * log fighters). Debuting
+        fighters are inserted in one np.insert per array, which copies the state, so an
+        update with any debut also costs O(fighters) (a single pass, not one per debut).
+        Returns the number of new fights processed.
+        """
+        new_fights = fight_data[fight_data['event_id'] > self.watermark]
+        if new_fights.empty:
+            return 0
+
+        ids, dates = _fight_appearances(new_fights, event_data)
+        ids, inverse = np.unique(ids, return_inverse=True)
+        first = np.full(len(ids), np.datetime64('NaT'), dtype='datetime64[ns]')
+        last = first.copy()
+        np.fmin.at(first, inverse, dates)
+        np.fmax.at(last, inverse, dates)
+        count = np.bincount(inverse, minlength=len(ids))
+
+        pos = np.searchsorted(self.fighter_id, ids)
+        found = pos < len(self.fighter_id)
+        found[found] = self.fighter_id[pos[found]] == ids[found]
+
+        # Fighters already in the state
+        old = pos[found]
+        self.first_date[old] = np.fmin(self.first_date[old], first[found])
+        self.last_date[old] = np.fmax(self.last_date[old], last[found])
+        self.fight_count[old] += count[found]
+
+        # Debuting fighters, inserted at their sorted positions
+        new = ~found
+        if new.any():
+            self.fighter_id = np.insert(self.fighter_id, pos[new], ids[new])
+            self.first_date = np.insert(self.first_date, pos[new], first[new])
+            self.last_date = np.insert(self.last_date, pos[new], last[new])
+            self.fight_count = np.insert(self.fight_count, pos[new], count[new])
+
+        self.watermark = max(self.watermark, int(new_fights['event_id'].max()))
+        return len(new_fights)
+
+    def covers(self, fight_data, event_data):
+        """
+        Whether the fights up to the watermark are still the ones the state was built from.
+
+        Guards the append path against the source being rewritten: a changed event
+        date, a corrected fighter ID or a removed fight in the history changes the digest.
+        """
+        return self.history == history_digest(fight_data, event_data, self.watermark)
+
+    def lookup(self, fighter_ids):
+        """(first, last) fight date per fighter_id, NaT for fighters without fights."""
+        ids = np.asarray(fighter_ids, dtype='float64')
+        known = ~np.isnan(ids)
+        ids = np.where(known, ids, -1).astype(np.int64)
+        pos = np.minimum(np.searchsorted(self.fighter_id, ids), max(len(self.fighter_id) - 1, 0))
+        found = known & (len(self.fighter_id) > 0)
+        found[found] = self.fighter_id[pos[found]] == ids[found]
+        first = np.full(len(ids), np.datetime64('NaT'), dtype='datetime64[ns]')
+        last = first.copy()
+        first[found], last[found] = self.first_date[pos[found]], self.last_date[pos[found]]
+        return first, last
+
+    def to_frame(self):
+        return pd.DataFrame({
+            'fighter_id': pd.array(self.fighter_id, dtype='Int32'),
+            'event_date_first': self.first_date,
+            'event_date_last': self.last_date,
+            'fight_count': self.fight_count,
+        })
+
+    def save(self, path):
+        # Written to a temporary file and renamed over the old one, so a concurrent
+        # reader sees either the previous state or the new one, never a partial zip
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, fighter_id=self.fighter_id, first_date=self.first_date, last_date=self.last_date,
+                     fight_count=self.fight_count, watermark=np.int64(self.watermark),
+                     fingerprint=np.str_(json.dumps(self.fingerprint, sort_keys=True)), history=np.str_(self.history))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f['fighter_id'], f['first_date'], f['last_date'], f['fight_count'], int(f['watermark']),
+                       json.loads(str(f['fingerprint'])), str(f['history']))
+
+
+def history_digest(fight_data, event_data, watermark):
+    """SHA-256 of the (fighter_id, event_date) appearances of every fight up to the watermark."""
+    ids, dates = _fight_appearances(fight_data[fight_data['event_id'] <= watermark], event_data)
+    digest = hashlib.sha256(ids.tobytes())
+    digest.update(dates.view(np.int64).tobytes())
+    return digest.hexdigest()
+
+
+def apply_career_metrics(fighter_data, state):
+    """Look up the career dates from the state and derive the age and career-length columns."""
+    first, last = state.lookup(fighter_data['fighter_id'].to_numpy(dtype='float64', na_value=np.nan))
+    fighter_data = fighter_data.copy()
+    fighter_data['event_date_last'] = last
+    fighter_data['event_date_first'] = first
+    return add_age_columns(fighter_data)
+
+
+def update_career_state(base_path, state_path=None, event_data=None, fight_data=None):
+    """
+    Load the persisted state (or build it), fold in any new events and save it back.
+
+    Pass event_data and fight_data when they are already loaded. When the source
+    CSVs are unchanged the saved state is returned as-is; when they changed only by
+    new events (the fights up to the watermark are the same) those are folded in;
+    any other change rebuilds the state.
+    """
+    state_path = state_path or os.path.join(base_path, CACHE_DIR, STATE_FILE)
+    fingerprint = {table: table_fingerprint(base_path, table) for table in STATE_TABLES}
+    try:
+        state = CareerState.load(state_path)
+    except (OSError, ValueError, KeyError):
+        state = None
+    if state is not None and state.fingerprint == fingerprint:
+        return state, 0
+
+    if event_data is None or fight_data is None:
+        event_data, fight_data = load_tables(base_path, *STATE_TABLES)
+    if state is not None and state.covers(fight_data, event_data):
+        processed = state.update(fight_data, event_data)
+    else:
+        state = CareerState.build(fight_data, event_data)
+        processed = len(fight_data)
+    state.fingerprint = fingerprint
+    state.history = history_digest(fight_data, event_data, state.watermark)
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    state.save(state_path)
+    return state, processed
+
+
+def load_career_state(base_path, event_data=None, fight_data=None):
+    """The persisted career state brought up to date with the source (see update_career_state)."""
+    return update_career_state(base_path, event_data=event_data, fight_data=fight_data)[0]
+
+
+def verify_career_state(state, fight_data, event_data, fighter_data):
+    """
+    Diff the incremental result against a full rebuild.
+
+    Returns the fighter rows whose derived metrics differ (empty when they match).
+    """
+    full = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data.copy())
+    incremental = apply_career_metrics(fighter_data.copy(), state)
+
+    compared = ['event_date_first', 'event_date_last', 'age_at_last_fight', 'career_length_years', 'age_at_debut']
+    mismatch = np.zeros(len(full), dtype=bool)
+    for col in compared:
+        a, b = full[col], incremental[col]
+        if col.startswith('event_date'):
+            a, b = a.astype('datetime64[ns]'), b.astype('datetime64[ns]')
+        mismatch |= ~((a == b).fillna(False).to_numpy(dtype=bool) | (a.isna() & b.isna()).to_numpy())
+    return incremental.loc[mismatch, ['fighter_id'] + compared]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the incremental fighter career-metrics state.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--verify', action='store_true', help="diff the incremental result against a full rebuild")
+    args = parser.parse_args()
+
+    state, processed = update_career_state(args.base_path)
+    print(f"Processed {processed} new fights, watermark event_id={state.watermark}, fighters={len(state.fighter_id)}")
+
+    if args.verify:
+        event_data, fight_data, fighter_data = load_tables(args.base_path, 'event', 'fight', 'fighter')
+        diff = verify_career_state(state, fight_data, event_data, fighter_data)
+        if diff.empty:
+            print("Incremental state matches the full rebuild.")
+        else:
+            print(f"{len(diff)} fighters differ from the full rebuild:")
+            print(diff)
+
+
+if __name__ == "__main__":
+    main()
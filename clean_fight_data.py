@@ -0,0 +1,109 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import load_table
+
+# Cleaning stage for ufc_fight_data: produces cleaned_ufc_fight_data.csv (and a typed
+# Parquet copy when pyarrow is installed). All parsing uses vectorized string ops.
+
+ROUND_SECONDS = 300
+RAW_COLUMNS = ['fight_id', 'event_id', 'referee', 'f_1', 'f_2', 'winner', 'num_rounds', 'title_fight',
+               'weight_class', 'gender', 'result', 'result_details', 'finish_round', 'finish_time']
+
+
+def parse_time_seconds(times):
+    """Convert 'M:SS' strings to integer seconds (missing or malformed values become <NA>)."""
+    # Times repeat heavily (a few thousand distinct values), so only the distinct ones are parsed
+    codes, uniques = pd.factorize(times)
+    parts = pd.Series(uniques, dtype='string').str.strip().str.extract(r'^(\d+):(\d{1,2})$')
+    parsed = (pd.to_numeric(parts[0], errors='coerce') * 60 + pd.to_numeric(parts[1], errors='coerce'))
+    # Missing times have code -1, which picks the trailing NaN
+    values = np.append(parsed.to_numpy(dtype='float64', na_value=np.nan), np.nan)[codes]
+    return pd.Series(values, index=times.index).astype('Int64')
+
+
+def normalize_result_details(details):
+    """Collapse the multi-line padding in result_details (e.g. 'to\\n      Leg Injury') into a categorical."""
+    details = details.astype('string').str.replace(r'\s+', ' ', regex=True).str.strip()
+    return details.replace('', pd.NA).astype('category')
+
+
+def clean_fight_data(fight_data):
+    """
+    Build the cleaned fight table.
+
+    Rows with any missing raw field are dropped (as in the original
+    cleaned_ufc_fight_data.csv), then the time, round and result columns are typed.
+    """
+    fights = fight_data[RAW_COLUMNS].dropna().copy()
+
+    fights['num_rounds'] = pd.to_numeric(fights['num_rounds'], errors='coerce').astype('Int64')  # 'N' = no limit
+    fights['title_fight'] = fights['title_fight'].astype('string').eq('T').astype(bool)
+    fights['result_details'] = normalize_result_details(fights['result_details'])
+    for col in ['referee', 'weight_class', 'gender', 'result']:
+        fights[col] = fights[col].astype('category')
+
+    finish_round = fights['finish_round'].astype('Int64')
+    fights['finish_time_seconds'] = parse_time_seconds(fights['finish_time'])
+    fights['fight_seconds'] = (finish_round - 1) * ROUND_SECONDS + fights['finish_time_seconds']
+    fights['scheduled_seconds'] = fights['num_rounds'] * ROUND_SECONDS
+    return fights.reset_index(drop=True)
+
+
+def write_cleaned_fight_data(fights, output_path):
+    """Write the cleaned table as CSV, plus a typed Parquet copy when pyarrow is available."""
+    fights.to_csv(output_path, index=False)
+    try:
+        fights.to_parquet(os.path.splitext(output_path)[0] + '.parquet', index=False)
+    except ImportError:
+        pass
+
+
+def synthetic_fights(fight_data, multiplier, seed=0):
+    """Tile the raw fight table `multiplier` times with fresh fight_ids and random finish times."""
+    rng = np.random.default_rng(seed)
+    fights = pd.concat([fight_data] * multiplier, ignore_index=True)
+    fights['fight_id'] = np.arange(1, len(fights) + 1)
+    minutes = rng.integers(0, 5, len(fights))
+    seconds = rng.integers(0, 60, len(fights))
+    fights['finish_time'] = pd.Series(minutes).astype(str) + ':' + pd.Series(seconds).astype(str).str.zfill(2)
+    return fights
+
+
+def benchmark_clean(fight_data, multipliers=(1, 10, 100)):
+    """Time clean_fight_data on tiled copies of the fight table and report rows/sec."""
+    rows = []
+    for multiplier in multipliers:
+        fights = synthetic_fights(fight_data, multiplier)
+        start = time.perf_counter()
+        clean_fight_data(fights)
+        elapsed = time.perf_counter() - start
+        rows.append({'multiplier': multiplier, 'rows': len(fights), 'seconds': elapsed,
+                     'rows_per_sec': len(fights) / elapsed})
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build cleaned_ufc_fight_data.csv from data/ufc_fight_data.csv.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--output', default='cleaned_ufc_fight_data.csv')
+    parser.add_argument('--benchmark', action='store_true', help="report cleaning throughput at 1x/10x/100x rows")
+    args = parser.parse_args()
+
+    fight_data = load_table(args.base_path, 'fight')
+    fights = clean_fight_data(fight_data)
+    write_cleaned_fight_data(fights, args.output)
+    print(f"Wrote {len(fights)} cleaned fights to {args.output}")
+    print(fights.dtypes)
+
+    if args.benchmark:
+        print("\nCleaning throughput:")
+        print(benchmark_clean(fight_data))
+
+
+if __name__ == "__main__":
+    main()
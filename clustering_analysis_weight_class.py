@@ -1,106 +1,81 @@
+import os
 import pandas as pd
 import numpy as np
 from sklearn.cluster import KMeans
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.impute import KNNImputer
-
-def load_data(base_path):
-    event_data = pd.read_csv(base_path + 'ufc_event_data.csv')
-    fight_data = pd.read_csv(base_path + 'ufc_fight_data.csv')
-    fighter_data = pd.read_csv(base_path + 'ufc_fighter_data.csv')
-    return event_data, fight_data, fighter_data
-
-def visualize_clusters(df):
+from data_loader import load_tables
+from career_metrics import calculate_fighter_age_and_career_length, load_career_state
+import clustering_engine
+from imputation import FeatureImputer, IMPUTE_COLUMNS
+from plot_renderer import render_figures, scatter_figure
+from instrumentation import traced
+from join_index import load_join_index
+from weight_classes import fighter_divisions, prepare_fighter_data
+
+@traced
+def load_data(base_path, preloaded=None):
+    return load_tables(base_path, 'event', 'fight', 'fighter', preloaded=preloaded)
+
+@traced
+def visualize_clusters(df, path='fighter_clusters.png'):
     """
-    Visualize clustering results using a scatter plot.
+    Write the clustering results to disk as a scatter plot.
     
     Parameters:
         df (pd.DataFrame): DataFrame that includes 'fighter_weight_lbs', 'career_length_years', and 'cluster' columns.
+        path (str): Output image; above plot_renderer.MAX_POINTS fighters a sample stratified by cluster is drawn.
     """
-    plt.figure(figsize=(10, 6))
-    plt.scatter(df['fighter_weight_lbs'], df['career_length_years'], c=df['cluster'], cmap='viridis', alpha=0.6, edgecolors='w', linewidth=0.5)
-    plt.title('Clustering of UFC Fighters by Weight and Career Length')
-    plt.xlabel('Fighter Weight (lbs)')
-    plt.ylabel('Career Length (Years)')
-    plt.colorbar(label='Cluster')
-    plt.grid(True, linestyle='--', alpha=0.6)
-    plt.show()
-
-def prepare_fighter_data(fighter_data):
-    fighter_data['fighter_weight_class'] = fighter_data['fighter_weight_lbs'].apply(assign_weight_class)
-    return fighter_data
-
-def assign_weight_class(weight):
-    # Define UFC weight classes
-    if weight <= 125:
-        return 'Flyweight'
-    elif weight <= 135:
-        return 'Bantamweight'
-    elif weight <= 145:
-        return 'Featherweight'
-    elif weight <= 155:
-        return 'Lightweight'
-    elif weight <= 170:
-        return 'Welterweight'
-    elif weight <= 185:
-        return 'Middleweight'
-    elif weight <= 205:
-        return 'Light Heavyweight'
-    elif weight <= 265:
-        return 'Heavyweight'
-    else:
-        return 'Super Heavyweight'  # Above 265 lbs
-
-def calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data):
-    # Merge fight data with event dates
-    fight_data = pd.merge(fight_data, event_data[['event_id', 'event_date']], on='event_id', how='left')
-    fights_f1 = fight_data[['f_1', 'event_date']].rename(columns={'f_1': 'fighter_id'})
-    fights_f2 = fight_data[['f_2', 'event_date']].rename(columns={'f_2': 'fighter_id'})
-    all_fights = pd.concat([fights_f1, fights_f2])
-
-    # Calculate last and first fight dates
-    last_fights = all_fights.groupby('fighter_id')['event_date'].max().reset_index().rename(columns={'event_date': 'event_date_last'})
-    first_fights = all_fights.groupby('fighter_id')['event_date'].min().reset_index().rename(columns={'event_date': 'event_date_first'})
-
-    # Merge dates back to fighter data
-    fighter_data = pd.merge(fighter_data, last_fights, on='fighter_id', how='left')
-    fighter_data = pd.merge(fighter_data, first_fights, on='fighter_id', how='left')
-
-    # Ensure datetime format
-    fighter_data['event_date_last'] = pd.to_datetime(fighter_data['event_date_last'])
-    fighter_data['event_date_first'] = pd.to_datetime(fighter_data['event_date_first'])
-    fighter_data['fighter_dob'] = pd.to_datetime(fighter_data['fighter_dob'])
-
-    # Calculate age at last fight and career length
-    fighter_data['age_at_last_fight'] = fighter_data['event_date_last'].dt.year - fighter_data['fighter_dob'].dt.year
-    fighter_data['career_length_years'] = (fighter_data['event_date_last'] - fighter_data['event_date_first']).dt.days / 365.25
-    fighter_data['age_at_debut'] = (fighter_data['event_date_first'] - fighter_data['fighter_dob']).dt.days / 365.25
+    render_figures([scatter_figure(df['fighter_weight_lbs'], df['career_length_years'], df['cluster'], path,
+                                   title='Clustering of UFC Fighters by Weight and Career Length',
+                                   xlabel='Fighter Weight (lbs)', ylabel='Career Length (Years)', colorbar='Cluster')])
 
-    return fighter_data
+@traced
+def perform_clustering(fighter_data, n_clusters=8, mode='full', chunk_size=1000, model_path=None):
+    """
+    Cluster fighters by weight, career length and primary division.
 
-def perform_clustering(fighter_data):
+    Parameters:
+        fighter_data (pd.DataFrame): Imputed fighter data with 'primary_division' (weight_classes.fighter_divisions).
+        n_clusters (int): Number of clusters.
+        mode (str): 'full' fits KMeans on the whole frame; 'minibatch' streams the fighters
+            through MiniBatchKMeans.partial_fit in chunks of chunk_size.
+        model_path (str, optional): In 'minibatch' mode, a cached model at this path is used
+            to assign clusters with predict(); otherwise the fitted model is saved there.
+    """
     # Ensure no NaN values exist in the features to be used
-    if fighter_data.isnull().any().any():
+    if fighter_data[['fighter_weight_lbs', 'career_length_years']].isnull().any().any():
         print("NaN values detected, applying imputation again...")
         fighter_data = impute_data(fighter_data)
 
-    # Prepare data for clustering
-    fighter_data = pd.get_dummies(fighter_data, columns=['fighter_weight_class'], drop_first=True)
-    feature_columns = ['fighter_weight_lbs', 'career_length_years'] + [col for col in fighter_data.columns if 'fighter_weight_class_' in col]
+    if mode == 'minibatch':
+        X = clustering_engine.clustering_matrix(fighter_data)
+        if np.isnan(X).any():
+            raise Exception("NaN values are still present in the data after attempted imputation.")
+        model = clustering_engine.load_model(model_path) if model_path else None
+        if model is None or model.n_clusters != n_clusters:
+            model = clustering_engine.fit_streaming(clustering_engine.iter_chunks(X, chunk_size), n_clusters=n_clusters)
+            if model_path:
+                clustering_engine.save_model(model, model_path)
+        fighter_data = fighter_data.copy()
+        fighter_data['cluster'] = model.predict(X)
+    else:
+        # Prepare data for clustering: the same features as the streaming mode
+        X = clustering_engine.clustering_matrix(fighter_data)
+
+        # Check if still any NaN exists
+        if np.isnan(X).any():
+            raise Exception("NaN values are still present in the data after attempted imputation.")
 
-    # Check if still any NaN exists
-    if fighter_data[feature_columns].isnull().any().any():
-        raise Exception("NaN values are still present in the data after attempted imputation.")
+        # Proceed with clustering
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42)
+        fighter_data = fighter_data.copy()
+        fighter_data['cluster'] = kmeans.fit_predict(X)
 
-    # Proceed with clustering
-    kmeans = KMeans(n_clusters=8, random_state=42)
-    fighter_data['cluster'] = kmeans.fit_predict(fighter_data[feature_columns])
     cluster_summary = fighter_data.groupby('cluster')[['fighter_weight_lbs', 'career_length_years']].agg(['mean', 'count'])
     print(cluster_summary)
 
     return fighter_data
 
+@traced
 def filter_outliers(fighter_data):
     # Calculate the mean and standard deviation
     mean_weight = fighter_data['fighter_weight_lbs'].mean()
@@ -111,22 +86,30 @@ def filter_outliers(fighter_data):
                                  (fighter_data['fighter_weight_lbs'] >= mean_weight - 3 * std_weight)]
     return filtered_data
 
-def impute_data(fighter_data):
-    imputer = KNNImputer(n_neighbors=5)
-    numeric_columns = fighter_data.select_dtypes(include=[np.number]).columns
-    fighter_data[numeric_columns] = imputer.fit_transform(fighter_data[numeric_columns])
-    return fighter_data
+@traced
+def impute_data(fighter_data, imputer=None):
+    """
+    Impute the physical and career features from same-weight-class neighbours.
+
+    Pass a fitted imputation.FeatureImputer to reuse its donors and cached rows, so only
+    new or changed fighters are imputed again.
+    """
+    if imputer is None:
+        imputer = FeatureImputer(IMPUTE_COLUMNS, n_neighbors=5).fit(fighter_data)
+    return imputer.transform(fighter_data)
 
 
-def main():
-    base_path = './data/'
-    event_data, fight_data, fighter_data = load_data(base_path)
+@traced
+def main(base_path='./data/', preloaded=None, figure_dir='.'):
+    event_data, fight_data, fighter_data = load_data(base_path, preloaded)
     fighter_data = filter_outliers(fighter_data)
     fighter_data = prepare_fighter_data(fighter_data)
-    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data)
+    fighter_data = fighter_divisions(fighter_data, fight_data, load_join_index(base_path))
+    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, state=load_career_state(base_path, event_data, fight_data),
+                                                           metrics=preloaded.get('career') if preloaded else None)
     fighter_data = impute_data(fighter_data)  # Ensure this is done last before clustering
     fighter_data = perform_clustering(fighter_data)
-    visualize_clusters(fighter_data)  # Add this line to visualize the results
+    visualize_clusters(fighter_data, os.path.join(figure_dir, 'fighter_clusters.png'))
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,152 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+
+from weight_classes import DIVISIONS
+
+# Scalable clustering for the weight/career-length fighter clusters: a streaming
+# MiniBatchKMeans fit over fighter chunks, a process-parallel k-sweep, and a cached
+# model so fighters added later are assigned with predict() instead of a refit.
+
+# The division is the fighter's primary division from fight history
+# (weight_classes.fighter_divisions), so fighters who moved are clustered where they
+# fought rather than by their listed weight. The divisions are fixed categories
+# (weight_classes.DIVISIONS) so the one-hot columns stay identical across chunks and
+# runs; a fighter outside them (no divisional bout and a listed weight that is missing
+# or above Heavyweight) has all-zero dummies, like the first division.
+BASE_FEATURES = ['fighter_weight_lbs', 'career_length_years']
+DIVISION_COLUMN = 'primary_division'
+FEATURE_COLUMNS = BASE_FEATURES + [f'{DIVISION_COLUMN}_{name}' for name in DIVISIONS[1:]]
+# Bumped when the features change, so cached models fit on the old ones are refit
+MODEL_VERSION = 2
+
+
+def clustering_matrix(fighter_data):
+    """Weight, career length and drop-first primary-division dummies as a float64 matrix."""
+    division = pd.Categorical(fighter_data[DIVISION_COLUMN], categories=DIVISIONS)
+    dummies = pd.get_dummies(division, prefix=DIVISION_COLUMN, drop_first=True)
+    base = fighter_data[BASE_FEATURES].to_numpy(dtype='float64')
+    return np.hstack([base, dummies.to_numpy(dtype='float64')])
+
+
+def iter_chunks(X, chunk_size):
+    for start in range(0, len(X), chunk_size):
+        yield X[start:start + chunk_size]
+
+
+def fit_streaming(chunks, n_clusters=8, batch_size=1024, random_state=42):
+    """Fit MiniBatchKMeans with partial_fit over an iterable of feature-matrix chunks."""
+    model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=random_state, n_init=3)
+    pending = []
+    for chunk in chunks:
+        # The first partial_fit call needs at least n_clusters rows
+        if not hasattr(model, 'cluster_centers_'):
+            pending.append(chunk)
+            chunk = np.vstack(pending)
+            if len(chunk) < n_clusters:
+                continue
+            pending = []
+        model.partial_fit(chunk)
+    return model
+
+
+def _evaluate_k(args):
+    """Fit one k and score it; module-level so the process pool can pickle it."""
+    X, k, mode, sample_size, random_state = args
+    start = time.perf_counter()
+    if mode == 'full':
+        model = KMeans(n_clusters=k, random_state=random_state, n_init=10).fit(X)
+    else:
+        model = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3).fit(X)
+    labels = model.labels_
+    silhouette = np.nan
+    if len(np.unique(labels)) > 1:
+        silhouette = silhouette_score(X, labels, sample_size=min(sample_size, len(X)), random_state=random_state)
+    return {'k': k, 'inertia': model.inertia_, 'silhouette': silhouette, 'fit_s': time.perf_counter() - start}
+
+
+def k_sweep(X, k_values=range(2, 21), mode='minibatch', n_jobs=None, sample_size=2000, random_state=42):
+    """
+    Fit every k in k_values across a process pool.
+
+    Parameters:
+        X (np.ndarray): Feature matrix from clustering_matrix.
+        mode (str): 'minibatch' (MiniBatchKMeans) or 'full' (KMeans).
+        n_jobs (int, optional): Worker processes, defaults to the CPU count.
+        sample_size (int): Rows sampled for each silhouette score.
+
+    Returns:
+        pd.DataFrame: inertia, sampled silhouette and fit time per k.
+    """
+    tasks = [(X, k, mode, sample_size, random_state) for k in k_values]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        results = list(pool.map(_evaluate_k, tasks))
+    return pd.DataFrame(results).set_index('k')
+
+
+def save_model(model, path):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    joblib.dump({'model': model, 'version': MODEL_VERSION, 'feature_columns': FEATURE_COLUMNS}, path)
+
+
+def load_model(path):
+    """Load a cached model, or return None when it is missing or was fit on other features."""
+    if not os.path.exists(path):
+        return None
+    cached = joblib.load(path)
+    if cached.get('version') != MODEL_VERSION or cached.get('feature_columns') != FEATURE_COLUMNS:
+        return None
+    return cached['model']
+
+
+def assign_clusters(fighter_data, model):
+    """Assign fighters to the cached centroids without refitting."""
+    return model.predict(clustering_matrix(fighter_data))
+
+
+def main():
+    from clustering_analysis_weight_class import (calculate_fighter_age_and_career_length, filter_outliers,
+                                                  impute_data, load_data, prepare_fighter_data)
+    from career_metrics import load_career_state
+    from join_index import load_join_index
+    from weight_classes import fighter_divisions
+
+    parser = argparse.ArgumentParser(description="Sweep k for the fighter clustering and cache the chosen model.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--k-min', type=int, default=2)
+    parser.add_argument('--k-max', type=int, default=20)
+    parser.add_argument('--mode', choices=['minibatch', 'full'], default='minibatch')
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--n-clusters', type=int, default=8, help="k used for the cached streaming model")
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    event_data, fight_data, fighter_data = load_data(args.base_path)
+    fighter_data = filter_outliers(fighter_data)
+    fighter_data = prepare_fighter_data(fighter_data)
+    fighter_data = fighter_divisions(fighter_data, fight_data, load_join_index(args.base_path))
+    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data,
+                                                           state=load_career_state(args.base_path, event_data, fight_data))
+    fighter_data = impute_data(fighter_data)
+    X = clustering_matrix(fighter_data)
+
+    start = time.perf_counter()
+    sweep = k_sweep(X, range(args.k_min, args.k_max + 1), mode=args.mode, n_jobs=args.jobs)
+    print(f"k-sweep ({args.mode}, {args.jobs or os.cpu_count()} workers) in {time.perf_counter() - start:.2f}s")
+    print(sweep)
+
+    model = fit_streaming(iter_chunks(X, args.chunk_size), n_clusters=args.n_clusters)
+    model_path = os.path.join(args.base_path, '.cache', 'cluster_model.joblib')
+    save_model(model, model_path)
+    print(f"\nCached {args.n_clusters}-cluster streaming model to {model_path}")
+
+
+if __name__ == "__main__":
+    main()
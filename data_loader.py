@@ -0,0 +1,293 @@
+import hashlib
+import json
+import os
+import time
+
+import pandas as pd
+
+# Shared loader for the four ufcstats CSVs. Each CSV is parsed once into a typed
+# columnar cache under <base_path>/.cache/ and re-read from there on later runs.
+
+TABLES = {
+    'event': 'ufc_event_data.csv',
+    'fight': 'ufc_fight_data.csv',
+    'fighter': 'ufc_fighter_data.csv',
+    'fight_stat': 'ufc_fight_stat_data.csv',
+}
+
+# Columns parsed as dates when the cache is built
+DATE_COLUMNS = {
+    'event': ['event_date'],
+    'fight': [],
+    'fighter': ['fighter_dob'],
+    'fight_stat': [],
+}
+
+# Compact dtype schema applied when a table is parsed: int32 IDs (nullable Int32 where
+# the raw CSV has gaps, e.g. f_1 written as 2976.0), categoricals for low-cardinality
+# text and float32/int16 for counting stats
+STAT_DTYPE = 'float32'
+SCHEMA = {
+    'event': {
+        'event_id': 'int32',
+        'event_city': 'category',
+        'event_state': 'category',
+        'event_country': 'category',
+    },
+    'fight': {
+        'fight_id': 'int32',
+        'event_id': 'int32',
+        'f_1': 'Int32',
+        'f_2': 'Int32',
+        'winner': 'Int32',
+        'referee': 'category',
+        'num_rounds': 'category',
+        'title_fight': 'category',
+        'weight_class': 'category',
+        'gender': 'category',
+        'result': 'category',
+        'result_details': 'category',
+        'finish_round': 'Int8',
+    },
+    'fighter': {
+        'fighter_id': 'int32',
+        'fighter_height_cm': 'float32',
+        'fighter_weight_lbs': 'float32',
+        'fighter_reach_cm': 'float32',
+        'fighter_stance': 'category',
+        'fighter_w': 'int16',
+        'fighter_l': 'int16',
+        'fighter_d': 'int16',
+        'fighter_nc_dq': 'float32',
+    },
+    'fight_stat': {
+        'fight_stat_id': 'int32',
+        'fight_id': 'int32',
+        'fighter_id': 'Int32',
+        'knockdowns': STAT_DTYPE,
+        'total_strikes_att': STAT_DTYPE,
+        'total_strikes_succ': STAT_DTYPE,
+        'sig_strikes_att': STAT_DTYPE,
+        'sig_strikes_succ': STAT_DTYPE,
+        'takedown_att': STAT_DTYPE,
+        'takedown_succ': STAT_DTYPE,
+        'submission_att': STAT_DTYPE,
+        'reversals': STAT_DTYPE,
+    },
+}
+
+# URL columns are not used by any analysis and dominate the string memory
+DROP_COLUMNS = {
+    'event': ['event_url'],
+    'fight': ['fight_url'],
+    'fighter': ['fighter_url'],
+    'fight_stat': ['fight_url'],
+}
+
+CACHE_DIR = '.cache'
+CACHE_VERSION = 4
+# Parquet row groups are the unit chunked readers decode, so keep them small
+ROW_GROUP_SIZE = 100_000
+
+
+def cache_format():
+    """Use Parquet when pyarrow is available, otherwise fall back to pickle."""
+    try:
+        import pyarrow  # noqa: F401
+        return 'parquet'
+    except ImportError:
+        return 'pickle'
+
+
+def _file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(base_path, table):
+    cache_dir = os.path.join(base_path, CACHE_DIR)
+    fmt = cache_format()
+    return cache_dir, os.path.join(cache_dir, f'{table}.{fmt}'), os.path.join(cache_dir, f'{table}.json')
+
+
+def compact_table(df, table):
+    """Drop the URL columns, parse dates and apply the compact dtype schema."""
+    df = df.drop(columns=[col for col in DROP_COLUMNS[table] if col in df.columns])
+    for col in DATE_COLUMNS[table]:
+        df[col] = pd.to_datetime(df[col], errors='coerce')
+    return df.astype({col: dtype for col, dtype in SCHEMA[table].items() if col in df.columns})
+
+
+def read_csv_typed(base_path, table):
+    """Parse a source CSV and apply the compact schema."""
+    return compact_table(pd.read_csv(os.path.join(base_path, TABLES[table])), table)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def write_cache(df, data_path):
+    """Write a frame as Parquet or pickle, chosen by the extension of data_path (see cache_format)."""
+    if data_path.endswith('.parquet'):
+        df.to_parquet(data_path, index=False, row_group_size=ROW_GROUP_SIZE)
+    else:
+        df.to_pickle(data_path)
+
+
+def read_cache(data_path):
+    """Read a frame written by write_cache."""
+    if data_path.endswith('.parquet'):
+        return pd.read_parquet(data_path)
+    return pd.read_pickle(data_path)
+
+
+def cache_is_fresh(base_path, table):
+    """
+    Check whether the cached copy of a table still matches its source CSV.
+
+    Size and mtime are compared first; when they differ the file hash decides, so
+    touching a CSV without changing it does not force a rebuild.
+    """
+    csv_path = os.path.join(base_path, TABLES[table])
+    _, data_path, meta_path = _cache_paths(base_path, table)
+    meta = _read_meta(meta_path)
+    if meta is None or meta.get('version') != CACHE_VERSION or not os.path.exists(data_path):
+        return False
+
+    stat = os.stat(csv_path)
+    if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        return True
+    if meta['size'] != stat.st_size or meta['sha256'] != _file_hash(csv_path):
+        return False
+
+    # Content unchanged, only the mtime moved
+    meta['mtime_ns'] = stat.st_mtime_ns
+    _write_meta(meta_path, meta)
+    return True
+
+
+def build_cache(base_path, table):
+    """Parse a source CSV and write its typed cache and fingerprint."""
+    csv_path = os.path.join(base_path, TABLES[table])
+    cache_dir, data_path, meta_path = _cache_paths(base_path, table)
+    # Parse first, so a mistyped base_path fails without leaving a cache directory behind
+    df = read_csv_typed(base_path, table)
+    os.makedirs(cache_dir, exist_ok=True)
+    write_cache(df, data_path)
+    stat = os.stat(csv_path)
+    _write_meta(meta_path, {
+        'version': CACHE_VERSION,
+        'source': TABLES[table],
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': _file_hash(csv_path),
+        'rows': len(df),
+    })
+    return df
+
+
+def load_table(base_path, table, use_cache=True):
+    """Load one table, rebuilding its cache if the source CSV changed."""
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}', expected one of {sorted(TABLES)}")
+    if not use_cache:
+        return read_csv_typed(base_path, table)
+    if cache_is_fresh(base_path, table):
+        return read_cache(_cache_paths(base_path, table)[1])
+    return build_cache(base_path, table)
+
+
+def load_tables(base_path, *tables, use_cache=True, preloaded=None):
+    """
+    Load several tables in the given order, e.g. load_tables(path, 'event', 'fight').
+
+    Tables found in the preloaded dict are returned as copies instead of being read
+    again, so several analyses can share one loaded dataset. The copies are shallow:
+    with Copy-on-Write (always on from pandas 3) a write to a copy never reaches the
+    shared table, and tables attached from shared memory stay zero-copy.
+    """
+    preloaded = preloaded or {}
+    return tuple(preloaded[table].copy(deep=False) if table in preloaded else load_table(base_path, table, use_cache=use_cache)
+                 for table in tables)
+
+
+def fresh_parquet_cache(base_path, table):
+    """Path of the table's Parquet cache when it is up to date, else None (stale, missing or pickle)."""
+    if cache_format() != 'parquet' or not cache_is_fresh(base_path, table):
+        return None
+    return _cache_paths(base_path, table)[1]
+
+
+def table_fingerprint(base_path, table):
+    """Content hash of a table's source CSV, taken from its cache metadata (building it if stale)."""
+    if not cache_is_fresh(base_path, table):
+        build_cache(base_path, table)
+    return _read_meta(_cache_paths(base_path, table)[2])['sha256']
+
+
+def benchmark_load(base_path, repeat=5):
+    """Compare raw CSV parsing against reading the typed cache for every table."""
+    # Make sure every cache exists before timing the warm path
+    load_tables(base_path, *TABLES)
+
+    results = {}
+    for table in TABLES:
+        csv_times, cache_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            read_csv_typed(base_path, table)
+            csv_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            load_table(base_path, table)
+            cache_times.append(time.perf_counter() - start)
+        results[table] = {'csv_s': min(csv_times), 'cache_s': min(cache_times)}
+
+    return pd.DataFrame(results).T.assign(speedup=lambda df: df['csv_s'] / df['cache_s'])
+
+
+def memory_report(base_path):
+    """Per-table memory_usage(deep=True) of the default read_csv frame against the compact one."""
+    rows = {}
+    for table, filename in TABLES.items():
+        raw = pd.read_csv(os.path.join(base_path, filename))
+        compact = load_table(base_path, table)
+        rows[table] = {
+            'rows': len(raw),
+            'raw_mb': raw.memory_usage(deep=True).sum() / 1e6,
+            'compact_mb': compact.memory_usage(deep=True).sum() / 1e6,
+        }
+    report = pd.DataFrame(rows).T
+    report.loc['total'] = report.sum()
+    report['ratio'] = report['compact_mb'] / report['raw_mb']
+    return report
+
+
+def main():
+    base_path = './data/'
+    print("Memory usage (deep):")
+    print(memory_report(base_path))
+    print()
+
+    results = benchmark_load(base_path)
+    print(f"Cache format: {cache_format()}")
+    print(results)
+    print("\nTotal:")
+    print(results[['csv_s', 'cache_s']].sum())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from career_metrics import DERIVED_COLUMNS, calculate_fighter_age_and_career_length, load_career_state
+from data_loader import CACHE_DIR, cache_format, load_tables, read_cache, table_fingerprint, write_cache
+from imputation import IMPUTE_COLUMNS
+from instrumentation import traced
+from join_index import load_join_index
+from stat_aggregation import aggregate_fight_stats, injury_summary
+from weight_classes import fighter_divisions, prepare_fighter_data
+
+# The derived fighter table (career columns, weight class, divisions from fight
+# history, and knockdown counts for the EDA) stored partitioned by primary division:
+# one Parquet file per division under .cache/fighters_by_division/, next to a
+# meta.json with the source CSV fingerprints, so it is rebuilt only when the data
+# changes. The analyses are those of the app.py scripts (EDA, clustering and both
+# regressions), each run on one division's partition read with only the columns it
+# uses, and the divisions run as separate jobs in a process pool:
+#
+#   python division_store.py [--analyses summary clustering] [--divisions Lightweight] [--jobs 4]
+
+STORE_DIR = 'fighters_by_division'
+STORE_VERSION = 3
+SOURCE_TABLES = ('event', 'fight', 'fighter')
+# The knockdown counts come from the streamed stat table, so it is fingerprinted too
+FINGERPRINT_TABLES = SOURCE_TABLES + ('fight_stat',)
+PARTITION_COLUMN = 'primary_division'
+UNKNOWN = 'Unknown'
+MIN_FIGHTERS = 10
+# Clusters within one division; the whole-roster clustering uses 8, about one per division
+DIVISION_CLUSTERS = 3
+
+
+def division_slug(division):
+    return str(division).lower().replace("'", '').replace(' ', '_')
+
+
+@traced
+def build_fighter_table(base_path):
+    """Fighter data with the career columns, the weight class, the fight-history divisions and knockdown counts."""
+    event_data, fight_data, fighter_data = load_tables(base_path, *SOURCE_TABLES)
+    index = load_join_index(base_path)
+    fighters = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data,
+                                                       state=load_career_state(base_path, event_data, fight_data))
+    fighters = fighter_divisions(prepare_fighter_data(fighters), fight_data, index)
+    fighters[PARTITION_COLUMN] = fighters[PARTITION_COLUMN].fillna(UNKNOWN)
+    # The EDA's injury summary; missing for fighters without stat rows
+    knockdowns = injury_summary(aggregate_fight_stats(base_path)).set_index('fighter_id')['knockdowns']
+    fighters['knockdowns'] = fighters['fighter_id'].map(knockdowns)
+    return fighters
+
+
+class DivisionStore:
+    """
+    A fighter table saved as one file per division.
+
+    Parameters:
+        path (str): Store directory.
+        partitions (dict): division -> {'file', 'rows'}.
+        fingerprint (dict): Source CSV hashes the table was built from.
+    """
+
+    def __init__(self, path, partitions, fingerprint=None):
+        self.path = path
+        self.partitions = partitions
+        self.fingerprint = fingerprint or {}
+
+    @classmethod
+    def write(cls, fighters, path, fingerprint=None):
+        os.makedirs(path, exist_ok=True)
+        partitions = {}
+        for division, part in fighters.groupby(PARTITION_COLUMN, sort=True):
+            filename = f'{division_slug(division)}.{cache_format()}'
+            write_cache(part.reset_index(drop=True), os.path.join(path, filename))
+            partitions[division] = {'file': filename, 'rows': len(part)}
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'version': STORE_VERSION, 'fingerprint': fingerprint or {}, 'partitions': partitions}, f, indent=2)
+        return cls(path, partitions, fingerprint)
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Division store at {path} has version {meta.get('version')}, expected {STORE_VERSION}")
+        missing = [p['file'] for p in meta['partitions'].values() if not os.path.exists(os.path.join(path, p['file']))]
+        if missing:
+            raise OSError(f"Division store at {path} is missing {', '.join(missing)}")
+        return cls(path, meta['partitions'], meta['fingerprint'])
+
+    @property
+    def divisions(self):
+        """Division names, largest partition first."""
+        return sorted(self.partitions, key=lambda division: -self.partitions[division]['rows'])
+
+    def read(self, division, columns=None):
+        """One division's fighters; with a Parquet store only the requested columns are decoded."""
+        if division not in self.partitions:
+            raise KeyError(f"unknown division '{division}'; the store has {', '.join(self.divisions)}")
+        data_path = os.path.join(self.path, self.partitions[division]['file'])
+        if columns is not None and data_path.endswith('.parquet'):
+            return pd.read_parquet(data_path, columns=list(columns))
+        data = read_cache(data_path)
+        return data if columns is None else data[list(columns)]
+
+    def read_all(self, columns=None):
+        return pd.concat([self.read(division, columns) for division in self.divisions], ignore_index=True)
+
+
+@traced
+def load_division_store(base_path, store_path=None):
+    """Open the partitioned fighter table, rebuilding it when any source CSV has changed."""
+    store_path = store_path or os.path.join(base_path, CACHE_DIR, STORE_DIR)
+    fingerprint = {table: table_fingerprint(base_path, table) for table in FINGERPRINT_TABLES}
+    try:
+        store = DivisionStore.open(store_path)
+        if store.fingerprint == fingerprint:
+            return store
+    except (OSError, ValueError, KeyError):
+        pass
+    return DivisionStore.write(build_fighter_table(base_path), store_path, fingerprint)
+
+
+def division_summary(fighters):
+    """Size, career-length and age figures of one division, and how many fighters moved into it."""
+    fights = fighters[['fighter_w', 'fighter_l', 'fighter_d']].astype('float64').sum(axis=1)
+    career = fighters['career_length_years'].astype('float64')
+    return {
+        'fighters': len(fighters),
+        'with_fights': int(fighters['event_date_last'].notna().sum()),
+        'multi_division': int((fighters['divisions_fought'] > 1).sum()),
+        'mean_career_years': career.mean(),
+        'median_career_years': career.median(),
+        'mean_age_at_debut': fighters['age_at_debut'].astype('float64').mean(),
+        'mean_age_at_last_fight': fighters['age_at_last_fight'].astype('float64').mean(),
+        'median_fights_per_year': (fights / career.where(career > 0)).median(),
+    }
+
+
+def _fit_row(fit, coefficients):
+    # Tiny divisions can have fewer rows than coefficients; their fit statistics are NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        row = {'n': int(fit.nobs), 'r2': fit.rsquared, 'adj_r2': fit.rsquared_adj}
+    for col in coefficients:
+        row[f'coef_{col}'], row[f'p_{col}'] = fit.params.get(col, np.nan), fit.pvalues.get(col, np.nan)
+    return row
+
+
+def division_regression_age(fighters):
+    """linear_regression_age_at_debut's OLS of career length on age at debut, within one division."""
+    from linear_regression_age_at_debut import fit_regression
+
+    if fighters[['age_at_debut', 'career_length_years']].dropna().empty:
+        return {'n': 0}
+    return _fit_row(fit_regression(fighters), ['age_at_debut'])
+
+
+def division_regression_physical(fighters):
+    """
+    linear_regression_physical_attributes_careerlength's OLS of career length on height,
+    reach, weight and stance, within one division. The career length is the stored one
+    (first to last fight in either corner), not the script's f_1-only dates.
+    """
+    from linear_regression_physical_attributes_careerlength import encode_stance, fit_regression_analysis
+
+    predictors = ['fighter_height_cm', 'fighter_reach_cm', 'fighter_weight_lbs']
+    # The script mean-fills missing values, which cannot fill a column missing throughout
+    if fighters[predictors + ['career_length_years']].isna().all().any():
+        return {'n': 0}
+    # Dummies only for the stances fought in this division, so the design stays full rank
+    fighters = fighters.assign(fighter_stance=fighters['fighter_stance'].astype(object))
+    return _fit_row(fit_regression_analysis(encode_stance(fighters)), predictors)
+
+
+def division_clustering(fighters, n_clusters=DIVISION_CLUSTERS):
+    """
+    clustering_analysis_weight_class within one division: outlier filter, imputation and
+    KMeans; cluster sizes and mean career lengths, shortest first.
+    """
+    from clustering_analysis_weight_class import filter_outliers, impute_data, perform_clustering
+
+    fighters = filter_outliers(fighters)
+    try:
+        fighters = impute_data(fighters)
+    except ValueError:
+        # Too few complete rows to draw imputation donors from
+        return {'n': len(fighters)}
+    row = {'n': len(fighters)}
+    if len(fighters) < n_clusters:
+        return row
+    labels = perform_clustering(fighters, n_clusters=n_clusters)['cluster'].to_numpy()
+    career = fighters['career_length_years'].to_numpy(dtype='float64')
+    sizes = np.bincount(labels, minlength=n_clusters)
+    careers = np.bincount(labels, weights=career, minlength=n_clusters) / np.maximum(sizes, 1)
+    for rank, cluster in enumerate(np.argsort(careers)):
+        row[f'cluster_{rank}_size'], row[f'cluster_{rank}_career_years'] = int(sizes[cluster]), careers[cluster]
+    return row
+
+
+def division_eda(fighters):
+    """
+    EDA_fightfreq_and_injury's longevity table within one division (the stored knockdowns
+    as its injury summary): means and correlations of fight_count, knockdowns and
+    fighter_longevity.
+    """
+    from EDA_fightfreq_and_injury import calculate_fight_frequency, calculate_fighter_longevity, longevity_table
+
+    table = longevity_table(calculate_fight_frequency(fighters), fighters[['fighter_id', 'knockdowns']],
+                            calculate_fighter_longevity(fighters), fighters.drop(columns='knockdowns'))
+    columns = ['fight_count', 'knockdowns', 'fighter_longevity']
+    values = table[columns].astype('float64')
+    row = {'n': len(table)}
+    row.update({f'mean_{col}': value for col, value in values.mean().items()})
+    # The EDA's fight_count and fighter_longevity are constant, so their correlations are NaN
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = values.corr()
+    for i, a in enumerate(columns):
+        for b in columns[i + 1:]:
+            row[f'corr_{a}_{b}'] = corr.loc[a, b]
+    return row
+
+
+# Analysis -> (function of one division's fighters, the columns it reads)
+DIVISION_ANALYSES = {
+    'summary': (division_summary, ['fighter_w', 'fighter_l', 'fighter_d', 'career_length_years', 'event_date_last',
+                                   'divisions_fought', 'age_at_debut', 'age_at_last_fight']),
+    'eda': (division_eda, ['fighter_id', 'knockdowns'] + DERIVED_COLUMNS),
+    'regression-age': (division_regression_age, ['age_at_debut', 'career_length_years']),
+    'regression-physical': (division_regression_physical, ['fighter_height_cm', 'fighter_reach_cm', 'fighter_weight_lbs',
+                                                           'fighter_stance', 'career_length_years']),
+    'clustering': (division_clustering, ['fighter_id', 'fighter_weight_class', PARTITION_COLUMN] + IMPUTE_COLUMNS),
+}
+
+
+def _run_division(store_path, division, analyses):
+    """One division job: read its partition once (the columns its analyses need) and run them."""
+    start = time.perf_counter()
+    columns = sorted({col for name in analyses for col in DIVISION_ANALYSES[name][1]})
+    fighters = DivisionStore.open(store_path).read(division, columns)
+    # The analysis functions print their summaries; the results come back as the tables
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = {name: DIVISION_ANALYSES[name][0](fighters) for name in analyses}
+    return division, results, {'division': division, 'rows': len(fighters), 'pid': os.getpid(),
+                               'seconds': time.perf_counter() - start}
+
+
+def run_divisions(base_path='./data/', analyses=None, divisions=None, jobs=None, min_fighters=MIN_FIGHTERS):
+    """
+    Run per-division analyses as one job per division.
+
+    Parameters:
+        analyses (list): Names from DIVISION_ANALYSES, default all.
+        divisions (list): Divisions to run, default every one with at least min_fighters
+            (fighters without a weight or a divisional fight, UNKNOWN, are left out).
+        jobs (int): Worker processes; 1 runs the jobs in this process.
+
+    Returns:
+        (dict, pd.DataFrame): analysis -> results indexed by division, and per-job timings.
+    """
+    analyses = analyses or list(DIVISION_ANALYSES)
+    store = load_division_store(base_path)
+    divisions = divisions or [d for d in store.divisions if d != UNKNOWN and store.partitions[d]['rows'] >= min_fighters]
+    if jobs == 1:
+        outputs = [_run_division(store.path, division, analyses) for division in divisions]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs or min(len(divisions), os.cpu_count())) as pool:
+            outputs = list(pool.map(_run_division, [store.path] * len(divisions), divisions, [analyses] * len(divisions)))
+
+    tables = {name: pd.DataFrame.from_dict({division: results[name] for division, results, _ in outputs}, orient='index')
+              for name in analyses}
+    for table in tables.values():
+        table.index.name = 'division'
+    return tables, pd.DataFrame([timing for _, _, timing in outputs]).set_index('division')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-division analyses on the division-partitioned fighter table.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--analyses', nargs='+', choices=list(DIVISION_ANALYSES), default=list(DIVISION_ANALYSES))
+    parser.add_argument('--divisions', nargs='+', help=f"default: every division with at least {MIN_FIGHTERS} fighters")
+    parser.add_argument('--jobs', type=int, help="worker processes (default: one per division, up to the CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    store = load_division_store(args.base_path)
+    print(f"Division store with {len(store.partitions)} partitions ready in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    tables, timings = run_divisions(args.base_path, args.analyses, args.divisions, args.jobs)
+    wall = time.perf_counter() - start
+    with pd.option_context('display.width', 200, 'display.max_columns', 20, 'display.float_format', '{:.3f}'.format):
+        for name, table in tables.items():
+            print(f"\n{name}:")
+            print(table)
+    print(f"\n{len(timings)} division jobs in {wall:.2f}s (jobs sum to {timings['seconds'].sum():.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from clean_fight_data import parse_time_seconds
+from data_loader import load_tables
+
+# Point-in-time fighter features: for every fight, each corner's totals from
+# ufc_fight_stat_data over the fights that happened strictly before that event.
+# Everything is computed from one sorted cumulative sum per stat column, so the
+# build is a sort plus a few array gathers regardless of history length.
+
+STAT_COLUMNS = ['knockdowns', 'total_strikes_att', 'total_strikes_succ', 'sig_strikes_att',
+                'sig_strikes_succ', 'takedown_att', 'takedown_succ', 'submission_att',
+                'reversals', 'ctrl_time_seconds']
+
+
+def _fighter_timeline(fight_data, event_data, fight_stat_data):
+    """One row per fighter per fight, sorted by fighter and date, with that fight's stats."""
+    event_dates = event_data.set_index('event_id')['event_date']
+    fight_dates = pd.to_datetime(fight_data['event_id'].map(event_dates))
+
+    appearances = pd.DataFrame({
+        'fight_id': np.concatenate([fight_data['fight_id'].to_numpy(), fight_data['fight_id'].to_numpy()]),
+        'fighter_id': np.concatenate([fight_data['f_1'].to_numpy(dtype='float64', na_value=np.nan),
+                                      fight_data['f_2'].to_numpy(dtype='float64', na_value=np.nan)]),
+        'event_date': np.concatenate([fight_dates.to_numpy(), fight_dates.to_numpy()]),
+    }).dropna(subset=['fighter_id'])
+    appearances['fight_id'] = appearances['fight_id'].astype(np.int64)
+    appearances['fighter_id'] = appearances['fighter_id'].astype(np.int64)
+
+    stats = fight_stat_data[['fight_id', 'fighter_id']].astype('float64').copy()
+    for col in STAT_COLUMNS[:-1]:
+        stats[col] = fight_stat_data[col].astype('float64')
+    stats['ctrl_time_seconds'] = parse_time_seconds(fight_stat_data['ctrl_time']).astype('float64')
+    stats = stats.dropna(subset=['fight_id', 'fighter_id']).astype({'fight_id': np.int64, 'fighter_id': np.int64})
+    stats = stats.drop_duplicates(subset=['fight_id', 'fighter_id'])
+
+    # Fights without a stat row still count towards the fight history, with zero totals
+    timeline = appearances.merge(stats, on=['fight_id', 'fighter_id'], how='left')
+    timeline[STAT_COLUMNS] = timeline[STAT_COLUMNS].fillna(0.0)
+    return timeline.sort_values(['fighter_id', 'event_date', 'fight_id'], kind='mergesort').reset_index(drop=True)
+
+
+def build_point_in_time_features(fight_data, event_data, fight_stat_data, windows=(3, 5)):
+    """
+    Build as-of-fight features for both corners of every fight.
+
+    Parameters:
+        fight_data, event_data, fight_stat_data (pd.DataFrame): Raw ufcstats tables.
+        windows (tuple): Rolling window sizes, in number of previous fights.
+
+    Returns:
+        pd.DataFrame: One row per fight_id with, for f_1 and f_2, the number of prior
+        fights, cumulative totals ('<prefix>_<stat>_cum') and last-N totals
+        ('<prefix>_<stat>_last<N>'), using only fights strictly before the event date.
+    """
+    timeline = _fighter_timeline(fight_data, event_data, fight_stat_data)
+    n = len(timeline)
+    idx = np.arange(n)
+
+    fighter_ids = timeline['fighter_id'].to_numpy()
+    dates = timeline['event_date'].to_numpy()
+
+    # First row of each fighter's history, and of each (fighter, date) group so that
+    # fights on the same date never see each other
+    new_fighter = np.ones(n, dtype=bool)
+    new_fighter[1:] = fighter_ids[1:] != fighter_ids[:-1]
+    new_date = new_fighter.copy()
+    new_date[1:] |= dates[1:] != dates[:-1]
+    fighter_start = np.maximum.accumulate(np.where(new_fighter, idx, 0))
+    cutoff = np.maximum.accumulate(np.where(new_date, idx, 0))
+
+    values = timeline[STAT_COLUMNS].to_numpy(dtype='float64')
+    cumulative = np.zeros((n + 1, len(STAT_COLUMNS)))
+    np.cumsum(values, axis=0, out=cumulative[1:])
+
+    features = {'prior_fights': cutoff - fighter_start}
+    prior = cumulative[cutoff] - cumulative[fighter_start]
+    for j, col in enumerate(STAT_COLUMNS):
+        features[f'{col}_cum'] = prior[:, j]
+    for window in windows:
+        window_start = np.maximum(fighter_start, cutoff - window)
+        rolling = cumulative[cutoff] - cumulative[window_start]
+        for j, col in enumerate(STAT_COLUMNS):
+            features[f'{col}_last{window}'] = rolling[:, j]
+
+    per_fighter = pd.DataFrame(features)
+    per_fighter['fight_id'] = timeline['fight_id'].to_numpy()
+    per_fighter['fighter_id'] = fighter_ids
+
+    result = fight_data[['fight_id', 'f_1', 'f_2']].copy()
+    for corner in ['f_1', 'f_2']:
+        corner_features = per_fighter.rename(columns={'fighter_id': corner})
+        corner_features = corner_features.rename(columns={c: f'{corner}_{c}' for c in features})
+        result = result.merge(corner_features.astype({corner: result[corner].dtype, 'fight_id': result['fight_id'].dtype}),
+                              on=['fight_id', corner], how='left')
+        result[f'{corner}_prior_fights'] = result[f'{corner}_prior_fights'].astype('Int64')
+    return result
+
+
+def main():
+    base_path = './data/'
+    event_data, fight_data, fight_stat_data = load_tables(base_path, 'event', 'fight', 'fight_stat')
+
+    start = time.perf_counter()
+    features = build_point_in_time_features(fight_data, event_data, fight_stat_data)
+    elapsed = time.perf_counter() - start
+
+    print(f"Built {features.shape[1]} columns for {len(features)} fights in {elapsed:.3f}s")
+    print(features[['fight_id', 'f_1_prior_fights', 'f_1_sig_strikes_succ_cum', 'f_1_sig_strikes_succ_last3',
+                    'f_2_prior_fights', 'f_2_ctrl_time_seconds_cum']].head())
+
+
+if __name__ == "__main__":
+    main()
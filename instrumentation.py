@@ -0,0 +1,154 @@
+import atexit
+import functools
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Stage-level instrumentation for the analysis scripts. Pipeline functions are
+# wrapped with @traced (or a block with `with stage(name)`); while tracing is off the
+# wrapper is a single flag check before calling straight through. When it is on,
+# each stage records wall and CPU time, the growth of the process peak RSS, the
+# tracemalloc peak above its starting point (with memory tracing) and the row
+# counts of its DataFrame inputs and outputs, and the records are written as one
+# JSON trace at exit. A cProfile dump can be written per outermost stage.
+#
+# Turn it on with app.py --trace trace.json [--trace-memory] [--profile-dir DIR], or
+# for the scripts run directly with UFC_TRACE=trace.json, UFC_TRACE_MEMORY=1 and
+# UFC_PROFILE_DIR=DIR.
+
+
+class _State:
+    enabled = False
+    path = None
+    memory = False
+    profile_dir = None
+    records = []
+    stack = []
+    profiling = False
+    origin = 0.0
+    pid = None
+
+
+_state = _State()
+
+
+def _rss_peak_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+
+def _rows(values):
+    """Row counts of the DataFrames/Series/arrays among values."""
+    return [len(value) for value in values if getattr(value, 'ndim', 0) >= 1]
+
+
+def enable(path, memory=False, profile_dir=None):
+    """Start recording stages; the trace is written to path when the process exits."""
+    if not _state.enabled:
+        atexit.register(write_trace)
+    _state.enabled, _state.path, _state.memory, _state.profile_dir = True, path, memory, profile_dir
+    _state.records, _state.stack, _state.origin, _state.pid = [], [], time.perf_counter(), os.getpid()
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if profile_dir:
+        os.makedirs(profile_dir, exist_ok=True)
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """
+    Record one pipeline stage. Yields the record dict (None when tracing is off), so a
+    block can fill in record['rows_out'] itself.
+    """
+    if not _state.enabled:
+        yield None
+        return
+
+    record = {'stage': name, 'depth': len(_state.stack), 'parent': _state.stack[-1]['stage'] if _state.stack else None,
+              'rows_in': rows_in or [], 'rows_out': []}
+    if _state.memory:
+        # The tracemalloc peak is global: fold it into the enclosing stage before resetting it
+        current, peak = tracemalloc.get_traced_memory()
+        if _state.stack:
+            _state.stack[-1]['_peak'] = max(_state.stack[-1]['_peak'], peak)
+        tracemalloc.reset_peak()
+        record['_traced_start'], record['_peak'] = current, current
+    profiler = None
+    if _state.profile_dir and not _state.profiling:
+        # Only one profiler can be active, so nested stages fall under the outermost one
+        import cProfile
+        profiler, _state.profiling = cProfile.Profile(), True
+
+    _state.stack.append(record)
+    rss_start = _rss_peak_mb()
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    try:
+        yield record
+    finally:
+        if profiler:
+            profiler.disable()
+        record['start_s'] = start - _state.origin
+        record['wall_s'] = time.perf_counter() - start
+        record['cpu_s'] = time.process_time() - cpu_start
+        record['rss_peak_mb'] = _rss_peak_mb()
+        record['rss_peak_growth_mb'] = record['rss_peak_mb'] - rss_start
+        _state.stack.pop()
+        if _state.memory:
+            peak = max(record.pop('_peak'), tracemalloc.get_traced_memory()[1])
+            record['traced_peak_mb'] = (peak - record.pop('_traced_start')) / 1e6
+            if _state.stack:
+                _state.stack[-1]['_peak'] = max(_state.stack[-1]['_peak'], peak)
+        if profiler:
+            _state.profiling = False
+            record['profile'] = os.path.join(_state.profile_dir, f"{len(_state.records):03d}_{name}.prof")
+            profiler.dump_stats(record['profile'])
+        _state.records.append(record)
+
+
+def traced(func=None, *, name=None):
+    """Decorator form of stage(): records the wrapped function's inputs and outputs."""
+    if func is None:
+        return functools.partial(traced, name=name)
+    stage_name = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _state.enabled:
+            return func(*args, **kwargs)
+        with stage(stage_name, rows_in=_rows(list(args) + list(kwargs.values()))) as record:
+            result = func(*args, **kwargs)
+            record['rows_out'] = _rows(result if isinstance(result, tuple) else [result])
+            return result
+    return wrapper
+
+
+def records():
+    """Recorded stages, in the order they finished."""
+    return list(_state.records)
+
+
+def write_trace(path=None):
+    """Write the recorded stages as JSON, ordered by start time."""
+    path = path or _state.path
+    # Worker processes (e.g. the figure pool) inherit the state but never own the trace
+    if not path or not _state.records or os.getpid() != _state.pid:
+        return
+    trace = {
+        'argv': sys.argv,
+        'memory': _state.memory,
+        'stages': sorted(_state.records, key=lambda record: record['start_s']),
+    }
+    with open(path, 'w') as f:
+        json.dump(trace, f, indent=2)
+
+
+if os.environ.get('UFC_TRACE'):
+    enable(os.environ['UFC_TRACE'], memory=os.environ.get('UFC_TRACE_MEMORY') == '1',
+           profile_dir=os.environ.get('UFC_PROFILE_DIR'))
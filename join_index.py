@@ -0,0 +1,210 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, load_tables, table_fingerprint
+from instrumentation import traced
+
+# Persistent join index over the compact integer IDs. Instead of merging
+# fight_data with event_data and then merging the per-fighter results back onto
+# fighter_data, every lookup is an np.take into a dense array or a slice of a
+# fighter -> fights CSR adjacency:
+#
+#   event_date[event_id]                     event date per event_id (NaT if unknown)
+#   fighter_row[fighter_id]                  row offset in fighter_data (-1 if unknown)
+#   indptr[fighter_id]:indptr[fighter_id+1]  that fighter's fights, sorted by date
+
+INDEX_FILE = 'join_index.npz'
+SOURCE_TABLES = ('event', 'fight', 'fighter')
+
+
+def _dense_lookup(keys, values, fill):
+    """Dense array with values[i] at position keys[i], indexed directly by ID."""
+    size = int(keys.max()) + 1 if len(keys) else 0
+    lookup = np.full(size, fill, dtype=values.dtype)
+    lookup[keys] = values
+    return lookup
+
+
+def _take(lookup, ids, fill):
+    """np.take with out-of-range and missing (negative) IDs mapped to fill."""
+    ids = np.asarray(ids, dtype=np.int64)
+    valid = (ids >= 0) & (ids < len(lookup))
+    out = np.full(len(ids), fill, dtype=lookup.dtype)
+    out[valid] = np.take(lookup, ids[valid])
+    return out
+
+
+def _id_array(column):
+    """Nullable ID column as int64 with -1 for missing values."""
+    return column.astype('float64').fillna(-1).to_numpy(dtype=np.int64)
+
+
+class JoinIndex:
+    """
+    Dense ID lookups and a fighter -> fights CSR adjacency.
+
+    Parameters:
+        event_date (np.ndarray): datetime64[ns] event date indexed by event_id.
+        fighter_row (np.ndarray): int64 fighter_data row offset indexed by fighter_id.
+        indptr (np.ndarray): CSR row pointers indexed by fighter_id.
+        fight_row (np.ndarray): fight_data row offset for each adjacency entry.
+        fight_date (np.ndarray): Event date for each adjacency entry.
+        corner (np.ndarray): 0 when the fighter was f_1 in that fight, 1 when f_2.
+        fingerprint (dict): Source CSV hashes the index was built from.
+    """
+
+    ARRAYS = ('event_date', 'fighter_row', 'indptr', 'fight_row', 'fight_date', 'corner')
+
+    def __init__(self, event_date, fighter_row, indptr, fight_row, fight_date, corner, fingerprint=None):
+        self.event_date = event_date
+        self.fighter_row = fighter_row
+        self.indptr = indptr
+        self.fight_row = fight_row
+        self.fight_date = fight_date
+        self.corner = corner
+        self.fingerprint = fingerprint or {}
+
+    @classmethod
+    def build(cls, event_data, fight_data, fighter_data, fingerprint=None):
+        event_date = _dense_lookup(event_data['event_id'].to_numpy(dtype=np.int64),
+                                   pd.to_datetime(event_data['event_date']).to_numpy(dtype='datetime64[ns]'),
+                                   np.datetime64('NaT'))
+        fighter_ids = fighter_data['fighter_id'].to_numpy(dtype=np.int64)
+        fighter_row = _dense_lookup(fighter_ids, np.arange(len(fighter_ids), dtype=np.int64), -1)
+
+        # One adjacency entry per (fighter, fight) appearance
+        n_fights = len(fight_data)
+        fighter = np.concatenate([_id_array(fight_data['f_1']), _id_array(fight_data['f_2'])])
+        fight_row = np.concatenate([np.arange(n_fights), np.arange(n_fights)])
+        corner = np.repeat(np.array([0, 1], dtype=np.int8), n_fights)
+        fight_date = _take(event_date, np.concatenate([fight_data['event_id'].to_numpy(dtype=np.int64)] * 2),
+                           np.datetime64('NaT'))
+
+        known = fighter >= 0
+        fighter, fight_row, corner, fight_date = fighter[known], fight_row[known], corner[known], fight_date[known]
+        order = np.lexsort((fight_row, fight_date, fighter))
+        fighter, fight_row, corner, fight_date = fighter[order], fight_row[order], corner[order], fight_date[order]
+
+        size = max(len(fighter_row), int(fighter.max()) + 1 if len(fighter) else 0)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(fighter, minlength=size), out=indptr[1:])
+        return cls(event_date, fighter_row, indptr, fight_row, fight_date, corner, fingerprint)
+
+    def save(self, path):
+        fingerprint = np.array(sorted(self.fingerprint.items()), dtype=str)
+        np.savez(path, fingerprint=fingerprint, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            arrays = {name: f[name] for name in cls.ARRAYS}
+            fingerprint = dict(f['fingerprint'].tolist())
+        return cls(fingerprint=fingerprint, **arrays)
+
+    def event_dates(self, event_ids):
+        """Event date for each event_id (replaces merging event_data onto fight_data)."""
+        return _take(self.event_date, event_ids, np.datetime64('NaT'))
+
+    def fighter_rows(self, fighter_ids):
+        """fighter_data row offset for each fighter_id, -1 when the fighter is unknown."""
+        return _take(self.fighter_row, fighter_ids, -1)
+
+    def fights_of(self, fighter_id):
+        """fight_data row offsets of one fighter's fights, in date order."""
+        if not 0 <= fighter_id < len(self.indptr) - 1:
+            return self.fight_row[:0]
+        return self.fight_row[self.indptr[fighter_id]:self.indptr[fighter_id + 1]]
+
+    def first_last_dates(self, fighter_ids, corner=None):
+        """
+        First and last fight date for each fighter_id, straight from the CSR segments.
+
+        Parameters:
+            fighter_ids (array-like): IDs to look up (missing or unknown IDs give NaT).
+            corner (int, optional): Only count fights fought as f_1 (0) or f_2 (1).
+        """
+        indptr, dates = self.indptr, self.fight_date
+        if corner is not None:
+            owner = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            keep = self.corner == corner
+            indptr = np.zeros_like(self.indptr)
+            np.cumsum(np.bincount(owner[keep], minlength=len(indptr) - 1), out=indptr[1:])
+            dates = dates[keep]
+
+        n = len(indptr) - 1
+        first = np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]')
+        last = first.copy()
+        nonempty = np.flatnonzero(indptr[1:] > indptr[:-1])
+        if len(nonempty):
+            first[nonempty] = np.fmin.reduceat(dates, indptr[nonempty])
+            last[nonempty] = np.fmax.reduceat(dates, indptr[nonempty])
+
+        ids = _id_array(pd.Series(fighter_ids))
+        return _take(first, ids, np.datetime64('NaT')), _take(last, ids, np.datetime64('NaT'))
+
+
+@traced
+def load_join_index(base_path, index_path=None):
+    """Load the persisted index, rebuilding it when any source CSV has changed."""
+    index_path = index_path or os.path.join(base_path, CACHE_DIR, INDEX_FILE)
+    fingerprint = {table: table_fingerprint(base_path, table) for table in SOURCE_TABLES}
+    if os.path.exists(index_path):
+        index = JoinIndex.load(index_path)
+        if index.fingerprint == fingerprint:
+            return index
+
+    event_data, fight_data, fighter_data = load_tables(base_path, *SOURCE_TABLES)
+    index = JoinIndex.build(event_data, fight_data, fighter_data, fingerprint)
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    index.save(index_path)
+    return index
+
+
+def benchmark_joins(base_path, repeat=5):
+    """Compare the merge-based career-date joins against the index lookups."""
+    from career_metrics import calculate_fighter_age_and_career_length
+    from linear_regression_physical_attributes_careerlength import prepare_data
+
+    event_data, fight_data, fighter_data = load_tables(base_path, *SOURCE_TABLES)
+    start = time.perf_counter()
+    index = JoinIndex.build(event_data, fight_data, fighter_data)
+    build_s = time.perf_counter() - start
+
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times)
+
+    rows = {
+        'career_length': {
+            'merge_s': best(lambda: calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data.copy())),
+            'index_s': best(lambda: calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data.copy(), index=index)),
+        },
+        'physical_prepare_data': {
+            'merge_s': best(lambda: prepare_data(fighter_data.copy(), fight_data, event_data.copy())),
+            'index_s': best(lambda: prepare_data(fighter_data.copy(), fight_data, event_data.copy(), index=index)),
+        },
+    }
+    results = pd.DataFrame(rows).T.assign(speedup=lambda df: df['merge_s'] / df['index_s'])
+    return results, build_s
+
+
+def main():
+    base_path = './data/'
+    index = load_join_index(base_path)
+    print(f"Index: {len(index.event_date)} event slots, {len(index.indptr) - 1} fighter slots, "
+          f"{len(index.fight_row)} fight appearances")
+
+    results, build_s = benchmark_joins(base_path)
+    print(f"Index build: {build_s:.4f}s")
+    print(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,50 @@
+import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import statsmodels.api as sm
 from datetime import datetime
+from data_loader import load_tables
+from career_metrics import calculate_fighter_age_and_career_length, career_length_figures, load_career_state
+from plot_renderer import render_figures
+from instrumentation import traced
 
 # Load and prepare data
-def load_data(base_path):
-    event_data = pd.read_csv(base_path + 'ufc_event_data.csv')
-    fight_data = pd.read_csv(base_path + 'ufc_fight_data.csv')
-    fighter_data = pd.read_csv(base_path + 'ufc_fighter_data.csv')
-    fight_stat_data = pd.read_csv(base_path + 'ufc_event_data.csv')
-    return event_data, fight_data, fighter_data, fight_stat_data
+@traced
+def load_data(base_path, preloaded=None):
+    return load_tables(base_path, 'event', 'fight', 'fighter', 'fight_stat', preloaded=preloaded)
 
+@traced
 def preprocess_event_data(event_data):
     event_data['event_date'] = pd.to_datetime(event_data['event_date'])
     return event_data
 
-def calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data):
-    fight_data = pd.merge(fight_data, event_data[['event_id', 'event_date']], on='event_id', how='left')
-    fights_f1 = fight_data[['f_1', 'event_date']].rename(columns={'f_1': 'fighter_id'})
-    fights_f2 = fight_data[['f_2', 'event_date']].rename(columns={'f_2': 'fighter_id'})
-    all_fights = pd.concat([fights_f1, fights_f2])
-
-    last_fights = all_fights.groupby('fighter_id')['event_date'].max().reset_index().rename(columns={'event_date': 'event_date_last'})
-    first_fights = all_fights.groupby('fighter_id')['event_date'].min().reset_index().rename(columns={'event_date': 'event_date_first'})
-
-    fighter_data = pd.merge(fighter_data, last_fights, on='fighter_id', how='left')
-    fighter_data = pd.merge(fighter_data, first_fights, on='fighter_id', how='left')
-
-    fighter_data['fighter_dob'] = pd.to_datetime(fighter_data['fighter_dob'])
-    fighter_data['age_at_last_fight'] = (fighter_data['event_date_last'].dt.year - fighter_data['fighter_dob'].dt.year)
-    fighter_data['career_length_years'] = (fighter_data['event_date_last'] - fighter_data['event_date_first']).dt.days / 365.25
-    fighter_data['age_at_debut'] = (fighter_data['event_date_first'] - fighter_data['fighter_dob']).dt.days / 365.25
-
-    return fighter_data
-
-# Regression analysis
-def run_regression(data):
+# Regression analysis; fit_regression returns the fitted model (division_store reads
+# its coefficients per division), run_regression its summary
+def fit_regression(data):
     X = data[['age_at_debut']]  # Predictor variable
     y = data['career_length_years']  # Dependent variable
     X = sm.add_constant(X)  # Adding a constant (intercept)
-    model = sm.OLS(y, X, missing='drop').fit()  # Fit the model
-    return model.summary()
+    return sm.OLS(y, X, missing='drop').fit()  # Fit the model
 
-# Visualization
-def plot_histogram(data, column, bins=20, kde=False, title="", xlabel="", ylabel=""):
-    sns.histplot(data=data, x=column, bins=bins, kde=kde)
-    plt.title(title)
-    plt.xlabel(xlabel)
-    plt.ylabel(ylabel)
-    plt.show()
+@traced
+def run_regression(data):
+    return fit_regression(data).summary()
 
 # Main function
-def main():
-    base_path = './data/'
-    event_data, fight_data, fighter_data, fight_stat_data = load_data(base_path)
+@traced
+def main(base_path='./data/', preloaded=None, figure_dir='.', plots=True):
+    event_data, fight_data, fighter_data, fight_stat_data = load_data(base_path, preloaded)
     event_data = preprocess_event_data(event_data)
-    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data)
+    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, state=load_career_state(base_path, event_data, fight_data),
+                                                           metrics=preloaded.get('career') if preloaded else None)
 
     print("\nMissing or Incorrect Data in Final Dataset:")
     print(fighter_data[['fighter_id', 'event_date_last', 'age_at_last_fight', 'career_length_years', 'age_at_debut']].isnull().sum())
     print("\nSample Data with Ages and Career Lengths at Last Fight:")
     print(fighter_data[['fighter_id', 'event_date_last', 'age_at_last_fight', 'career_length_years', 'age_at_debut']].head())
 
-    # Plotting histograms
-    plot_histogram(fighter_data, 'age_at_last_fight', bins=20, kde=True, title='Distribution of Fighter Ages at Last Fight', xlabel='Age at Last Fight', ylabel='Frequency')
-    plot_histogram(fighter_data, 'career_length_years', bins=20, kde=True, title='Distribution of UFC Career Lengths', xlabel='Career Length (years)', ylabel='Frequency')
+    # Histograms written to figure_dir (the same ones as app.py career-length)
+    if plots:
+        render_figures(career_length_figures(fighter_data, figure_dir))
 
     # Perform regression analysis on age at debut
     results = run_regression(fighter_data)
@@ -1,32 +1,42 @@
 import pandas as pd
 import statsmodels.api as sm
 from datetime import datetime
+from data_loader import load_tables
+from join_index import load_join_index
+from instrumentation import traced
 
-def load_data(base_path):
-    """ Load data from CSV files. """
-    fighter_data = pd.read_csv(base_path + 'ufc_fighter_data.csv')
-    fight_data = pd.read_csv(base_path + 'ufc_fight_data.csv')
-    event_data = pd.read_csv(base_path + 'ufc_event_data.csv')
-    return fighter_data, fight_data, event_data
-def prepare_data(fighter_data, fight_data, event_data):
-    """ Prepare and merge data for analysis. """
-    # Convert event dates to datetime
-    event_data['event_date'] = pd.to_datetime(event_data['event_date'])
-    
-    # Merge fight data with event dates
-    fight_data = pd.merge(fight_data, event_data[['event_id', 'event_date']], on='event_id', how='left')
-    
-    # Calculate first and last fight dates
-    fight_dates = fight_data.groupby('f_1')['event_date'].agg(first_fight='min', last_fight='max').reset_index()
-    fight_dates.rename(columns={'f_1': 'fighter_id'}, inplace=True)
-    
-    # Merge with fighter data
-    fighter_data = pd.merge(fighter_data, fight_dates, on='fighter_id', how='left')
+@traced
+def load_data(base_path, preloaded=None):
+    """ Load data from the typed CSV cache. """
+    return load_tables(base_path, 'fighter', 'fight', 'event', preloaded=preloaded)
+@traced
+def prepare_data(fighter_data, fight_data, event_data, index=None):
+    """ Prepare and merge data for analysis, using the join index for the fight dates when given. """
+    if index is not None:
+        # First and last fight dates (as f_1) straight from the fighter -> fights adjacency
+        fighter_data = fighter_data.copy()
+        fighter_data['first_fight'], fighter_data['last_fight'] = index.first_last_dates(fighter_data['fighter_id'], corner=0)
+    else:
+        # Convert event dates to datetime
+        event_data['event_date'] = pd.to_datetime(event_data['event_date'])
+
+        # Merge fight data with event dates
+        fight_data = pd.merge(fight_data, event_data[['event_id', 'event_date']], on='event_id', how='left')
+
+        # Calculate first and last fight dates
+        fight_dates = fight_data.groupby('f_1')['event_date'].agg(first_fight='min', last_fight='max').reset_index()
+        fight_dates.rename(columns={'f_1': 'fighter_id'}, inplace=True)
+
+        # Merge with fighter data
+        fighter_data = pd.merge(fighter_data, fight_dates, on='fighter_id', how='left')
     
     # Calculate career length in years
     fighter_data['career_length_years'] = (fighter_data['last_fight'] - fighter_data['first_fight']).dt.days / 365.25
     
-    # Dummy encoding for categorical variables
+    return encode_stance(fighter_data)
+
+def encode_stance(fighter_data):
+    """ Dummy encoding for categorical variables. """
     if 'fighter_stance' in fighter_data.columns:
         fighter_data = pd.get_dummies(fighter_data, columns=['fighter_stance'], drop_first=True)
     else:
@@ -35,8 +45,8 @@ def prepare_data(fighter_data, fight_data, event_data):
     return fighter_data
 
 
-def run_regression_analysis(fighter_data):
-    """ Run linear regression to analyze factors affecting career length. """
+def fit_regression_analysis(fighter_data):
+    """ Fit the linear regression of career length on the physical attributes and stance dummies. """
     # Select features and target
     X = fighter_data[['fighter_height_cm', 'fighter_reach_cm', 'fighter_weight_lbs'] + [col for col in fighter_data.columns if 'fighter_stance_' in col]]
     y = fighter_data['career_length_years']
@@ -49,17 +59,18 @@ def run_regression_analysis(fighter_data):
     y.fillna(y.mean(), inplace=True)
     
     # Fit the linear regression model
-    model = sm.OLS(y, X).fit()
-    
+    return sm.OLS(y, X).fit()
+
+@traced
+def run_regression_analysis(fighter_data):
+    """ Run linear regression to analyze factors affecting career length. """
     # Print the summary of the regression
-    return model.summary()
+    return fit_regression_analysis(fighter_data).summary()
 
-def main():
-    base_path = './data/'
-    fighter_data, fight_data, event_data = load_data(base_path)
-    print("Columns after loading data:", fighter_data.columns)  # Debugging line to check columns
-    fighter_data = prepare_data(fighter_data, fight_data, event_data)
-    print("Columns after preparation:", fighter_data.columns)  # More debugging
+@traced
+def main(base_path='./data/', preloaded=None):
+    fighter_data, fight_data, event_data = load_data(base_path, preloaded)
+    fighter_data = prepare_data(fighter_data, fight_data, event_data, index=load_join_index(base_path))
     result = run_regression_analysis(fighter_data)
     print(result)
 
@@ -0,0 +1,157 @@
+import argparse
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+
+import numpy as np
+
+from query_service import DEFAULT_PORT, QueryService, make_server
+
+# Load test for query_service.py: a pool of client threads, each on its own
+# keep-alive connection, sends a mix of fighter, weight-class and event queries and
+# times every request. Reports p50/p99 latency per route and overall throughput.
+#
+#   python load_test.py --port 8765 [--requests 20000] [--concurrency 8]
+#   python load_test.py --socket /tmp/ufc.sock
+#   python load_test.py --base-path ./data/          (starts an in-process service)
+
+DEFAULT_MIX = {'fighter': 0.7, 'weight-class': 0.2, 'event': 0.1}
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=30):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def _connect(host, port, socket_path):
+    return UnixHTTPConnection(socket_path) if socket_path else http.client.HTTPConnection(host, port, timeout=30)
+
+
+def _get(conn, path):
+    conn.request('GET', path)
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, body
+
+
+def request_plan(host, port, socket_path, n_requests, mix, seed=0):
+    """The (route, path) sequence to send, drawn from the keys the service reports."""
+    conn = _connect(host, port, socket_path)
+    classes = [entry['slug'] for entry in json.loads(_get(conn, '/weight-class')[1])]
+    status = json.loads(_get(conn, '/status')[1])
+    conn.close()
+    # Fighter and event ids are sampled from the id range, so some 404s are expected
+    # and measured too; they exercise the same lookup path
+    rng = random.Random(seed)
+    routes = list(mix)
+    weights = [mix[route] for route in routes]
+    plan = []
+    for route in rng.choices(routes, weights, k=n_requests):
+        if route == 'fighter':
+            plan.append((route, f'/fighter/{rng.randrange(status["fighters"])}'))
+        elif route == 'weight-class':
+            plan.append((route, f'/weight-class/{rng.choice(classes)}'))
+        else:
+            plan.append((route, f'/event/{rng.randrange(status["events"])}'))
+    return plan
+
+
+def run_load(host, port, socket_path, plan, concurrency):
+    """Send the plan from concurrency threads; returns per-request (route, status, seconds) and wall time."""
+    chunks = [plan[i::concurrency] for i in range(concurrency)]
+    results = [[] for _ in chunks]
+    barrier = threading.Barrier(concurrency + 1)
+
+    def worker(chunk, out):
+        conn = _connect(host, port, socket_path)
+        barrier.wait()
+        for route, path in chunk:
+            start = time.perf_counter()
+            status, _ = _get(conn, path)
+            out.append((route, status, time.perf_counter() - start))
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(chunk, out)) for chunk, out in zip(chunks, results)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    return [result for out in results for result in out], wall
+
+
+def summarize(results, wall):
+    """p50/p99/mean latency in milliseconds per route and overall, plus requests/sec."""
+    rows = {}
+    by_route = {}
+    for route, status, seconds in results:
+        by_route.setdefault(route, []).append((status, seconds))
+    for route, entries in sorted(by_route.items()) + [('all', [(s, t) for _, s, t in results])]:
+        latency = np.array([seconds for _, seconds in entries]) * 1000
+        rows[route] = {
+            'requests': len(entries),
+            'errors': sum(status >= 500 for status, _ in entries),
+            'not_found': sum(status == 404 for status, _ in entries),
+            'p50_ms': float(np.percentile(latency, 50)),
+            'p99_ms': float(np.percentile(latency, 99)),
+            'mean_ms': float(latency.mean()),
+        }
+    rows['all']['requests_per_s'] = len(results) / wall
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure query_service.py latency and throughput.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help=f"a running service's port (e.g. {DEFAULT_PORT})")
+    parser.add_argument('--socket', help="a running service's Unix socket")
+    parser.add_argument('--base-path', default='./data/', help="data for an in-process service when no --port/--socket")
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--warmup', type=int, default=500, help="untimed requests sent first")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    host, port, socket_path = args.host, args.port, args.socket
+    if port is None and socket_path is None:
+        service = QueryService(args.base_path, poll_seconds=0)
+        server = make_server(service, host, 0)
+        port = server.server_address[1]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Started an in-process service on port {port} ({service.load_seconds:.2f}s load)")
+
+    try:
+        plan = request_plan(host, port, socket_path, args.warmup + args.requests, DEFAULT_MIX, args.seed)
+        if args.warmup:
+            run_load(host, port, socket_path, plan[:args.warmup], args.concurrency)
+        results, wall = run_load(host, port, socket_path, plan[args.warmup:], args.concurrency)
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    summary = summarize(results, wall)
+    print(f"{len(results)} requests, {args.concurrency} connections, {wall:.2f}s")
+    print(f"  {'route':<14} {'requests':>8} {'404':>6} {'5xx':>5} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for route, row in summary.items():
+        print(f"  {route:<14} {row['requests']:>8} {row['not_found']:>6} {row['errors']:>5} "
+              f"{row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} {row['mean_ms']:>8.3f}")
+    print(f"Throughput: {summary['all']['requests_per_s']:.0f} requests/s")
+    if summary['all']['errors']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, load_tables, table_fingerprint
+from instrumentation import traced
+
+# Fighter -> opponent graph over ufc_fight_data, as a CSR adjacency indexed by
+# fighter_id. Every fight with two known fighters gives two directed edges, and a
+# fighter's edges are sorted by opponent and then date, so rematches sit next to each
+# other and "does A have an edge to X" is a binary search on the (fighter, opponent)
+# key. Edge attributes are kept as parallel arrays:
+#
+#   indptr[fighter_id]:indptr[fighter_id+1]   that fighter's edges
+#   opponent, fight_id, date, winner           per edge (winner -1 when there is none)
+#   result                                     per edge, from the fighter's side (RESULTS)
+#
+# The fighter_w/fighter_l/fighter_d record of every fighter is stored next to it for
+# strength-of-schedule queries. Each array is saved as its own .npy file, so loading
+# memory-maps them instead of reading the graph into memory.
+
+GRAPH_DIR = 'opponent_graph'
+GRAPH_VERSION = 1
+SOURCE_TABLES = ('event', 'fight', 'fighter')
+# result codes, from the side of the edge's fighter
+RESULTS = ('loss', 'win', 'draw', 'no_contest')
+LOSS, WIN, DRAW, NO_CONTEST = range(len(RESULTS))
+
+
+def _id_array(column):
+    """Nullable ID column as int64 with -1 for missing values."""
+    return column.astype('float64').fillna(-1).to_numpy(dtype=np.int64)
+
+
+def _segments(indptr, nodes):
+    """
+    Edges of the given nodes, concatenated: (position of the node in `nodes`, edge index)
+    for every edge, without a Python loop over the nodes.
+    """
+    nodes = np.asarray(nodes, dtype=np.int64)
+    valid = (nodes >= 0) & (nodes < len(indptr) - 1)
+    starts = np.where(valid, indptr[np.where(valid, nodes, 0)], 0)
+    lengths = np.where(valid, indptr[np.where(valid, nodes, 0) + 1] - starts, 0)
+    owner = np.repeat(np.arange(len(nodes)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return owner, np.repeat(starts, lengths) + offsets
+
+
+class OpponentGraph:
+    """
+    CSR fighter -> opponent adjacency with per-edge fight attributes.
+
+    Parameters:
+        indptr (np.ndarray): CSR row pointers indexed by fighter_id.
+        opponent (np.ndarray): Opponent fighter_id per edge.
+        fight_id (np.ndarray): fight_id per edge.
+        date (np.ndarray): datetime64[ns] event date per edge (NaT if unknown).
+        result (np.ndarray): int8 result code per edge, from the fighter's side.
+        winner (np.ndarray): Winner fighter_id per edge, -1 for draws and no contests.
+        record (np.ndarray): (n, 3) fighter_w, fighter_l, fighter_d indexed by fighter_id,
+            -1 for fighters missing from ufc_fighter_data.
+        fingerprint (dict): Source CSV hashes the graph was built from.
+    """
+
+    ARRAYS = ('indptr', 'opponent', 'fight_id', 'date', 'result', 'winner', 'record')
+
+    def __init__(self, indptr, opponent, fight_id, date, result, winner, record, fingerprint=None):
+        self.indptr = indptr
+        self.opponent = opponent
+        self.fight_id = fight_id
+        self.date = date
+        self.result = result
+        self.winner = winner
+        self.record = record
+        self.fingerprint = fingerprint or {}
+        self._keys = None
+
+    @classmethod
+    def build(cls, event_data, fight_data, fighter_data, fingerprint=None):
+        f1, f2, winner = _id_array(fight_data['f_1']), _id_array(fight_data['f_2']), _id_array(fight_data['winner'])
+        event_date = pd.Series(pd.to_datetime(event_data['event_date']).to_numpy(dtype='datetime64[ns]'),
+                               index=event_data['event_id'].to_numpy())
+        date = fight_data['event_id'].map(event_date).to_numpy(dtype='datetime64[ns]')
+        fight_id = fight_data['fight_id'].to_numpy(dtype=np.int64)
+        decision = (fight_data['result'].astype(object) == 'Decision').to_numpy()
+
+        # f_1's result; f_2's is the mirror image
+        result = np.where(winner == f1, WIN, np.where(winner == f2, LOSS, np.where((winner < 0) & decision, DRAW, NO_CONTEST)))
+        mirror = np.array([WIN, LOSS, DRAW, NO_CONTEST])
+        known = (f1 >= 0) & (f2 >= 0)
+        fighter = np.concatenate([f1[known], f2[known]])
+        opponent = np.concatenate([f2[known], f1[known]])
+        result = np.concatenate([result[known], mirror[result[known]]]).astype(np.int8)
+        winner = np.concatenate([winner[known], winner[known]])
+        fight_id = np.concatenate([fight_id[known], fight_id[known]])
+        date = np.concatenate([date[known], date[known]])
+
+        order = np.lexsort((fight_id, date, opponent, fighter))
+        fighter_ids = fighter_data['fighter_id'].to_numpy(dtype=np.int64)
+        size = max(int(fighter_ids.max()) + 1 if len(fighter_ids) else 0, int(fighter.max()) + 1 if len(fighter) else 0)
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(fighter, minlength=size), out=indptr[1:])
+
+        record = np.full((size, 3), -1, dtype=np.int32)
+        record[fighter_ids] = fighter_data[['fighter_w', 'fighter_l', 'fighter_d']].to_numpy(dtype=np.int32)
+        return cls(indptr, opponent[order].astype(np.int32), fight_id[order].astype(np.int32), date[order],
+                   result[order], winner[order].astype(np.int32), record, fingerprint)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'version': GRAPH_VERSION, 'fingerprint': self.fingerprint}, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load a saved graph; with the default mmap_mode the arrays are memory-mapped read-only."""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('version') != GRAPH_VERSION:
+            raise ValueError(f"Opponent graph at {path} has version {meta.get('version')}, expected {GRAPH_VERSION}")
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode) for name in cls.ARRAYS}
+        return cls(fingerprint=meta['fingerprint'], **arrays)
+
+    @property
+    def n_fighters(self):
+        return len(self.indptr) - 1
+
+    def _edge_keys(self):
+        # (fighter, opponent) composite key per edge; sorted, since edges are ordered that way
+        if self._keys is None:
+            owner = np.repeat(np.arange(self.n_fighters, dtype=np.int64), np.diff(self.indptr))
+            self._keys = owner * self.n_fighters + self.opponent
+        return self._keys
+
+    def edges(self, fighter_id):
+        """One fighter's fights as a DataFrame, ordered by opponent and date."""
+        _, edges = _segments(self.indptr, [fighter_id])
+        winner = pd.Series(self.winner[edges], dtype='Int32')
+        return pd.DataFrame({
+            'opponent': self.opponent[edges],
+            'fight_id': self.fight_id[edges],
+            'date': self.date[edges],
+            'result': pd.Categorical.from_codes(self.result[edges], RESULTS),
+            'winner': winner.mask(winner < 0),
+        })
+
+    def opponents(self, fighter_id):
+        """Distinct opponents of one fighter, sorted by fighter_id."""
+        _, edges = _segments(self.indptr, [fighter_id])
+        return np.unique(self.opponent[edges])
+
+    def common_opponents(self, fighters_a, fighters_b):
+        """
+        Opponents shared by each pair (fighters_a[i], fighters_b[i]).
+
+        Every distinct opponent of A is looked up in B's adjacency with one binary
+        search on the sorted edge keys, for all pairs at once. Returns one row per
+        (pair, shared opponent) with the pair's position, both fighters and the opponent.
+        """
+        fighters_a = np.atleast_1d(np.asarray(fighters_a, dtype=np.int64))
+        fighters_b = np.atleast_1d(np.asarray(fighters_b, dtype=np.int64))
+        pair, edges = _segments(self.indptr, fighters_a)
+        opponent = self.opponent[edges].astype(np.int64)
+        # Count a rematch opponent once: edges of one fighter are sorted by opponent
+        first = np.ones(len(edges), dtype=bool)
+        first[1:] = (pair[1:] != pair[:-1]) | (opponent[1:] != opponent[:-1])
+        pair, opponent = pair[first], opponent[first]
+
+        b = fighters_b[pair]
+        keys = self._edge_keys()
+        probe = b * self.n_fighters + opponent
+        pos = np.minimum(np.searchsorted(keys, probe), len(keys) - 1)
+        shared = (len(keys) > 0) & (b >= 0) & (b < self.n_fighters) & (keys[pos] == probe)
+        return pd.DataFrame({'pair': pair[shared], 'fighter_a': fighters_a[pair[shared]].astype('int32'),
+                             'fighter_b': b[shared].astype('int32'), 'opponent': opponent[shared].astype('int32')})
+
+    def common_opponent_counts(self, fighters_a, fighters_b):
+        """Number of shared opponents for each pair (fighters_a[i], fighters_b[i])."""
+        pairs = self.common_opponents(fighters_a, fighters_b)
+        return np.bincount(pairs['pair'], minlength=len(np.atleast_1d(fighters_a)))
+
+    def neighbourhood(self, fighter_ids, k=2):
+        """
+        Fighters within k hops of any of fighter_ids, with their hop distance.
+
+        A breadth-first search over whole frontiers: each hop gathers the edges of the
+        frontier with _segments and keeps the opponents not seen before.
+        """
+        distance = np.full(self.n_fighters, -1, dtype=np.int64)
+        frontier = np.unique(np.atleast_1d(np.asarray(fighter_ids, dtype=np.int64)))
+        frontier = frontier[(frontier >= 0) & (frontier < self.n_fighters)]
+        distance[frontier] = 0
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            _, edges = _segments(self.indptr, frontier)
+            reached = np.unique(self.opponent[edges])
+            frontier = reached[distance[reached] < 0]
+            distance[frontier] = hop
+        found = np.flatnonzero(distance >= 0)
+        return pd.DataFrame({'fighter_id': found.astype('int32'), 'hops': distance[found]}).sort_values(
+            ['hops', 'fighter_id'], ignore_index=True)
+
+    def strength_of_schedule(self, fighter_ids=None):
+        """
+        Per fighter: the average win rate of their opponents, one term per fight (a
+        rematch counts twice), and the average of that over the opponents (the
+        opponents' strength of schedule).
+
+        Win rates come from fighter_w / (fighter_w + fighter_l + fighter_d), the career
+        record in ufc_fighter_data, so they include fights outside the UFC. Opponents
+        missing from the fighter table or without a record are left out of the averages.
+        """
+        n = self.n_fighters
+        wins, losses, draws = (self.record[:, j].astype(np.float64) for j in range(3))
+        total = wins + losses + draws
+        win_rate = np.where((wins >= 0) & (total > 0), wins / np.where(total > 0, total, 1), np.nan)
+
+        owner = np.repeat(np.arange(n), np.diff(self.indptr))
+
+        def edge_mean(values):
+            known = ~np.isnan(values)
+            sums = np.bincount(owner[known], weights=values[known], minlength=n)
+            counts = np.bincount(owner[known], minlength=n)
+            return np.divide(sums, counts, out=np.full(n, np.nan), where=counts > 0), counts
+
+        opponent_win_rate, rated = edge_mean(win_rate[self.opponent])
+        opponents_sos, _ = edge_mean(opponent_win_rate[self.opponent])
+        fights = np.diff(self.indptr)
+        sos = pd.DataFrame({
+            'fighter_id': np.arange(n, dtype='int32'),
+            'fights': fights,
+            'wins': np.bincount(owner, weights=self.result == WIN, minlength=n).astype(np.int64),
+            'rated_opponents': rated,
+            'opponent_win_rate': opponent_win_rate,
+            'opponents_opponent_win_rate': opponents_sos,
+        })
+        if fighter_ids is None:
+            return sos[fights > 0].reset_index(drop=True)
+        ids = np.asarray(fighter_ids, dtype=np.int64)
+        return sos.iloc[ids[(ids >= 0) & (ids < n)]].reset_index(drop=True)
+
+
+@traced
+def load_opponent_graph(base_path, graph_path=None):
+    """Memory-map the saved graph, rebuilding it when any source CSV has changed."""
+    graph_path = graph_path or os.path.join(base_path, CACHE_DIR, GRAPH_DIR)
+    fingerprint = {table: table_fingerprint(base_path, table) for table in SOURCE_TABLES}
+    try:
+        graph = OpponentGraph.load(graph_path)
+        if graph.fingerprint == fingerprint:
+            return graph
+    except (OSError, ValueError, KeyError):
+        pass
+
+    event_data, fight_data, fighter_data = load_tables(base_path, *SOURCE_TABLES)
+    OpponentGraph.build(event_data, fight_data, fighter_data, fingerprint).save(graph_path)
+    return OpponentGraph.load(graph_path)
+
+
+def common_opponents_merge(fight_data, fighter_a, fighter_b):
+    """The self-merge the graph replaces: opponents shared by two fighters, from fight_data."""
+    edges = pd.concat([fight_data[['f_1', 'f_2']].set_axis(['fighter', 'opponent'], axis=1),
+                       fight_data[['f_2', 'f_1']].set_axis(['fighter', 'opponent'], axis=1)]).dropna()
+    a = edges.loc[edges['fighter'] == fighter_a, ['opponent']].drop_duplicates()
+    b = edges.loc[edges['fighter'] == fighter_b, ['opponent']].drop_duplicates()
+    return np.sort(a.merge(b, on='opponent')['opponent'].to_numpy(dtype=np.int64))
+
+
+def verify_common_opponents(graph, fight_data, n_pairs=200, seed=0):
+    """Compare common_opponents with the self-merge on random pairs of fighters; returns the mismatches."""
+    rng = np.random.default_rng(seed)
+    active = np.flatnonzero(np.diff(graph.indptr))
+    a, b = rng.choice(active, n_pairs), rng.choice(active, n_pairs)
+    shared = graph.common_opponents(a, b)
+    mismatches = 0
+    for i in range(n_pairs):
+        expected = common_opponents_merge(fight_data, a[i], b[i])
+        mismatches += not np.array_equal(np.sort(shared.loc[shared['pair'] == i, 'opponent'].to_numpy()), expected)
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the fighter-opponent graph and run example queries.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--fighters', type=int, nargs=2, metavar=('A', 'B'),
+                        help="fighter_ids to list common opponents for (default: the two most active fighters)")
+    parser.add_argument('--hops', type=int, default=2)
+    parser.add_argument('--verify', action='store_true', help="check common opponents against the self-merge")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    graph = load_opponent_graph(args.base_path)
+    print(f"Graph: {graph.n_fighters} fighter slots, {len(graph.opponent)} edges, loaded in {time.perf_counter() - start:.3f}s")
+
+    fighter_data = load_tables(args.base_path, 'fighter')[0]
+    names = fighter_data.set_index('fighter_id')[['fighter_f_name', 'fighter_l_name']]
+    if args.fighters:
+        a, b = args.fighters
+    else:
+        # The most active fighter and whoever two hops away shares the most opponents with them
+        a = int(np.argmax(np.diff(graph.indptr)))
+        hood = graph.neighbourhood(a, 2)
+        candidates = hood.loc[hood['hops'] == 2, 'fighter_id'].to_numpy()
+        b = int(candidates[np.argmax(graph.common_opponent_counts(np.full(len(candidates), a), candidates))])
+    shared = graph.common_opponents([a], [b])['opponent']
+    print(f"\nCommon opponents of {a} and {b}: {len(shared)}")
+    print(names.reindex(shared).to_string())
+    print(f"\nFighters within {args.hops} hops of {a}: {len(graph.neighbourhood(a, args.hops))}")
+
+    sos = graph.strength_of_schedule()
+    sos = sos[sos['fights'] >= 10].join(names, on='fighter_id')
+    print("\nToughest schedules (10+ UFC fights):")
+    print(sos.nlargest(10, 'opponent_win_rate').to_string(index=False, float_format=lambda x: f'{x:.3f}'))
+
+    if args.verify:
+        fight_data = load_tables(args.base_path, 'fight')[0]
+        print(f"\nPairs whose common opponents differ from the self-merge: {verify_common_opponents(graph, fight_data)}")
+
+
+if __name__ == "__main__":
+    main()
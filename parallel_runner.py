@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import json
+import os
+import pickle
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from career_metrics import DERIVED_COLUMNS, calculate_fighter_age_and_career_length, load_career_state
+from data_loader import TABLES, load_tables
+
+# Runs the analyses of app.py concurrently on one loaded dataset. The parent loads
+# the four tables and derives the per-fighter career columns once, then copies every
+# column into a shared memory segment per table. Pool workers attach to the segments
+# and wrap them in DataFrames without copying: numeric, datetime and boolean columns
+# are used in place, nullable integers are rebuilt from a values and a mask array,
+# and categorical and string columns travel as integer codes with their (small)
+# category list pickled alongside. The analyses get the tables through the usual
+# preloaded dict, whose shallow copies keep them zero-copy, and the career columns
+# as preloaded['career'].
+#
+#   python parallel_runner.py --output-dir results/ [--jobs 4] [--analyses eda clustering]
+#
+# Each analysis writes its figures and its printed output (<name>.txt) to the output
+# directory, next to a summary.json of the timings.
+
+ALIGNMENT = 64
+SUMMARY_FILE = 'summary.json'
+# app.COMMANDS minus the analyses already covered by another: career-length prints
+# and plots the same as regression-age
+DEFAULT_ANALYSES = ['eda', 'clustering', 'regression-age', 'regression-physical', 'survival']
+
+MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+_attached = {}
+
+
+def _column_arrays(series):
+    """
+    The arrays a column is shared as and how to rebuild it: (kind, {name: array}, extra),
+    where extra is the small picklable part (dtype or category list).
+    """
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype) and dtype.kind in 'biufcmM':
+        return 'array', {'values': series.to_numpy()}, None
+    if isinstance(dtype, pd.CategoricalDtype):
+        return 'category', {'codes': series.cat.codes.to_numpy()}, dtype
+    if isinstance(series.array, MASKED_ARRAYS):
+        values = series.to_numpy(dtype=dtype.numpy_dtype, na_value=0)
+        return 'masked', {'values': values, 'mask': series.isna().to_numpy()}, dtype
+    # Strings and anything else: integer codes into the distinct values
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    return 'factorized', {'codes': codes.astype(np.int32)}, (dtype, uniques)
+
+
+def _rebuild_column(kind, arrays, extra):
+    if kind == 'array':
+        return arrays['values']
+    if kind == 'category':
+        return pd.Categorical.from_codes(arrays['codes'], dtype=extra)
+    if kind == 'masked':
+        return extra.construct_array_type()(arrays['values'], arrays['mask'])
+    dtype, uniques = extra
+    # -1 codes (missing values) become the dtype's NA
+    return pd.Series(uniques.array.take(arrays['codes'], allow_fill=True), dtype=dtype).array
+
+
+class SharedTable:
+    """
+    One DataFrame's columns in a shared memory segment.
+
+    publish() copies the frame in; spec is the picklable description a worker passes
+    to attach() to map the same memory. The publishing process owns the segment and
+    must close() it, which also unlinks it.
+    """
+
+    def __init__(self, segment, spec):
+        self.segment = segment
+        self.spec = spec
+
+    @classmethod
+    def publish(cls, df):
+        indexed = df.index.name is not None or not df.index.equals(pd.RangeIndex(len(df)))
+        if indexed:
+            df = df.reset_index()
+        columns, offset = [], 0
+        for name in df.columns:
+            kind, arrays, extra = _column_arrays(df[name])
+            layout = {}
+            for key, values in arrays.items():
+                layout[key] = (offset, values.dtype.str, values.shape)
+                offset += -(-values.nbytes // ALIGNMENT) * ALIGNMENT
+            columns.append((name, kind, layout, extra, arrays))
+
+        segment = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        spec = {'segment': segment.name, 'rows': len(df), 'indexed': indexed, 'columns': []}
+        for name, kind, layout, extra, arrays in columns:
+            for key, (start, dtype, shape) in layout.items():
+                np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=start)[...] = arrays[key]
+            spec['columns'].append((name, kind, layout, pickle.dumps(extra)))
+        return cls(segment, spec)
+
+    @staticmethod
+    def attach(spec):
+        """Map a published table; returns (DataFrame over the shared memory, segment handle)."""
+        segment = shared_memory.SharedMemory(name=spec['segment'])
+        data = {}
+        for name, kind, layout, extra in spec['columns']:
+            arrays = {}
+            for key, (start, dtype, shape) in layout.items():
+                array = np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=start)
+                array.flags.writeable = False
+                arrays[key] = array
+            data[name] = _rebuild_column(kind, arrays, pickle.loads(extra))
+        df = pd.DataFrame(data, copy=False)
+        if spec['indexed']:
+            # publish() moved the index into the first column
+            df = df.set_index(df.columns[0])
+        return df, segment
+
+    def close(self):
+        self.segment.close()
+        self.segment.unlink()
+
+
+def derive_career_metrics(base_path, tables):
+    """The career columns of every fighter, indexed by fighter_id, derived once for all analyses."""
+    career = calculate_fighter_age_and_career_length(tables['fight'], tables['event'], tables['fighter'],
+                                                     state=load_career_state(base_path, tables['event'], tables['fight']))
+    return career.set_index('fighter_id')[DERIVED_COLUMNS]
+
+
+def _attach_all(specs):
+    # Pool initializer: map every shared table once per worker
+    for name, spec in specs.items():
+        _attached[name] = SharedTable.attach(spec)
+
+
+def _run_analysis(name, base_path, output_dir):
+    """Run one app.py analysis on the attached tables; its printed output goes to <name>.txt."""
+    from app import run_command
+
+    preloaded = {table: df for table, (df, _) in _attached.items()}
+    start = time.perf_counter()
+    error = None
+    with open(os.path.join(output_dir, f'{name}.txt'), 'w') as out, contextlib.redirect_stdout(out):
+        try:
+            run_command(name, base_path, preloaded, figure_dir=output_dir)
+        except Exception:
+            error = traceback.format_exc()
+            print(error)
+    return {'analysis': name, 'pid': os.getpid(), 'seconds': time.perf_counter() - start, 'error': error}
+
+
+def run_parallel(base_path='./data/', output_dir='results', analyses=None, jobs=None):
+    """
+    Load and derive once, share, and run the analyses in a process pool.
+
+    Returns the summary written to <output_dir>/summary.json: setup time, per-analysis
+    times and errors, and the total wall time.
+    """
+    analyses = analyses or DEFAULT_ANALYSES
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    tables = dict(zip(TABLES, load_tables(base_path, *TABLES)))
+    tables['career'] = derive_career_metrics(base_path, tables)
+    shared = {name: SharedTable.publish(df) for name, df in tables.items()}
+    del tables
+    setup_s = time.perf_counter() - start
+
+    results = []
+    try:
+        specs = {name: table.spec for name, table in shared.items()}
+        with ProcessPoolExecutor(max_workers=jobs or min(len(analyses), os.cpu_count()),
+                                 initializer=_attach_all, initargs=(specs,)) as pool:
+            futures = [pool.submit(_run_analysis, name, base_path, output_dir) for name in analyses]
+            for future in as_completed(futures):
+                results.append(future.result())
+    finally:
+        for table in shared.values():
+            table.close()
+
+    results.sort(key=lambda result: analyses.index(result['analysis']))
+    summary = {
+        'base_path': base_path,
+        'setup_s': setup_s,
+        'shared_mb': sum(table.segment.size for table in shared.values()) / 1e6,
+        'analyses': results,
+        'wall_s': time.perf_counter() - start,
+    }
+    with open(os.path.join(output_dir, SUMMARY_FILE), 'w') as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+def main():
+    from app import COMMANDS
+
+    parser = argparse.ArgumentParser(description="Run the analyses concurrently on one shared, loaded dataset.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--output-dir', default='results', help="figures, printed output and summary.json go here")
+    parser.add_argument('--analyses', nargs='+', choices=list(COMMANDS), default=DEFAULT_ANALYSES)
+    parser.add_argument('--jobs', type=int, help="worker processes (default: one per analysis, up to the CPU count)")
+    args = parser.parse_args()
+
+    summary = run_parallel(args.base_path, args.output_dir, args.analyses, args.jobs)
+    print(f"Loaded, derived and shared {summary['shared_mb']:.1f} MB in {summary['setup_s']:.2f}s")
+    for result in summary['analyses']:
+        status = 'failed' if result['error'] else 'ok'
+        print(f"  {result['analysis']:<22} {result['seconds']:7.2f}s  {status}")
+    total = sum(result['seconds'] for result in summary['analyses'])
+    print(f"Wall time {summary['wall_s']:.2f}s (analyses sum to {total:.2f}s); output in {args.output_dir}")
+    if any(result['error'] for result in summary['analyses']):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
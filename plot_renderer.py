@@ -0,0 +1,166 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use('Agg')  # headless: figures are only ever written to disk
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.colors import LogNorm
+
+from instrumentation import traced
+
+# Headless figure rendering for the analysis scripts. The scripts reduce their data
+# to a small figure spec (NumPy pre-binned histograms or a stratified sample of
+# points, never the full frame), and render_figures draws the specs in worker
+# processes and writes each one to disk. Render time depends on the number of bins
+# and sampled points, not on the number of rows.
+
+MAX_POINTS = 20000   # points drawn in a scatter before it is stratified-sampled
+KDE_SAMPLE = 5000    # values used to estimate a histogram's KDE curve
+PAIR_BINS = 40       # bins per axis of a binned pair-plot panel
+
+
+def _finite(values):
+    values = np.asarray(values, dtype='float64')
+    return values[np.isfinite(values)]
+
+
+def stratified_sample(labels, max_points, seed=0):
+    """
+    Row positions of a random sample of at most ~max_points rows, taken proportionally
+    from every label so small groups stay visible (each keeps at least one row).
+    """
+    labels = np.asarray(labels)
+    if len(labels) <= max_points:
+        return np.arange(len(labels))
+    rng = np.random.default_rng(seed)
+    _, inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+    quota = np.maximum(1, np.floor(counts * max_points / len(labels))).astype('int64')
+
+    # Shuffle within each label, then keep the first `quota` rows of every label
+    order = np.lexsort((rng.random(len(labels)), inverse))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(len(labels)) - starts[inverse[order]]
+    return np.sort(order[rank < quota[inverse[order]]])
+
+
+def histogram_figure(values, path, bins=20, kde=False, title="", xlabel="", ylabel=""):
+    """Spec for a histogram of values; the KDE curve, if any, is estimated on a sample."""
+    values = _finite(values)
+    counts, edges = np.histogram(values, bins=bins)
+    spec = {'kind': 'histogram', 'path': path, 'counts': counts, 'edges': edges,
+            'title': title, 'xlabel': xlabel, 'ylabel': ylabel}
+    if kde and len(values) > 1 and values.std() > 0:
+        from scipy.stats import gaussian_kde
+
+        sample = values if len(values) <= KDE_SAMPLE else np.random.default_rng(0).choice(values, KDE_SAMPLE, replace=False)
+        grid = np.linspace(edges[0], edges[-1], 200)
+        # Scale the density to the histogram's counts
+        spec['kde'] = (grid, gaussian_kde(sample)(grid) * len(values) * (edges[1] - edges[0]))
+    return spec
+
+
+def pairgrid_figure(df, columns, path, bins=PAIR_BINS, max_points=MAX_POINTS):
+    """
+    Spec for a pair plot of the given columns.
+
+    Diagonal panels are histograms. Off-diagonal panels are scatters when the frame has
+    at most max_points complete rows and 2-D histograms computed with NumPy otherwise.
+    """
+    values = df[columns].to_numpy(dtype='float64')
+    values = values[np.isfinite(values).all(axis=1)]
+    edges = [np.histogram_bin_edges(values[:, i], bins=bins) for i in range(len(columns))]
+    # Bin every column once; each 2-D panel is then a bincount over pairs of bin indices
+    binned = [np.clip(np.searchsorted(edges[i], values[:, i], side='right') - 1, 0, len(edges[i]) - 2)
+              for i in range(len(columns))]
+    panels = {}
+    for i in range(len(columns)):
+        panels[i, i] = np.bincount(binned[i], minlength=len(edges[i]) - 1)
+        for j in range(i + 1, len(columns)):
+            if len(values) > max_points:
+                # Row i is the y axis, column j the x axis
+                nx = len(edges[j]) - 1
+                counts = np.bincount(binned[i] * nx + binned[j], minlength=(len(edges[i]) - 1) * nx)
+                panels[i, j] = counts.reshape(len(edges[i]) - 1, nx)
+                panels[j, i] = panels[i, j].T
+    return {'kind': 'pairgrid', 'path': path, 'columns': list(columns), 'edges': edges, 'panels': panels,
+            'points': values if len(values) <= max_points else None}
+
+
+def scatter_figure(x, y, labels, path, max_points=MAX_POINTS, title="", xlabel="", ylabel="", colorbar=""):
+    """Spec for a scatter coloured by labels, stratified-sampled down to about max_points."""
+    x, y, labels = np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64'), np.asarray(labels)
+    keep = stratified_sample(labels, max_points)
+    return {'kind': 'scatter', 'path': path, 'x': x[keep], 'y': y[keep], 'labels': labels[keep], 'rows': len(x),
+            'title': title, 'xlabel': xlabel, 'ylabel': ylabel, 'colorbar': colorbar}
+
+
+def _draw_histogram(spec):
+    fig, ax = plt.subplots()
+    edges = spec['edges']
+    ax.bar(edges[:-1], spec['counts'], width=np.diff(edges), align='edge', alpha=0.6, edgecolor='white')
+    if 'kde' in spec:
+        ax.plot(*spec['kde'])
+    ax.set_title(spec['title'])
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    return fig
+
+
+def _draw_pairgrid(spec):
+    columns, edges, points = spec['columns'], spec['edges'], spec['points']
+    n = len(columns)
+    fig, axes = plt.subplots(n, n, figsize=(2.5 * n, 2.5 * n), squeeze=False)
+    for i in range(n):
+        for j in range(n):
+            ax = axes[i, j]
+            if i == j:
+                ax.bar(edges[i][:-1], spec['panels'][i, i], width=np.diff(edges[i]), align='edge', edgecolor='white')
+            elif points is not None:
+                ax.scatter(points[:, j], points[:, i], s=8, alpha=0.6)
+            else:
+                counts = np.ma.masked_equal(spec['panels'][i, j], 0)
+                ax.pcolormesh(edges[j], edges[i], counts, norm=LogNorm(), cmap='Blues')
+            if i == n - 1:
+                ax.set_xlabel(columns[j])
+            if j == 0:
+                ax.set_ylabel(columns[i])
+    fig.tight_layout()
+    return fig
+
+
+def _draw_scatter(spec):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    points = ax.scatter(spec['x'], spec['y'], c=spec['labels'], cmap='viridis', alpha=0.6, edgecolors='w', linewidth=0.5)
+    title = spec['title']
+    if len(spec['x']) < spec['rows']:
+        title += f" ({len(spec['x']):,} of {spec['rows']:,} fighters)"
+    ax.set_title(title)
+    ax.set_xlabel(spec['xlabel'])
+    ax.set_ylabel(spec['ylabel'])
+    fig.colorbar(points, ax=ax, label=spec['colorbar'])
+    ax.grid(True, linestyle='--', alpha=0.6)
+    return fig
+
+
+DRAW = {'histogram': _draw_histogram, 'pairgrid': _draw_pairgrid, 'scatter': _draw_scatter}
+
+
+def render_figure(spec):
+    """Draw one figure spec and write it to spec['path']; module-level so the pool can pickle it."""
+    fig = DRAW[spec['kind']](spec)
+    directory = os.path.dirname(spec['path'])
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fig.savefig(spec['path'])
+    plt.close(fig)
+    return spec['path']
+
+
+@traced
+def render_figures(specs, n_jobs=None):
+    """Render figure specs in parallel worker processes; returns the written paths."""
+    if n_jobs == 1 or len(specs) <= 1:
+        return [render_figure(spec) for spec in specs]
+    with ProcessPoolExecutor(max_workers=min(n_jobs or os.cpu_count(), len(specs))) as pool:
+        return list(pool.map(render_figure, specs))
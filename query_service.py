@@ -0,0 +1,426 @@
+import argparse
+import json
+import math
+import os
+import socketserver
+import stat
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from career_metrics import calculate_fighter_age_and_career_length, load_career_state
+from data_loader import TABLES, load_tables
+from join_index import load_join_index
+from weight_classes import fighter_divisions, prepare_fighter_data
+
+# Long-running local query service over the derived fighter table. The tables are
+# loaded and the career columns derived once; lookups are then answered from
+# prebuilt indexes and column arrays instead of re-running the load/merge/groupby
+# per question:
+#
+#   GET /fighter/<fighter_id>          one fighter's attributes and career metrics
+#   GET /weight-class                  the divisions with their fighter counts
+#   GET /weight-class/<name>           aggregate career metrics of one division
+#   GET /event/<event_id>              an event's fights and its fighters' ages
+#   GET /status                        data generation, load time and cache statistics
+#
+# A fighter's division is their primary division, the one they fought in most
+# (weight_classes.fighter_divisions), rather than the class of their listed weight.
+# A fighter is one row read across the prebuilt column arrays. An event is a slice of
+# the fights sorted by event, whose names and fighter ages are computed for every
+# fight at load. Division aggregates go through an LRU cache. The source CSVs are
+# polled and the whole store is rebuilt in the background when one changes; the
+# new store, with an empty cache, replaces the old one in a single assignment, so
+# requests never see a half-loaded state.
+#
+#   python query_service.py [--port 8765 | --socket /tmp/ufc.sock] [--base-path ./data/]
+
+SOURCE_TABLES = ('event', 'fight', 'fighter')
+DEFAULT_PORT = 8765
+CACHE_SIZE = 256
+POLL_SECONDS = 2.0
+FIGHTER_COLUMNS = ['fighter_id', 'fighter_f_name', 'fighter_l_name', 'fighter_nickname', 'fighter_stance',
+                   'fighter_weight_class', 'primary_division', 'last_division', 'divisions_fought',
+                   'fighter_height_cm', 'fighter_reach_cm', 'fighter_weight_lbs', 'fighter_dob', 'fighter_w',
+                   'fighter_l', 'fighter_d', 'event_date_first', 'event_date_last', 'age_at_debut', 'age_at_last_fight',
+                   'career_length_years']
+AGGREGATE_COLUMNS = ['age_at_debut', 'age_at_last_fight', 'career_length_years', 'fighter_height_cm',
+                     'fighter_reach_cm', 'fighter_weight_lbs']
+
+
+class QueryError(Exception):
+    """A request that cannot be answered; carries the HTTP status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _slug(name):
+    return str(name).strip().lower().replace("'", '').replace(' ', '-')
+
+
+def _json_value(value):
+    """Plain JSON value for numpy/pandas scalars: NaN and NaT become null, dates ISO strings."""
+    if value is None or value is pd.NA or value is pd.NaT:
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        value = pd.Timestamp(value)
+        return None if pd.isna(value) else value.date().isoformat()
+    if isinstance(value, (np.integer, int)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return None if math.isnan(value) else round(float(value), 4)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    return value
+
+
+def _records(df):
+    return [{col: _json_value(value) for col, value in zip(df.columns, row)} for row in df.itertuples(index=False)]
+
+
+def _column_array(series):
+    """A column as a numpy array _json_value reads one element of: float64 (NaN), datetime64 or object."""
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series.to_numpy(dtype='float64', na_value=np.nan)
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.to_numpy(dtype='datetime64[D]')
+    return series.to_numpy(dtype=object, na_value=None)
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with hit, miss and eviction counts."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        # Compute outside the lock; two threads may race on a miss, which is harmless
+        value = compute()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._items), 'maxsize': self.maxsize, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+
+class FighterStore:
+    """
+    The derived fighter table with its indexes, built once per data generation.
+
+    Parameters:
+        fighters (pd.DataFrame): Fighter table with the career, weight-class and division columns.
+        events, fights (pd.DataFrame): Event and fight tables.
+        stamp (tuple): (size, mtime_ns) of each source CSV at load time.
+        cache_size (int): Entries of the aggregate LRU cache.
+    """
+
+    def __init__(self, fighters, events, fights, fight_counts, stamp, cache_size=CACHE_SIZE):
+        self.fighters = fighters.reset_index(drop=True)
+        self.events = events.reset_index(drop=True)
+        self.stamp = stamp
+        self.loaded_at = time.time()
+        self.cache = LRUCache(cache_size)
+
+        # fighter_id -> row, event_id -> row: dense arrays, -1 where unknown
+        ids = self.fighters['fighter_id'].to_numpy(dtype=np.int64)
+        self.fighter_row = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+        self.fighter_row[ids] = np.arange(len(ids))
+        self.fighter_fights = fight_counts
+        self.fighter_columns = {col: _column_array(self.fighters[col]) for col in FIGHTER_COLUMNS}
+        names = self.fighters['fighter_f_name'].fillna('') + ' ' + self.fighters['fighter_l_name'].fillna('')
+        fighter_name = names.str.strip().to_numpy(dtype=object)
+        fighter_dob = pd.to_datetime(self.fighters['fighter_dob']).to_numpy(dtype='datetime64[D]')
+        event_ids = self.events['event_id'].to_numpy(dtype=np.int64)
+        self.event_row = np.full(int(event_ids.max()) + 1 if len(event_ids) else 0, -1, dtype=np.int64)
+        self.event_row[event_ids] = np.arange(len(event_ids))
+        self.event_date = pd.to_datetime(self.events['event_date']).to_numpy(dtype='datetime64[D]')
+        self.event_columns = {col: _column_array(self.events[col])
+                              for col in ['event_name', 'event_city', 'event_state', 'event_country']}
+
+        # event_id -> fights: fight rows sorted by event, CSR pointers per event_id
+        fights = fights.sort_values(['event_id', 'fight_id'], kind='stable').reset_index(drop=True)
+        fight_event = fights['event_id'].to_numpy(dtype=np.int64)
+        self.event_indptr = np.zeros(len(self.event_row) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(fight_event, minlength=len(self.event_row)), out=self.event_indptr[1:])
+
+        # The fight records of every event, column by column, with each corner's name and
+        # age on the event date (NaN where the fighter or a date is unknown)
+        self.fight_columns = {col: _column_array(fights[col]) for col in ['fight_id', 'weight_class', 'result', 'winner']}
+        fight_date = self.event_date[self.event_row[fight_event]]
+        ages = []
+        for corner in ('f_1', 'f_2'):
+            ids = fights[corner].to_numpy(dtype='float64', na_value=np.nan)
+            known = ~np.isnan(ids) & (ids < len(self.fighter_row))
+            rows = np.full(len(ids), -1, dtype=np.int64)
+            rows[known] = self.fighter_row[ids[known].astype(np.int64)]
+            found = rows >= 0
+            name = np.full(len(ids), None, dtype=object)
+            name[found] = fighter_name[rows[found]]
+            dob = np.full(len(ids), np.datetime64('NaT'), dtype='datetime64[D]')
+            dob[found] = fighter_dob[rows[found]]
+            age = fight_date - dob
+            self.fight_columns[corner] = _column_array(fights[corner])
+            self.fight_columns[f'{corner}_name'] = name
+            self.fight_columns[f'{corner}_age'] = np.where(np.isnat(age), np.nan, age.astype('float64')) / 365.25
+            ages.append(self.fight_columns[f'{corner}_age'])
+        # Mean age of the fighters with a known age per event, from per-event sums and counts
+        ages = np.concatenate(ages)
+        event_of = np.concatenate([fight_event, fight_event])
+        known = ~np.isnan(ages)
+        age_sum = np.bincount(event_of[known], weights=ages[known], minlength=len(self.event_row))
+        age_count = np.bincount(event_of[known], minlength=len(self.event_row))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.event_mean_age = age_sum / age_count
+
+        # primary division slug -> fighter rows
+        classes = self.fighters['primary_division'].astype(object).fillna('Unknown')
+        self.weight_classes = {_slug(name): (name, rows) for name, rows in classes.groupby(classes).indices.items()}
+
+    @classmethod
+    def load(cls, base_path, cache_size=CACHE_SIZE):
+        stamp = source_stamp(base_path)
+        event_data, fight_data, fighter_data = load_tables(base_path, *SOURCE_TABLES)
+        index = load_join_index(base_path)
+        fighters = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data,
+                                                           state=load_career_state(base_path, event_data, fight_data))
+        fighters = fighter_divisions(prepare_fighter_data(fighters), fight_data, index)
+        fight_counts = np.diff(index.indptr)
+        return cls(fighters, event_data, fight_data, fight_counts, stamp, cache_size)
+
+    def _fighter_row(self, fighter_id):
+        if not 0 <= fighter_id < len(self.fighter_row) or self.fighter_row[fighter_id] < 0:
+            raise QueryError(404, f"unknown fighter_id {fighter_id}")
+        return self.fighter_row[fighter_id]
+
+    def fighter(self, fighter_id):
+        row = self._fighter_row(fighter_id)
+        record = {col: _json_value(values[row]) for col, values in self.fighter_columns.items()}
+        record['fights'] = int(self.fighter_fights[fighter_id]) if fighter_id < len(self.fighter_fights) else 0
+        return record
+
+    def weight_class_list(self):
+        return [{'weight_class': name, 'slug': slug, 'fighters': len(rows)}
+                for slug, (name, rows) in sorted(self.weight_classes.items(), key=lambda item: -len(item[1][1]))]
+
+    def weight_class(self, slug):
+        if slug not in self.weight_classes:
+            raise QueryError(404, f"unknown division '{slug}'; see /weight-class")
+        return self.cache.get_or_compute(('weight-class', slug), lambda: self._weight_class_summary(slug))
+
+    def _weight_class_summary(self, slug):
+        name, rows = self.weight_classes[slug]
+        data = self.fighters.iloc[rows]
+        values = data[AGGREGATE_COLUMNS].astype('float64')
+        longest = data.nlargest(5, 'career_length_years')[['fighter_id', 'fighter_f_name', 'fighter_l_name',
+                                                           'career_length_years']]
+        return {
+            'weight_class': name,
+            'fighters': len(data),
+            'with_fights': int(data['event_date_last'].notna().sum()),
+            'mean': {col: _json_value(value) for col, value in values.mean().items()},
+            'median': {col: _json_value(value) for col, value in values.median().items()},
+            'longest_careers': _records(longest),
+        }
+
+    def event(self, event_id):
+        if not 0 <= event_id < len(self.event_row) or self.event_row[event_id] < 0:
+            raise QueryError(404, f"unknown event_id {event_id}")
+        row = self.event_row[event_id]
+        fights = slice(self.event_indptr[event_id], self.event_indptr[event_id + 1])
+        columns = {col: values[fights] for col, values in self.fight_columns.items()}
+        return {
+            'event_id': event_id,
+            'event_name': _json_value(self.event_columns['event_name'][row]),
+            'event_date': _json_value(self.event_date[row]),
+            'location': ', '.join(str(self.event_columns[col][row]) for col in ['event_city', 'event_state', 'event_country']
+                                  if self.event_columns[col][row] is not None),
+            'fights': [{col: _json_value(value) for col, value in zip(columns, values)} for values in zip(*columns.values())],
+            'mean_fighter_age': _json_value(self.event_mean_age[event_id]),
+        }
+
+
+def source_stamp(base_path):
+    """(size, mtime_ns) of each source CSV; any change triggers a reload."""
+    stamps = []
+    for table in SOURCE_TABLES:
+        stat = os.stat(os.path.join(base_path, TABLES[table]))
+        stamps.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(stamps)
+
+
+class QueryService:
+    """
+    Routes queries to the current FighterStore and keeps it in step with the data.
+
+    Parameters:
+        base_path (str): Directory of the source CSVs.
+        cache_size (int): Entries of each store's aggregate LRU cache.
+        poll_seconds (float): Interval of the source file check; 0 disables hot reload.
+    """
+
+    def __init__(self, base_path='./data/', cache_size=CACHE_SIZE, poll_seconds=POLL_SECONDS):
+        self.base_path = base_path
+        self.cache_size = cache_size
+        self.poll_seconds = poll_seconds
+        self.generation = 1
+        self.reloads_failed = 0
+        start = time.perf_counter()
+        self.store = FighterStore.load(base_path, cache_size)
+        self.load_seconds = time.perf_counter() - start
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def reload_if_changed(self):
+        """Rebuild the store when a source CSV changed; returns True if it was replaced."""
+        try:
+            if source_stamp(self.base_path) == self.store.stamp:
+                return False
+            start = time.perf_counter()
+            store = FighterStore.load(self.base_path, self.cache_size)
+        except (OSError, ValueError, KeyError):
+            # Keep serving the last good data, e.g. while a CSV is half-written
+            self.reloads_failed += 1
+            return False
+        self.store, self.generation, self.load_seconds = store, self.generation + 1, time.perf_counter() - start
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            self.reload_if_changed()
+
+    def start_watching(self):
+        if self.poll_seconds and self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, name='source-watcher', daemon=True)
+            self._watcher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def query(self, path):
+        """Answer one GET path; raises QueryError for bad or unknown keys."""
+        store = self.store  # one consistent generation for the whole request
+        parts = [unquote(part) for part in path.strip('/').split('/') if part]
+        if parts == ['status']:
+            return {'generation': self.generation, 'base_path': self.base_path, 'fighters': len(store.fighters),
+                    'events': len(store.events), 'loaded_at': store.loaded_at, 'load_seconds': self.load_seconds,
+                    'reloads_failed': self.reloads_failed, 'cache': store.cache.stats()}
+        if parts == ['weight-class']:
+            return store.weight_class_list()
+        if len(parts) == 2 and parts[0] == 'weight-class':
+            return store.weight_class(_slug(parts[1]))
+        if len(parts) == 2 and parts[0] in ('fighter', 'event'):
+            try:
+                key = int(parts[1])
+            except ValueError:
+                raise QueryError(400, f"{parts[0]} id must be an integer, got '{parts[1]}'") from None
+            return store.fighter(key) if parts[0] == 'fighter' else store.event(key)
+        raise QueryError(404, f"no route for '{path}'")
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so a client can reuse its connection
+    # Buffer the response so headers and body leave in one write (flushed after each
+    # request); separate small writes stall ~40ms on Nagle plus delayed ACK
+    wbufsize = -1
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        try:
+            status, payload = 200, self.server.service.query(url.path)
+        except QueryError as error:
+            status, payload = error.status, {'error': str(error)}
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # Replace a socket left by an earlier run, but never any other file at the path
+        if _is_socket(self.server_address):
+            os.unlink(self.server_address)
+        elif os.path.lexists(self.server_address):
+            raise FileExistsError(f"{self.server_address} exists and is not a socket")
+        super().server_bind()
+        self.server_name, self.server_port = 'localhost', 0
+
+
+def make_server(service, host='127.0.0.1', port=DEFAULT_PORT, socket_path=None, verbose=False):
+    """HTTP server for the service on host:port, or on a Unix socket when socket_path is given."""
+    server = UnixHTTPServer(socket_path, QueryHandler) if socket_path else ThreadingHTTPServer((host, port), QueryHandler)
+    server.service, server.verbose = service, verbose
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve fighter career-metric queries from memory.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--socket', help="listen on this Unix socket instead of TCP")
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+    parser.add_argument('--poll-seconds', type=float, default=POLL_SECONDS, help="source check interval, 0 to disable")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args(argv)
+
+    service = QueryService(args.base_path, args.cache_size, args.poll_seconds)
+    service.start_watching()
+    server = make_server(service, args.host, args.port, args.socket, args.verbose)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Loaded {len(service.store.fighters)} fighters in {service.load_seconds:.2f}s; serving on {where}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+        if args.socket and _is_socket(args.socket):
+            os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, load_tables
+
+# Sequential Elo / Glicko-1 ratings over the fight history. Fights are processed in
+# date order against arrays indexed by fighter_id. Fights on the same date are
+# independent unless a fighter appears twice (the early tournaments), so each date is
+# split into batches where every fighter appears at most once and a batch is updated
+# with vectorized gathers and scatters. Every post-fight rating is appended to a
+# history, which answers "rating of fighter X on date D" by binary search, and the
+# whole state is saved as a snapshot that later events are applied to incrementally.
+
+METHODS = ('elo', 'glicko')
+INITIAL_RATING = 1500.0
+INITIAL_RD = 350.0
+K_FACTOR = 32.0
+# Glicko: RD grows by GLICKO_C per RATING_PERIOD_DAYS of inactivity (back to 350
+# after ~5 years out), and never falls below MIN_RD
+GLICKO_C = 45.0
+RATING_PERIOD_DAYS = 30
+MIN_RD = 30.0
+# Title fights and finishes move ratings further
+TITLE_WEIGHT = 1.25
+FINISH_WEIGHT = 1.1
+FINISHES = ['KO/TKO', 'Submission', "TKO - Doctor's Stoppage"]
+
+STATE_FILE = 'rating_state_{method}.npz'
+_Q = np.log(10) / 400
+
+
+def _days(dates):
+    return pd.to_datetime(pd.Series(dates)).to_numpy(dtype='datetime64[D]').astype(np.int64)
+
+
+def _ids(column):
+    return column.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _glicko_g(rd):
+    return 1 / np.sqrt(1 + 3 * _Q ** 2 * rd ** 2 / np.pi ** 2)
+
+
+def _batches(day, f1, f2):
+    """
+    Batch number per fight, for fights sorted by date.
+
+    Batches follow date order and no fighter appears twice in one batch: a fighter's
+    second fight of a day goes into the next batch of that day.
+    """
+    rounds = np.zeros(len(day), dtype=np.int64)
+    fighters = np.concatenate([f1, f2])
+    days = np.concatenate([day, day])
+    known = ~np.isnan(fighters)
+    pairs = np.unique(np.column_stack([days[known], fighters[known]]), axis=0, return_counts=True)
+    repeat_days = np.unique(pairs[0][pairs[1] > 1, 0])
+    # Only the days with a repeated fighter need the sequential pass
+    last_round, current_day = {}, None
+    for i in np.flatnonzero(np.isin(day, repeat_days)):
+        if day[i] != current_day:
+            last_round, current_day = {}, day[i]
+        r = max(last_round.get(f1[i], -1), last_round.get(f2[i], -1)) + 1
+        rounds[i] = r
+        for f in (f1[i], f2[i]):
+            if not np.isnan(f):
+                last_round[f] = r
+    return np.unique(day * (rounds.max() + 1) + rounds, return_inverse=True)[1].ravel()
+
+
+class RatingEngine:
+    """
+    Elo or Glicko-1 ratings with array-backed state and a rating history.
+
+    Parameters:
+        method (str): 'elo' or 'glicko'.
+        k (float): Elo K-factor; Glicko steps are scaled by k / K_FACTOR too.
+    """
+
+    def __init__(self, method='elo', k=K_FACTOR):
+        if method not in METHODS:
+            raise ValueError(f"Unknown rating method '{method}', expected one of {METHODS}")
+        self.method = method
+        self.k = float(k)
+        self.rating = np.empty(0)
+        self.rd = np.empty(0)
+        self.last_day = np.empty(0, dtype=np.int64)
+        self.fights = np.empty(0, dtype=np.int64)
+        self.watermark = -1          # highest event_id processed
+        self.max_day = np.iinfo(np.int64).min
+        # Per fight, in processing order: pre-fight ratings and f_1's expected score
+        self.pre_fight = {key: np.empty(0, dtype=dtype) for key, dtype in
+                          [('fight_id', np.int64), ('f_1_rating', float), ('f_2_rating', float),
+                           ('f_1_rd', float), ('f_2_rd', float), ('f_1_expected', float)]}
+        # One row per fighter per fight, after the fight
+        self.history = {key: np.empty(0, dtype=dtype) for key, dtype in
+                        [('fighter_id', np.int64), ('day', np.int64), ('rating', float), ('rd', float)]}
+        self._order = None
+
+    def _grow(self, size):
+        if size <= len(self.rating):
+            return
+        extra = size - len(self.rating)
+        self.rating = np.concatenate([self.rating, np.full(extra, INITIAL_RATING)])
+        self.rd = np.concatenate([self.rd, np.full(extra, INITIAL_RD)])
+        self.last_day = np.concatenate([self.last_day, np.full(extra, -1, dtype=np.int64)])
+        self.fights = np.concatenate([self.fights, np.zeros(extra, dtype=np.int64)])
+
+    def _current_rd(self, fighters, day):
+        """Glicko RD of fighters at the given day, inflated for the time since their last fight."""
+        rd = self.rd[fighters]
+        last = self.last_day[fighters]
+        periods = np.where(last >= 0, (day - last) / RATING_PERIOD_DAYS, 0.0)
+        return np.minimum(np.sqrt(rd ** 2 + GLICKO_C ** 2 * periods), INITIAL_RD)
+
+    @staticmethod
+    def _fight_table(fight_data, event_data):
+        fights = fight_data[['fight_id', 'event_id', 'f_1', 'f_2', 'winner', 'result', 'title_fight']].copy()
+        event_days = pd.Series(_days(event_data['event_date']), index=event_data['event_id'].to_numpy())
+        fights['day'] = fights['event_id'].map(event_days)
+        fights = fights.dropna(subset=['day']).sort_values(['day', 'event_id', 'fight_id'], kind='stable')
+        f1, f2, winner = _ids(fights['f_1']), _ids(fights['f_2']), _ids(fights['winner'])
+        # f_1's score: 1 win, 0 loss, 0.5 draw (no winner after a decision); NaN = no contest
+        score = np.where(winner == f1, 1.0, np.where(winner == f2, 0.0, np.nan))
+        draw = np.isnan(winner) & (fights['result'].astype(object) == 'Decision').to_numpy()
+        score[draw] = 0.5
+        weight = np.where((fights['title_fight'].astype(object) == 'T').to_numpy(), TITLE_WEIGHT, 1.0) * \
+            np.where(fights['result'].isin(FINISHES).to_numpy(), FINISH_WEIGHT, 1.0)
+        return {'fight_id': fights['fight_id'].to_numpy(dtype=np.int64), 'event_id': fights['event_id'].to_numpy(dtype=np.int64),
+                'day': fights['day'].to_numpy(dtype=np.int64), 'f1': f1, 'f2': f2, 'score': score, 'weight': weight}
+
+    def update(self, fight_data, event_data):
+        """
+        Process fights from events above the watermark, in date order.
+
+        The new fights must all be later than every fight already processed, otherwise
+        the ratings would be applied out of order (ValueError: rebuild from scratch).
+        Returns the number of fights processed.
+        """
+        table = self._fight_table(fight_data[fight_data['event_id'] > self.watermark], event_data)
+        n = len(table['fight_id'])
+        if not n:
+            return 0
+        if table['day'][0] <= self.max_day:
+            raise ValueError("New fights predate the rating state; rebuild it from the full history.")
+
+        f1, f2 = table['f1'], table['f2']
+        known = np.concatenate([f1, f2])
+        self._grow(int(np.nanmax(known)) + 1)
+        batch = _batches(table['day'], f1, f2)
+        order = np.argsort(batch, kind='stable')
+        bounds = np.flatnonzero(np.diff(batch[order])) + 1
+
+        pre = {key: np.full(n, np.nan) for key in ['f_1_rating', 'f_2_rating', 'f_1_rd', 'f_2_rd', 'f_1_expected']}
+        hist_fighter, hist_day, hist_rating, hist_rd = [], [], [], []
+        for rows in np.split(order, bounds):
+            day = table['day'][rows[0]]
+            for side, ids in (('f_1', f1[rows]), ('f_2', f2[rows])):
+                ok = ~np.isnan(ids)
+                fighters = ids[ok].astype(np.int64)
+                pre[f'{side}_rating'][rows[ok]] = self.rating[fighters]
+                pre[f'{side}_rd'][rows[ok]] = self._current_rd(fighters, day)
+
+            both = ~np.isnan(f1[rows]) & ~np.isnan(f2[rows])
+            rows = rows[both]
+            a, b = f1[rows].astype(np.int64), f2[rows].astype(np.int64)
+            ra, rb = self.rating[a], self.rating[b]
+            score, weight = table['score'][rows], table['weight'][rows]
+            rated = ~np.isnan(score)  # a no contest changes nothing
+            if self.method == 'elo':
+                expected = 1 / (1 + 10 ** ((rb - ra) / 400))
+                delta = np.where(rated, self.k * weight * (score - expected), 0.0)
+                self.rating[a], self.rating[b] = ra + delta, rb - delta
+            else:
+                rda, rdb = pre['f_1_rd'][rows], pre['f_2_rd'][rows]
+                ga, gb = _glicko_g(rda), _glicko_g(rdb)
+                expected = 1 / (1 + 10 ** (-gb * (ra - rb) / 400))
+                expected_b = 1 / (1 + 10 ** (-ga * (rb - ra) / 400))
+                inv_a = 1 / rda ** 2 + _Q ** 2 * gb ** 2 * expected * (1 - expected)
+                inv_b = 1 / rdb ** 2 + _Q ** 2 * ga ** 2 * expected_b * (1 - expected_b)
+                scale = weight * self.k / K_FACTOR
+                step_a = np.where(rated, scale * _Q / inv_a * gb * (score - expected), 0.0)
+                step_b = np.where(rated, scale * _Q / inv_b * ga * ((1 - score) - expected_b), 0.0)
+                self.rating[a], self.rating[b] = ra + step_a, rb + step_b
+                self.rd[a] = np.where(rated, np.maximum(np.sqrt(1 / inv_a), MIN_RD), rda)
+                self.rd[b] = np.where(rated, np.maximum(np.sqrt(1 / inv_b), MIN_RD), rdb)
+            pre['f_1_expected'][rows] = expected
+            fighters = np.concatenate([a, b])
+            self.last_day[fighters] = day
+            self.fights[fighters] += 1
+            hist_fighter.append(fighters)
+            hist_day.append(np.full(len(fighters), day))
+            hist_rating.append(self.rating[fighters])
+            hist_rd.append(self.rd[fighters])
+
+        self.pre_fight['fight_id'] = np.concatenate([self.pre_fight['fight_id'], table['fight_id']])
+        for key, values in pre.items():
+            self.pre_fight[key] = np.concatenate([self.pre_fight[key], values])
+        for key, parts in [('fighter_id', hist_fighter), ('day', hist_day), ('rating', hist_rating), ('rd', hist_rd)]:
+            self.history[key] = np.concatenate([self.history[key]] + parts)
+        self._order = None
+        self.watermark = max(self.watermark, int(table['event_id'].max()))
+        self.max_day = int(table['day'].max())
+        return n
+
+    @classmethod
+    def build(cls, fight_data, event_data, method='elo', k=K_FACTOR):
+        engine = cls(method, k)
+        engine.update(fight_data, event_data)
+        return engine
+
+    def pre_fight_frame(self):
+        """Pre-fight ratings of both corners (and f_1's expected score) per fight_id."""
+        frame = pd.DataFrame(self.pre_fight)
+        if self.method == 'elo':
+            frame = frame.drop(columns=['f_1_rd', 'f_2_rd'])
+        frame['fight_id'] = frame['fight_id'].astype('int32')
+        return frame
+
+    def add_pre_fight_ratings(self, fight_data):
+        """fight_data with the pre-fight rating columns merged on fight_id."""
+        return fight_data.merge(self.pre_fight_frame(), on='fight_id', how='left')
+
+    def current_ratings(self):
+        """Latest rating, RD, fight count and last fight date of every rated fighter."""
+        fighters = np.flatnonzero(self.fights)
+        return pd.DataFrame({
+            'fighter_id': fighters.astype('int32'),
+            'rating': self.rating[fighters],
+            'rd': self._current_rd(fighters, self.max_day) if self.method == 'glicko' else np.nan,
+            'fights': self.fights[fighters],
+            'last_fight': self.last_day[fighters].astype('datetime64[D]'),
+        })
+
+    def _history_keys(self):
+        # Composite (fighter, day) key: fighter in the high bits, day offset into the low 32
+        return self.history['fighter_id'] * (1 << 32) + (self.history['day'] + (1 << 31))
+
+    def rating_at(self, fighter_ids, dates):
+        """
+        Ratings held on the given dates, i.e. after every fight strictly before that day
+        (so a fighter's rating on a fight day is the pre-fight rating of their first bout
+        that day).
+
+        Fighters without an earlier fight get the initial rating. Returns a DataFrame with
+        rating and, for Glicko, the RD inflated to the query date.
+        """
+        fighter_ids = np.atleast_1d(np.asarray(fighter_ids, dtype=np.int64))
+        days = np.broadcast_to(_days(np.atleast_1d(dates)), fighter_ids.shape)
+        keys = self._history_keys()
+        if self._order is None:
+            self._order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[self._order]
+        pos = np.searchsorted(sorted_keys, fighter_ids * (1 << 32) + (days + (1 << 31)), side='left') - 1
+        hit = pos >= 0
+        hit[hit] = self.history['fighter_id'][self._order[pos[hit]]] == fighter_ids[hit]
+        rows = self._order[pos[hit]]
+
+        rating = np.full(len(fighter_ids), INITIAL_RATING)
+        rating[hit] = self.history['rating'][rows]
+        result = pd.DataFrame({'fighter_id': fighter_ids, 'date': days.astype('datetime64[D]'), 'rating': rating})
+        if self.method == 'glicko':
+            rd = np.full(len(fighter_ids), INITIAL_RD)
+            periods = (days[hit] - self.history['day'][rows]) / RATING_PERIOD_DAYS
+            rd[hit] = np.minimum(np.sqrt(self.history['rd'][rows] ** 2 + GLICKO_C ** 2 * periods), INITIAL_RD)
+            result['rd'] = rd
+        return result
+
+    def save(self, path):
+        arrays = {f'pre_{key}': values for key, values in self.pre_fight.items()}
+        arrays.update({f'history_{key}': values for key, values in self.history.items()})
+        np.savez(path, method=np.array(self.method), k=np.float64(self.k), rating=self.rating, rd=self.rd,
+                 last_day=self.last_day, fights=self.fights, watermark=np.int64(self.watermark),
+                 max_day=np.int64(self.max_day), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            engine = cls(str(f['method']), float(f['k']))
+            engine.rating, engine.rd, engine.last_day, engine.fights = f['rating'], f['rd'], f['last_day'], f['fights']
+            engine.watermark, engine.max_day = int(f['watermark']), int(f['max_day'])
+            engine.pre_fight = {key: f[f'pre_{key}'] for key in engine.pre_fight}
+            engine.history = {key: f[f'history_{key}'] for key in engine.history}
+        return engine
+
+
+def update_rating_state(base_path, method='elo', state_path=None):
+    """Load the saved ratings (or build them), apply any new events and save them back."""
+    state_path = state_path or os.path.join(base_path, CACHE_DIR, STATE_FILE.format(method=method))
+    event_data, fight_data = load_tables(base_path, 'event', 'fight')
+    engine = RatingEngine.load(state_path) if os.path.exists(state_path) else RatingEngine(method)
+    try:
+        processed = engine.update(fight_data, event_data)
+    except ValueError:
+        engine = RatingEngine.build(fight_data, event_data, method)
+        processed = len(fight_data)
+    if processed:
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        engine.save(state_path)
+    return engine, processed
+
+
+def verify_incremental(fight_data, event_data, method='elo', split=0.8):
+    """
+    Build from the events before a cut-off date, save and reload, apply the rest, and
+    compare with a single full build. Returns the largest absolute rating difference.
+    """
+    import tempfile
+
+    dates = pd.to_datetime(event_data['event_date'])
+    cutoff = dates.quantile(split)
+    early_events = event_data.loc[dates < cutoff, 'event_id']
+    full = RatingEngine.build(fight_data, event_data, method)
+    partial = RatingEngine.build(fight_data[fight_data['event_id'].isin(early_events)], event_data, method)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'state.npz')
+        partial.save(path)
+        partial = RatingEngine.load(path)
+    # Later fights are those of events on or after the cut-off, whatever their event_id
+    partial.watermark = -1
+    partial.update(fight_data[~fight_data['event_id'].isin(early_events)], event_data)
+    a = full.pre_fight_frame().set_index('fight_id').sort_index()
+    b = partial.pre_fight_frame().set_index('fight_id').sort_index()
+    return float(np.nanmax(np.abs(a.to_numpy() - b.to_numpy())))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Elo / Glicko ratings over the UFC fight history.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--method', choices=METHODS, default='elo')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--verify', action='store_true', help="check incremental updates against a full rebuild")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine, processed = update_rating_state(args.base_path, args.method)
+    print(f"Processed {processed} new fights in {time.perf_counter() - start:.3f}s, watermark event_id={engine.watermark}")
+
+    fighters = load_tables(args.base_path, 'fighter')[0][['fighter_id', 'fighter_f_name', 'fighter_l_name']]
+    top = engine.current_ratings().merge(fighters, on='fighter_id').nlargest(args.top, 'rating')
+    print(top.to_string(index=False))
+
+    if args.verify:
+        event_data, fight_data = load_tables(args.base_path, 'event', 'fight')
+        print(f"\nMax |full - incremental| pre-fight rating difference: {verify_incremental(fight_data, event_data, args.method):.2e}")
+
+
+if __name__ == "__main__":
+    main()
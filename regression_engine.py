@@ -0,0 +1,228 @@
+import argparse
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+# Batch OLS over many predictor subsets from shared cross-products. The fighter
+# feature matrix is built once and split by missing-value pattern; each pattern
+# contributes one Gram matrix of [X, y]. A specification's X'X, X'y and y'y are the
+# sum of the Gram matrices of the patterns where all of its columns are present,
+# which is exactly listwise deletion (statsmodels' missing='drop') for that spec.
+
+TARGET = 'career_length_years'
+PREDICTORS = ['age_at_debut', 'fighter_height_cm', 'fighter_reach_cm', 'fighter_weight_lbs']
+SQUARED = ['age_at_debut', 'fighter_reach_cm', 'fighter_weight_lbs']
+
+
+def build_feature_matrix(fighter_data):
+    """
+    Build the regression columns once.
+
+    Returns the design frame (const, predictors, squared terms, stance dummies, target)
+    and the predictor groups: each group enters or leaves a specification as a whole,
+    so the stance dummies are always fitted together.
+    """
+    design = pd.DataFrame({'const': 1.0}, index=fighter_data.index)
+    groups = {}
+    for col in PREDICTORS:
+        design[col] = fighter_data[col].astype('float64')
+        groups[col] = [col]
+    for col in SQUARED:
+        design[f'{col}_sq'] = design[col] ** 2
+        groups[f'{col}_sq'] = [col, f'{col}_sq']
+    stance = pd.get_dummies(fighter_data['fighter_stance'], prefix='fighter_stance', drop_first=True, dtype='float64')
+    design = design.join(stance)
+    groups['stance'] = list(stance.columns)
+    design[TARGET] = fighter_data[TARGET].astype('float64')
+    return design, groups
+
+
+class RegressionEngine:
+    """
+    Cached cross-products of the fighter design matrix, one Gram matrix per missing pattern.
+
+    Parameters:
+        design (pd.DataFrame): Output of build_feature_matrix; the last column is the target.
+    """
+
+    def __init__(self, design, groups):
+        self.columns = list(design.columns)
+        self.groups = groups
+        self._design = design
+        values = design.to_numpy(dtype='float64')
+        present = ~np.isnan(values)
+        patterns, inverse = np.unique(present, axis=0, return_inverse=True)
+        filled = np.where(present, values, 0.0)
+
+        self.patterns = patterns
+        self.grams = np.zeros((len(patterns), len(self.columns), len(self.columns)))
+        for i in range(len(patterns)):
+            block = filled[inverse.ravel() == i]
+            self.grams[i] = block.T @ block
+
+    def _positions(self, columns):
+        return [self.columns.index(col) for col in columns]
+
+    def spec_columns(self, spec):
+        """Design columns for a specification given as a tuple of group names."""
+        columns = ['const']
+        for group in spec:
+            columns += [col for col in self.groups[group] if col not in columns]
+        return columns
+
+    def cross_products(self, columns):
+        """X'X, X'y, y'y and n over the rows where all columns and the target are present."""
+        pos = self._positions(columns)
+        target = self.columns.index(TARGET)
+        rows = self.patterns[:, pos + [target]].all(axis=1)
+        gram = self.grams[rows].sum(axis=0)
+        return gram[np.ix_(pos, pos)], gram[pos, target], gram[target, target], gram[0, 0], gram[0, target]
+
+    def fit(self, spec):
+        """OLS for one specification, straight from the cached cross-products."""
+        columns = self.spec_columns(spec)
+        xtx, xty, yty, n, sum_y = self.cross_products(columns)
+
+        # A stance dummy with no fighters among the complete rows is left out (coef NaN)
+        active = np.flatnonzero(np.diag(xtx) > 0)
+        xtx, xty = xtx[np.ix_(active, active)], xty[active]
+        xtx_inv = np.linalg.pinv(xtx)
+        p = np.linalg.matrix_rank(xtx)
+        beta = xtx_inv @ xty
+        ssr = yty - beta @ xty
+        sst = yty - sum_y ** 2 / n
+        dof = n - p
+        se = np.sqrt(np.diag(xtx_inv) * ssr / dof)
+        r2 = 1 - ssr / sst
+        # Gaussian log-likelihood at the MLE variance ssr / n, as statsmodels reports it
+        llf = -n / 2 * (np.log(2 * np.pi * ssr / n) + 1)
+
+        def expand(values):
+            full = np.full(len(columns), np.nan)
+            full[active] = values
+            return pd.Series(full, index=columns)
+
+        return {
+            'spec': ' + '.join(spec),
+            'n': int(n),
+            'r2': r2,
+            'adj_r2': 1 - (1 - r2) * (n - 1) / dof,
+            'llf': llf,
+            'aic': -2 * llf + 2 * p,
+            'coef': expand(beta),
+            'se': expand(se),
+            'pvalue': expand(2 * stats.t.sf(np.abs(beta / se), dof)),
+        }
+
+    def fit_specs(self, specs):
+        """Fit many specifications; returns one row per spec with fit statistics and coefficients."""
+        rows = []
+        for spec in specs:
+            result = self.fit(spec)
+            row = {key: result[key] for key in ['spec', 'n', 'r2', 'adj_r2', 'aic']}
+            row.update({f'coef_{col}': value for col, value in result['coef'].items()})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def all_specs(self, groups=None, max_size=None):
+        """
+        Every non-empty combination of predictor groups, up to max_size groups.
+
+        Combinations that expand to the same design columns (a squared term already
+        brings in its linear term) are kept only once.
+        """
+        groups = list(groups or self.groups)
+        max_size = max_size or len(groups)
+        specs, seen = [], set()
+        for size in range(1, max_size + 1):
+            for spec in itertools.combinations(groups, size):
+                columns = frozenset(self.spec_columns(spec))
+                if columns not in seen:
+                    seen.add(columns)
+                    specs.append(spec)
+        return specs
+
+    def complete_rows(self, spec):
+        columns = self.spec_columns(spec)
+        data = self._design[columns + [TARGET]].dropna()
+        columns = [col for col in columns if data[col].any()]
+        return data[columns].to_numpy(dtype='float64'), data[TARGET].to_numpy(dtype='float64'), columns
+
+    def bootstrap(self, spec, n_boot=1000, alpha=0.05, n_jobs=None, chunk_size=250, seed=42):
+        """
+        Percentile bootstrap confidence intervals for one specification.
+
+        Resamples are drawn as multinomial row counts, so each chunk of resamples becomes a
+        batch of weighted cross-products solved at once; chunks run across a process pool.
+        """
+        X, y, columns = self.complete_rows(spec)
+        sizes = [min(chunk_size, n_boot - start) for start in range(0, n_boot, chunk_size)]
+        seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+        tasks = [(X, y, size, child) for size, child in zip(sizes, seeds)]
+        if n_jobs == 1:
+            betas = [_bootstrap_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+                betas = list(pool.map(_bootstrap_chunk, tasks))
+        betas = np.vstack(betas)
+        lower, upper = np.percentile(betas, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+        return pd.DataFrame({'coef': np.linalg.lstsq(X, y, rcond=None)[0], 'ci_lower': lower, 'ci_upper': upper,
+                             'boot_se': betas.std(axis=0, ddof=1)}, index=columns)
+
+
+def _bootstrap_chunk(args):
+    """Fit one chunk of bootstrap resamples; module-level so the process pool can pickle it."""
+    X, y, size, seed = args
+    rng = np.random.default_rng(seed)
+    n = len(y)
+    counts = rng.multinomial(n, np.full(n, 1.0 / n), size=size).astype('float64')
+    xtx = np.einsum('bn,ni,nj->bij', counts, X, X, optimize=True)
+    xty = np.einsum('bn,ni,n->bi', counts, X, y, optimize=True)
+    return (np.linalg.pinv(xtx) @ xty[..., None])[..., 0]
+
+
+def load_fighter_table(base_path):
+    """Fighter data with the career-length columns, as used by both regression scripts."""
+    from career_metrics import calculate_fighter_age_and_career_length, load_career_state
+    from data_loader import load_tables
+
+    event_data, fight_data, fighter_data = load_tables(base_path, 'event', 'fight', 'fighter')
+    return calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data,
+                                                   state=load_career_state(base_path, event_data, fight_data))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Screen OLS specifications for career length.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--bootstrap', type=int, default=0, help="bootstrap resamples for the best spec")
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    design, groups = build_feature_matrix(load_fighter_table(args.base_path))
+    start = time.perf_counter()
+    engine = RegressionEngine(design, groups)
+    build_s = time.perf_counter() - start
+
+    specs = engine.all_specs()
+    start = time.perf_counter()
+    results = engine.fit_specs(specs)
+    fit_s = time.perf_counter() - start
+    print(f"Cached {len(engine.patterns)} missing-pattern Gram matrices in {build_s:.4f}s")
+    print(f"Fitted {len(specs)} specifications in {fit_s:.3f}s")
+    print(results.sort_values('adj_r2', ascending=False)[['spec', 'n', 'r2', 'adj_r2', 'aic']].head(args.top).to_string(index=False))
+
+    if args.bootstrap:
+        best = specs[int(results['adj_r2'].idxmax())]
+        start = time.perf_counter()
+        ci = engine.bootstrap(best, n_boot=args.bootstrap, n_jobs=args.jobs)
+        print(f"\nBootstrap CIs for {' + '.join(best)} ({args.bootstrap} resamples, {time.perf_counter() - start:.2f}s):")
+        print(ci)
+
+
+if __name__ == "__main__":
+    main()
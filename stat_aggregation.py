@@ -0,0 +1,172 @@
+import argparse
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from clean_fight_data import parse_time_seconds
+from data_loader import STAT_DTYPE, TABLES, fresh_parquet_cache
+from fight_features import STAT_COLUMNS
+
+# Streaming per-fighter aggregation of ufc_fight_stat_data. The table is read in
+# fixed-size chunks (record batches of the Parquet cache when it is fresh, the CSV
+# otherwise) and folded into arrays indexed by fighter_id, so memory is bounded by
+# the chunk size plus the number of fighters rather than by the file size. Every
+# stat is integer-valued, so the float64 sums are exact and the result matches the
+# in-memory groupby whatever the chunking.
+
+RAW_COLUMNS = ['fighter_id'] + STAT_COLUMNS[:-1] + ['ctrl_time']
+
+
+class StatAggregator:
+    """
+    Running per-fighter sums, non-null counts and maxima of every stat column.
+
+    Parameters:
+        n_fighters (int): Initial array size (largest fighter_id + 1); the arrays grow
+            if a chunk holds a larger ID.
+    """
+
+    def __init__(self, n_fighters=0):
+        self.columns = list(STAT_COLUMNS)
+        self.rows = np.zeros(n_fighters, dtype='int64')
+        self.sums = np.zeros((n_fighters, len(self.columns)))
+        self.counts = np.zeros((n_fighters, len(self.columns)), dtype='int64')
+        self.maxima = np.full((n_fighters, len(self.columns)), np.nan)
+
+    def _grow(self, size):
+        extra = size - len(self.rows)
+        self.rows = np.concatenate([self.rows, np.zeros(extra, dtype='int64')])
+        self.sums = np.vstack([self.sums, np.zeros((extra, len(self.columns)))])
+        self.counts = np.vstack([self.counts, np.zeros((extra, len(self.columns)), dtype='int64')])
+        self.maxima = np.vstack([self.maxima, np.full((extra, len(self.columns)), np.nan)])
+
+    def update(self, chunk):
+        """Fold one chunk of raw fight_stat rows (fighter_id, the stats and ctrl_time) into the totals."""
+        ids = pd.to_numeric(chunk['fighter_id']).to_numpy(dtype='float64', na_value=np.nan)
+        keep = ~np.isnan(ids)  # rows without a fighter are left out, as groupby drops NA keys
+        ids = ids[keep].astype('int64')
+        if not len(ids):
+            return self
+        if ids.max() >= len(self.rows):
+            self._grow(max(ids.max() + 1, 2 * len(self.rows)))
+
+        values = np.column_stack([chunk[col].to_numpy(dtype='float64', na_value=np.nan)[keep] for col in self.columns[:-1]] +
+                                 [parse_time_seconds(chunk['ctrl_time']).to_numpy(dtype='float64', na_value=np.nan)[keep]])
+        present = ~np.isnan(values)
+        n = len(self.rows)
+        self.rows += np.bincount(ids, minlength=n)
+
+        # Maxima per fighter of the chunk: sort by fighter, then reduce each run
+        order = np.argsort(ids, kind='stable')
+        fighters, starts = np.unique(ids[order], return_index=True)
+        chunk_max = np.fmax.reduceat(values[order], starts, axis=0)
+        self.maxima[fighters] = np.fmax(self.maxima[fighters], chunk_max)
+        for j in range(len(self.columns)):
+            self.sums[:, j] += np.bincount(ids, weights=np.where(present[:, j], values[:, j], 0.0), minlength=n)
+            self.counts[:, j] += np.bincount(ids, weights=present[:, j], minlength=n).astype('int64')
+        return self
+
+    def result(self):
+        """One row per fighter with at least one stat row: rows, then <stat>_sum, _count, _mean and _max."""
+        fighters = np.flatnonzero(self.rows)
+        counts = self.counts[fighters]
+        sums = self.sums[fighters]
+        means = np.divide(sums, counts, out=np.full(sums.shape, np.nan), where=counts > 0)
+        index = pd.Index(fighters.astype('int32'), name='fighter_id')
+        # One 2-D block per aggregate, so building the frame does not copy column by column
+        blocks = [pd.DataFrame({'rows': self.rows[fighters]}, index=index)]
+        for suffix, values in [('sum', sums), ('count', counts), ('mean', means), ('max', self.maxima[fighters])]:
+            blocks.append(pd.DataFrame(values, index=index, columns=[f'{col}_{suffix}' for col in self.columns], copy=False))
+        return pd.concat(blocks, axis=1)
+
+
+def iter_stat_chunks(base_path, chunk_size=100_000, use_cache=True):
+    """Raw fight_stat rows in chunks of chunk_size, from the Parquet cache when fresh, else the CSV."""
+    cache_path = fresh_parquet_cache(base_path, 'fight_stat') if use_cache else None
+    if cache_path:
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(cache_path)
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=RAW_COLUMNS):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(os.path.join(base_path, TABLES['fight_stat']), usecols=RAW_COLUMNS, chunksize=chunk_size)
+
+
+def _fighter_count(base_path):
+    """Largest fighter_id + 1, from the fighter table's ID column only."""
+    ids = pd.read_csv(os.path.join(base_path, TABLES['fighter']), usecols=['fighter_id'])['fighter_id']
+    return int(ids.max()) + 1 if len(ids) else 0
+
+
+def aggregate_fight_stats(base_path, chunk_size=100_000, use_cache=True):
+    """Per-fighter aggregates of every stat column, streamed in chunks (see StatAggregator.result)."""
+    aggregator = StatAggregator(_fighter_count(base_path))
+    for chunk in iter_stat_chunks(base_path, chunk_size, use_cache):
+        aggregator.update(chunk)
+    return aggregator.result()
+
+
+def aggregate_in_memory(fight_stat_data):
+    """The same aggregates from the whole table with a pandas groupby, as the reference."""
+    stats = fight_stat_data[STAT_COLUMNS[:-1]].astype('float64')
+    stats['ctrl_time_seconds'] = parse_time_seconds(fight_stat_data['ctrl_time']).astype('float64')
+    grouped = stats.groupby(fight_stat_data['fighter_id'].astype('Int32').rename('fighter_id'))
+    aggregates = {'sum': grouped.sum(), 'count': grouped.count().astype('int64'), 'mean': grouped.mean(), 'max': grouped.max()}
+    data = {'rows': grouped.size().astype('int64')}
+    for suffix, values in aggregates.items():
+        for col in STAT_COLUMNS:
+            data[f'{col}_{suffix}'] = values[col]
+    result = pd.DataFrame(data)
+    result.index = result.index.astype('int32')
+    return result
+
+
+def injury_summary(aggregates, columns=('knockdowns', 'reversals')):
+    """analyze_injury_history's output (per-fighter sums, fighter_id as a column) from the aggregates."""
+    summary = aggregates[[f'{col}_sum' for col in columns]].astype(STAT_DTYPE)
+    summary.columns = list(columns)
+    summary = summary.reset_index()
+    summary['fighter_id'] = summary['fighter_id'].astype('Int32')
+    return summary
+
+
+def benchmark_streaming(base_path, chunk_size=100_000):
+    """Wall time and tracemalloc peak of the streaming and in-memory aggregations."""
+    from data_loader import load_table
+
+    rows = {}
+    for name, run in [('streaming', lambda: aggregate_fight_stats(base_path, chunk_size)),
+                      ('in_memory', lambda: aggregate_in_memory(load_table(base_path, 'fight_stat')))]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        result = run()
+        rows[name] = {'seconds': time.perf_counter() - start, 'peak_mb': tracemalloc.get_traced_memory()[1] / 1e6,
+                      'fighters': len(result)}
+        tracemalloc.stop()
+    return pd.DataFrame(rows).T
+
+
+def main():
+    from data_loader import load_table
+
+    parser = argparse.ArgumentParser(description="Stream per-fighter aggregates of ufc_fight_stat_data.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--chunk-size', type=int, default=100_000)
+    parser.add_argument('--benchmark', action='store_true')
+    args = parser.parse_args()
+
+    aggregates = aggregate_fight_stats(args.base_path, args.chunk_size)
+    print(aggregates[[f'{col}_sum' for col in ['knockdowns', 'sig_strikes_succ', 'ctrl_time_seconds']]].head())
+    reference = aggregate_in_memory(load_table(args.base_path, 'fight_stat'))
+    pd.testing.assert_frame_equal(aggregates, reference)
+    print(f"\nStreaming aggregates of {len(aggregates)} fighters match the in-memory groupby.")
+    if args.benchmark:
+        print(benchmark_streaming(args.base_path, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from career_metrics import calculate_fighter_age_and_career_length, load_career_state
+from data_loader import load_tables
+from instrumentation import traced
+from join_index import JoinIndex, load_join_index
+from weight_classes import fighter_divisions, prepare_fighter_data
+
+# Survival analysis of UFC career length. A career "ends" at the fighter's last fight,
+# but fighters whose last fight is recent are most likely still active, so their
+# career length is only a lower bound: they are right-censored at the length so far.
+# Both estimators work on sorted arrays with no per-fighter loop:
+#
+#   Kaplan-Meier   one sort by (stratum, duration); deaths and censorings per distinct
+#                  time from np.unique, at-risk counts from cumulative sums, and the
+#                  product-limit curve as a cumulative sum of logs within each stratum
+#   Cox PH         Breslow partial likelihood; sorting by descending duration makes
+#                  every risk-set sum a cumulative sum, so each Newton step is O(n p^2)
+
+# Fighters whose last fight is within this window of the latest event are censored
+ACTIVE_WINDOW_YEARS = 2.0
+COX_COVARIATES = ['age_at_debut', 'fighter_height_cm', 'fighter_reach_cm', 'fighter_weight_lbs']
+# primary_division is where a fighter fought most (weight_classes.fighter_divisions),
+# not the class of the weight listed at the end of their career
+STRATA = ['primary_division', 'fighter_stance']
+CONFIDENCE = 0.95
+
+
+@traced
+def load_data(base_path, preloaded=None):
+    return load_tables(base_path, 'event', 'fight', 'fighter', preloaded=preloaded)
+
+
+@traced
+def survival_table(fighter_data, reference_date=None, window_years=ACTIVE_WINDOW_YEARS):
+    """
+    Duration and event indicator per fighter with a known career length.
+
+    duration is career_length_years; event is 1 when the career is over (last fight
+    more than window_years before reference_date, by default the latest last fight)
+    and 0 when it is censored.
+    """
+    data = fighter_data.dropna(subset=['career_length_years', 'event_date_last']).copy()
+    last = pd.to_datetime(data['event_date_last'])
+    reference_date = pd.Timestamp(reference_date) if reference_date is not None else last.max()
+    data['duration'] = data['career_length_years'].astype('float64')
+    data['event'] = (last < reference_date - pd.Timedelta(days=window_years * 365.25)).astype('int8')
+    return data
+
+
+def _group_codes(table, by):
+    """Stratum code per row and the stratum labels, or a single stratum when by is empty."""
+    if not by:
+        return np.zeros(len(table), dtype=np.int64), pd.DataFrame(index=[0])
+    keys = table[by].astype(object).fillna('Unknown')
+    codes = keys.groupby(by, sort=True).ngroup().to_numpy(dtype=np.int64)
+    first = np.unique(codes, return_index=True)[1]
+    return codes, keys.iloc[first].reset_index(drop=True)
+
+
+def _segment_starts(groups):
+    """Position of the first row of each row's segment, for rows sorted by group."""
+    start = np.ones(len(groups), dtype=bool)
+    start[1:] = groups[1:] != groups[:-1]
+    return np.maximum.accumulate(np.where(start, np.arange(len(groups)), 0))
+
+
+@traced
+def kaplan_meier(table, by=None, confidence=CONFIDENCE):
+    """
+    Kaplan-Meier survival curves, one per stratum of the `by` columns.
+
+    Returns one row per stratum and distinct duration: the stratum columns, time,
+    at_risk, events, censored, survival and the Greenwood confidence band (on the
+    log(-log) scale, so it stays within [0, 1]).
+    """
+    by = list(by or [])
+    groups, labels = _group_codes(table, by)
+    durations = table['duration'].to_numpy(dtype='float64')
+    events = table['event'].to_numpy(dtype='int64')
+
+    # Distinct (stratum, time) pairs in sorted order, with deaths and exits at each
+    key_order = np.lexsort((durations, groups))
+    groups, durations, events = groups[key_order], durations[key_order], events[key_order]
+    boundary = np.ones(len(groups), dtype=bool)
+    boundary[1:] = (groups[1:] != groups[:-1]) | (durations[1:] != durations[:-1])
+    slot = np.cumsum(boundary) - 1
+    first = np.flatnonzero(boundary)
+    exits = np.bincount(slot)
+    deaths = np.bincount(slot, weights=events).astype(np.int64)
+    group, time_ = groups[first], durations[first]
+
+    # At risk: the stratum size minus everyone who left at an earlier time in the stratum
+    stratum_size = np.bincount(groups)[group]
+    left_before = np.cumsum(exits) - exits
+    starts = _segment_starts(group)
+    at_risk = stratum_size - (left_before - left_before[starts])
+
+    # Product-limit estimate as a cumulative sum of logs within each stratum; a step to
+    # zero (everyone left dies) is tracked separately so log(0) never enters the sum
+    ratio = 1 - deaths / at_risk
+    zero = ratio == 0
+    log_ratio = np.log(np.where(zero, 1.0, ratio))
+    cum_log = np.cumsum(log_ratio)
+    cum_zero = np.cumsum(zero)
+    # Totals up to the row before the stratum starts, subtracted to restart each sum
+    before = np.maximum(starts - 1, 0)
+    has_prior = starts > 0
+    prior_log = np.where(has_prior, cum_log[before], 0.0)
+    prior_zero = np.where(has_prior, cum_zero[before], 0)
+    survival = np.where(cum_zero - prior_zero > 0, 0.0, np.exp(cum_log - prior_log))
+
+    # Greenwood: sum of d / (n (n - d)) up to t, within the stratum
+    with np.errstate(divide='ignore', invalid='ignore'):
+        term = np.where(at_risk > deaths, deaths / (at_risk * (at_risk - deaths)), 0.0)
+        cum_term = np.cumsum(term)
+        greenwood = cum_term - np.where(has_prior, cum_term[before], 0.0)
+        z = stats.norm.ppf(0.5 + confidence / 2)
+        log_s = np.log(survival)
+        spread = z * np.sqrt(greenwood) / np.abs(log_s)
+        inside = (survival > 0) & (survival < 1)
+        lower = np.where(inside, survival ** np.exp(spread), survival)
+        upper = np.where(inside, survival ** np.exp(-spread), survival)
+
+    curves = labels.iloc[group].reset_index(drop=True)
+    curves['time'] = time_
+    curves['at_risk'] = at_risk
+    curves['events'] = deaths
+    curves['censored'] = exits - deaths
+    curves['survival'] = survival
+    curves['ci_lower'] = lower
+    curves['ci_upper'] = upper
+    return curves
+
+
+def median_survival(curves, by=None):
+    """Median career length per stratum: the first time the survival curve reaches 0.5 (NaN if it never does)."""
+    by = list(by or [])
+    reached = curves[curves['survival'] <= 0.5]
+    first = reached.groupby(by, sort=False, observed=True)['time'].min() if by else pd.Series({0: reached['time'].min()})
+    sizes = curves.groupby(by, sort=False, observed=True)['at_risk'].max() if by else pd.Series({0: curves['at_risk'].max()})
+    events = curves.groupby(by, sort=False, observed=True)['events'].sum() if by else pd.Series({0: curves['events'].sum()})
+    result = pd.DataFrame({'fighters': sizes, 'ended': events, 'median_years': first.reindex(sizes.index)})
+    return result.sort_values('fighters', ascending=False)
+
+
+def _cox_sums(order_times, X, weights_exp):
+    """
+    Risk-set sums for rows sorted by descending duration: S0, S1, S2 at each row, taken
+    at the last row of its tied block so tied durations share one risk set (Breslow).
+    """
+    s0 = np.cumsum(weights_exp)
+    s1 = np.cumsum(weights_exp[:, None] * X, axis=0)
+    boundary = np.ones(len(order_times), dtype=bool)
+    boundary[:-1] = order_times[:-1] != order_times[1:]
+    ends = np.flatnonzero(boundary)
+    last_of_tie = np.repeat(ends, np.diff(np.concatenate([[-1], ends])))
+    return s0[last_of_tie], s1[last_of_tie], last_of_tie
+
+
+@traced
+def cox_ph(table, covariates=None, max_iter=50, tol=1e-9):
+    """
+    Cox proportional-hazards fit (Breslow ties) by Newton-Raphson.
+
+    Rows missing any covariate are dropped. Covariates are standardized for the fit
+    and the coefficients reported on the original scale. Returns (summary frame with
+    coef, exp_coef, se, z, p and the confidence interval of exp_coef, fit info dict).
+    """
+    covariates = list(covariates or COX_COVARIATES)
+    data = table[covariates + ['duration', 'event']].astype('float64').dropna()
+    order = np.argsort(-data['duration'].to_numpy(), kind='stable')
+    durations = data['duration'].to_numpy()[order]
+    events = data['event'].to_numpy()[order].astype(bool)
+    raw = data[covariates].to_numpy()[order]
+    mean, scale = raw.mean(axis=0), raw.std(axis=0)
+    scale[scale == 0] = 1.0
+    X = (raw - mean) / scale
+    X_events = X[events]
+
+    def evaluate(beta):
+        xb = X @ beta
+        shift = xb.max()
+        w = np.exp(xb - shift)
+        s0, s1, tie = _cox_sums(durations, X, w)
+        s0_e, s1_e = s0[events], s1[events]
+        loglik = np.sum(xb[events] - shift - np.log(s0_e))
+        mean_x = s1_e / s0_e[:, None]
+        gradient = (X_events - mean_x).sum(axis=0)
+        # Second moment: cumulative sums of w x x^T, only read at the event rows
+        s2 = np.cumsum(w[:, None, None] * X[:, :, None] * X[:, None, :], axis=0)[tie[events]]
+        information = (s2 / s0_e[:, None, None]).sum(axis=0) - mean_x.T @ mean_x
+        return loglik, gradient, information
+
+    beta = np.zeros(len(covariates))
+    loglik, gradient, information = evaluate(beta)
+    null_loglik = loglik
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        step = np.linalg.solve(information, gradient)
+        # Halve the step until the partial likelihood improves
+        for _ in range(30):
+            candidate = evaluate(beta + step)
+            if candidate[0] >= loglik - 1e-12:
+                break
+            step /= 2
+        beta = beta + step
+        improvement = candidate[0] - loglik
+        loglik, gradient, information = candidate
+        if abs(improvement) < tol and np.max(np.abs(step)) < 1e-7:
+            break
+
+    covariance = np.linalg.inv(information)
+    coef = beta / scale
+    se = np.sqrt(np.diag(covariance)) / scale
+    z_values = coef / se
+    z = stats.norm.ppf(0.5 + CONFIDENCE / 2)
+    summary = pd.DataFrame({
+        'coef': coef,
+        'exp_coef': np.exp(coef),
+        'se': se,
+        'z': z_values,
+        'p': 2 * stats.norm.sf(np.abs(z_values)),
+        'exp_coef_lower': np.exp(coef - z * se),
+        'exp_coef_upper': np.exp(coef + z * se),
+    }, index=pd.Index(covariates, name='covariate'))
+    lr = 2 * (loglik - null_loglik)
+    info = {'fighters': len(data), 'events': int(events.sum()), 'log_likelihood': loglik, 'iterations': iterations,
+            'lr_statistic': lr, 'lr_p': stats.chi2.sf(lr, len(covariates))}
+    return summary, info
+
+
+@traced
+def prepare_survival_data(fight_data, event_data, fighter_data, index=None, metrics=None, state=None):
+    """Career lengths, divisions and the survival columns for every fighter."""
+    if index is None:
+        index = JoinIndex.build(event_data, fight_data, fighter_data)
+    fighter_data = calculate_fighter_age_and_career_length(fight_data, event_data, fighter_data, index=index, metrics=metrics,
+                                                           state=state)
+    fighter_data = fighter_divisions(prepare_fighter_data(fighter_data), fight_data, index)
+    return survival_table(fighter_data)
+
+
+@traced
+def main(base_path='./data/', preloaded=None):
+    event_data, fight_data, fighter_data = load_data(base_path, preloaded)
+    table = prepare_survival_data(fight_data, event_data, fighter_data, index=load_join_index(base_path),
+                                  state=load_career_state(base_path, event_data, fight_data),
+                                  metrics=preloaded.get('career') if preloaded else None)
+    print(f"Fighters: {len(table)}, careers ended: {int(table['event'].sum())}, "
+          f"censored (last fight within {ACTIVE_WINDOW_YEARS:g} years): {int((table['event'] == 0).sum())}")
+
+    overall = median_survival(kaplan_meier(table))
+    print(f"\nKaplan-Meier median career length: {overall['median_years'].iloc[0]:.2f} years "
+          f"(naive mean of career_length_years: {table['duration'].mean():.2f})")
+    for by in [['primary_division'], ['fighter_stance'], STRATA]:
+        print(f"\nMedian career length by {' and '.join(by)}:")
+        print(median_survival(kaplan_meier(table, by), by).head(20).to_string(float_format=lambda x: f'{x:.2f}'))
+
+    summary, info = cox_ph(table)
+    print(f"\nCox proportional hazards ({info['fighters']} fighters, {info['events']} ended careers, "
+          f"{info['iterations']} Newton steps):")
+    print(summary.to_string(float_format=lambda x: f'{x:.4f}'))
+    print(f"Log-likelihood {info['log_likelihood']:.2f}, likelihood-ratio test {info['lr_statistic']:.2f} "
+          f"(p = {info['lr_p']:.3g})")
+
+
+def benchmark(base_path, repeat=3):
+    """Best-of-repeat seconds of the survival table, stratified Kaplan-Meier and Cox fit."""
+    event_data, fight_data, fighter_data = load_data(base_path)
+    timings = {}
+
+    def best(name, fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+        timings[name] = min(times)
+        return result
+
+    index, state = load_join_index(base_path), load_career_state(base_path, event_data, fight_data)
+    table = best('survival_table', lambda: prepare_survival_data(fight_data, event_data, fighter_data.copy(), index=index,
+                                                                 state=state))
+    best('kaplan_meier', lambda: kaplan_meier(table, STRATA))
+    best('cox_ph', lambda: cox_ph(table))
+    return pd.Series(timings, name='seconds'), len(table)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kaplan-Meier and Cox PH analysis of censored UFC career lengths.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--benchmark', action='store_true', help="time the estimators instead of printing results")
+    args = parser.parse_args()
+    if args.benchmark:
+        timings, fighters = benchmark(args.base_path)
+        print(f"{fighters} fighters")
+        print(timings.to_string(float_format=lambda x: f'{x:.3f}s'))
+    else:
+        main(args.base_path)
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_loader import TABLES
+
+# Synthetic ufcstats datasets at a multiple of the real one. The source tables are
+# replicated `multiplier` times; replica k shifts every ID by k * (max ID + 1) so
+# f_1/f_2/winner, fight_stat.fighter_id, fight_id and event_id keep pointing at rows
+# of the same replica, and jitters event dates, DOBs and body measurements so the
+# replicas are not exact copies. Replica 0 is the source data unchanged, and every
+# column keeps the source CSV's name and format.
+
+ID_COLUMNS = {
+    'event': {'event_id': 'event'},
+    'fight': {'fight_id': 'fight', 'event_id': 'event', 'f_1': 'fighter', 'f_2': 'fighter', 'winner': 'fighter'},
+    'fighter': {'fighter_id': 'fighter'},
+    'fight_stat': {'fight_stat_id': 'fight_stat', 'fight_id': 'fight', 'fighter_id': 'fighter'},
+}
+# The primary key of each table, whose span sets the ID shift per replica
+KEYS = {'event': 'event_id', 'fight': 'fight_id', 'fighter': 'fighter_id', 'fight_stat': 'fight_stat_id'}
+
+EVENT_DATE_JITTER = 90     # days
+DOB_JITTER = 365           # days
+MEASUREMENT_NOISE = 1.0    # cm, on height and reach
+META_FILE = 'synthetic.json'
+
+
+def read_source(base_path):
+    """The four source CSVs as read_csv returns them, i.e. in the on-disk format."""
+    return {table: pd.read_csv(os.path.join(base_path, filename)) for table, filename in TABLES.items()}
+
+
+def id_spans(source):
+    """ID shift per replica for each ID space: one more than the largest ID in use."""
+    return {table: int(source[table][key].max()) + 1 for table, key in KEYS.items()}
+
+
+def _noise(replicas, n, draw, seed):
+    """Per-row noise for n rows of each replica, drawn from a seed of its own; zero for replica 0."""
+    return np.concatenate([np.zeros(n) if k == 0 else draw(np.random.default_rng([seed, int(k)]), n) for k in replicas])
+
+
+def _jitter_dates(values, replicas, days, seed):
+    dates = pd.to_datetime(values, errors='coerce')
+    shift = _noise(replicas, len(values) // len(replicas), lambda rng, n: rng.integers(-days, days + 1, n), seed)
+    return (dates + pd.to_timedelta(shift, unit='D')).dt.strftime('%Y-%m-%d')
+
+
+def generate_table(source, table, replicas, spans, seed=0):
+    """
+    Rows of the given replicas of one table.
+
+    The noise of replica k is drawn from its own seed, so a table comes out the same
+    whether its replicas are generated together or in blocks.
+    """
+    df = source[table]
+    replicas = np.asarray(replicas)
+    out = df.iloc[np.tile(np.arange(len(df)), len(replicas))].reset_index(drop=True)
+    replica = np.repeat(replicas, len(df))
+
+    for col, space in ID_COLUMNS[table].items():
+        # Missing IDs (e.g. an unknown f_1) stay missing
+        out[col] = (out[col] + replica * spans[space]).astype('Int64')
+
+    if table == 'event':
+        out['event_date'] = _jitter_dates(out['event_date'], replicas, EVENT_DATE_JITTER, seed)
+    elif table == 'fighter':
+        out['fighter_dob'] = _jitter_dates(out['fighter_dob'], replicas, DOB_JITTER, seed + 1)
+        for offset, col in enumerate(['fighter_height_cm', 'fighter_reach_cm'], start=2):
+            noise = _noise(replicas, len(df), lambda rng, n: rng.normal(0, MEASUREMENT_NOISE, n), seed + offset)
+            out[col] = (out[col] + noise).round(2)
+    return out
+
+
+def generate_dataset(base_path, multiplier, seed=0):
+    """All four tables at `multiplier` times the source size, in memory."""
+    source = read_source(base_path)
+    spans = id_spans(source)
+    return {table: generate_table(source, table, np.arange(multiplier), spans, seed) for table in TABLES}
+
+
+def write_dataset(base_path, out_path, multiplier, seed=0, block_rows=1_000_000):
+    """
+    Write a synthetic dataset as the four source CSVs under out_path.
+
+    Replicas are generated and appended in blocks of about block_rows rows per table,
+    so memory stays bounded at any multiplier. Returns the row count of each table.
+    """
+    source = read_source(base_path)
+    spans = id_spans(source)
+    os.makedirs(out_path, exist_ok=True)
+    rows = {}
+    for table, filename in TABLES.items():
+        path = os.path.join(out_path, filename)
+        per_block = max(1, block_rows // max(1, len(source[table])))
+        for start in range(0, multiplier, per_block):
+            block = generate_table(source, table, np.arange(start, min(start + per_block, multiplier)), spans, seed)
+            block.to_csv(path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        rows[table] = len(source[table]) * multiplier
+    with open(os.path.join(out_path, META_FILE), 'w') as f:
+        json.dump({'multiplier': multiplier, 'seed': seed, 'rows': rows}, f, indent=2)
+    return rows
+
+
+def ensure_dataset(base_path, out_path, multiplier, seed=0):
+    """Write the dataset unless out_path already holds one with the same multiplier and seed."""
+    try:
+        with open(os.path.join(out_path, META_FILE)) as f:
+            meta = json.load(f)
+        if (meta['multiplier'], meta['seed']) == (multiplier, seed) and \
+                all(os.path.exists(os.path.join(out_path, filename)) for filename in TABLES.values()):
+            return meta['rows']
+    except (OSError, ValueError, KeyError):
+        pass
+    return write_dataset(base_path, out_path, multiplier, seed)
+
+
+def check_integrity(tables):
+    """Count references that do not resolve to a row of the referenced table (all zeros when consistent)."""
+    ids = {table: set(tables[table][key].dropna()) for table, key in KEYS.items()}
+    problems = {}
+    for table, columns in ID_COLUMNS.items():
+        for col, space in columns.items():
+            if space != table:
+                values = tables[table][col].dropna()
+                problems[f'{table}.{col}'] = int((~values.isin(ids[space])).sum())
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic ufcstats datasets at a multiple of the source size.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--out', default='./data/synthetic/', help="datasets are written to <out>/x<multiplier>/")
+    parser.add_argument('--multipliers', type=int, nargs='+', default=[1, 10, 100])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for multiplier in args.multipliers:
+        start = time.perf_counter()
+        rows = write_dataset(args.base_path, os.path.join(args.out, f'x{multiplier}'), multiplier, args.seed)
+        print(f"x{multiplier}: {rows} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
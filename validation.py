@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import re
+import sys
+
+import numpy as np
+import pandas as pd
+
+from data_loader import CACHE_DIR, TABLES, load_tables, table_fingerprint
+
+# Data-quality and referential-integrity checks over the four ufcstats tables. Every
+# check is vectorized: ID references are tested with np.isin against the sorted
+# unique IDs of the referenced table, and value checks are array comparisons. The
+# result of each check is cached under <base_path>/.cache/ together with the content
+# hashes of the tables it reads, so a later run only re-validates checks whose
+# tables changed (a cross-table check re-runs when either of its tables did).
+#
+#   python validation.py [--base-path ./data/] [--json report.json] [--no-cache]
+#
+# Exits with status 1 when an error-level check fails.
+
+REPORT_FILE = 'validation.json'
+VALIDATION_VERSION = 2
+MAX_EXAMPLES = 5
+# (landed, attempted) column pairs: landed can never exceed attempted
+ATTEMPT_PAIRS = [('total_strikes_succ', 'total_strikes_att'), ('sig_strikes_succ', 'sig_strikes_att'),
+                 ('takedown_succ', 'takedown_att')]
+STAT_VALUE_COLUMNS = ['knockdowns', 'total_strikes_att', 'total_strikes_succ', 'sig_strikes_att', 'sig_strikes_succ',
+                      'takedown_att', 'takedown_succ', 'submission_att', 'reversals']
+# Plausible body measurements; values outside are almost always unit or parsing errors
+MEASUREMENT_RANGES = {'fighter_height_cm': (120, 230), 'fighter_reach_cm': (120, 250), 'fighter_weight_lbs': (100, 400)}
+
+
+def _ids(column):
+    """Nullable ID column as float64 with NaN for missing values."""
+    return column.to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _unknown(values, reference):
+    """Mask of the non-missing values that are not among the reference IDs."""
+    known = np.unique(reference[~np.isnan(reference)])
+    return ~np.isnan(values) & ~np.isin(values, known)
+
+
+def _duplicated(values):
+    return pd.Series(values).duplicated(keep=False).to_numpy()
+
+
+def _pair_keys(fight_ids, fighter_ids):
+    """
+    Exact int64 (fight_id, fighter_id) keys, fight_id in the high 32 bits, and the mask
+    of rows where both IDs are present (the keys of the other rows are meaningless).
+    """
+    fight, fighter = _ids(fight_ids), _ids(fighter_ids)
+    present = ~np.isnan(fight) & ~np.isnan(fighter)
+    high = np.where(present, fight, 0).astype(np.int64) << 32
+    return high | (np.where(present, fighter, 0).astype(np.int64) & 0xFFFFFFFF), present
+
+
+# Each check takes the loaded tables and returns (rows checked, failure mask, keys),
+# where keys identify the rows (their IDs) for the examples in the report
+
+def _event_id_unique(t):
+    ids = t['event']['event_id'].to_numpy()
+    return len(ids), _duplicated(ids), ids
+
+
+def _event_date_missing(t):
+    event = t['event']
+    return len(event), event['event_date'].isna().to_numpy(), event['event_id'].to_numpy()
+
+
+def _event_date_order(t):
+    # event_id is the incremental-update watermark, so a later event must not be dated
+    # earlier; both events of every descending consecutive pair are reported
+    event = t['event'].dropna(subset=['event_date']).sort_values('event_id')
+    days = event['event_date'].to_numpy(dtype='datetime64[D]')
+    descending = days[1:] < days[:-1]
+    out_of_order = np.zeros(len(days), dtype=bool)
+    out_of_order[1:] |= descending
+    out_of_order[:-1] |= descending
+    return len(event), out_of_order, event['event_id'].to_numpy()
+
+
+def _fight_id_unique(t):
+    ids = t['fight']['fight_id'].to_numpy()
+    return len(ids), _duplicated(ids), ids
+
+
+def _fight_event_unknown(t):
+    fight = t['fight']
+    return len(fight), _unknown(_ids(fight['event_id']), _ids(t['event']['event_id'])), fight['fight_id'].to_numpy()
+
+
+def _fighter_unknown(column):
+    def check(t):
+        fight = t['fight']
+        return len(fight), _unknown(_ids(fight[column]), _ids(t['fighter']['fighter_id'])), fight['fight_id'].to_numpy()
+    return check
+
+
+def _fight_corner_missing(t):
+    fight = t['fight']
+    missing = np.isnan(_ids(fight['f_1'])) | np.isnan(_ids(fight['f_2']))
+    return len(fight), missing, fight['fight_id'].to_numpy()
+
+
+def _winner_not_in_fight(t):
+    fight = t['fight']
+    f1, f2, winner = _ids(fight['f_1']), _ids(fight['f_2']), _ids(fight['winner'])
+    return len(fight), ~np.isnan(winner) & (winner != f1) & (winner != f2), fight['fight_id'].to_numpy()
+
+
+def _same_fighter_both_corners(t):
+    fight = t['fight']
+    return len(fight), _ids(fight['f_1']) == _ids(fight['f_2']), fight['fight_id'].to_numpy()
+
+
+def _fighter_id_unique(t):
+    ids = t['fighter']['fighter_id'].to_numpy()
+    return len(ids), _duplicated(ids), ids
+
+
+def _negative_record(t):
+    fighter = t['fighter']
+    record = fighter[['fighter_w', 'fighter_l', 'fighter_d']].to_numpy(dtype='float64', na_value=np.nan)
+    return len(fighter), (record < 0).any(axis=1), fighter['fighter_id'].to_numpy()
+
+
+def _measurement_range(t):
+    fighter = t['fighter']
+    bad = np.zeros(len(fighter), dtype=bool)
+    for col, (low, high) in MEASUREMENT_RANGES.items():
+        values = fighter[col].to_numpy(dtype='float64', na_value=np.nan)
+        bad |= (values < low) | (values > high)
+    return len(fighter), bad, fighter['fighter_id'].to_numpy()
+
+
+def _dob_after_debut(t):
+    fight, fighter = t['fight'], t['fighter']
+    event_date = pd.Series(pd.to_datetime(t['event']['event_date']).to_numpy(dtype='datetime64[D]'),
+                           index=t['event']['event_id'].to_numpy())
+    dates = fight['event_id'].map(event_date).to_numpy(dtype='datetime64[D]')
+    ids = np.concatenate([_ids(fight['f_1']), _ids(fight['f_2'])])
+    dates = np.concatenate([dates, dates])
+    keep = ~np.isnan(ids) & ~np.isnat(dates)
+    ids, dates = ids[keep], dates[keep]
+    # Debut per fighter: the first occurrence after sorting by date
+    order = np.argsort(dates, kind='stable')
+    debut_ids, first = np.unique(ids[order], return_index=True)
+    debut = dates[order][first]
+
+    fighter_ids = _ids(fighter['fighter_id'])
+    debut_of = np.full(len(fighter), np.datetime64('NaT'), dtype='datetime64[D]')
+    if len(debut_ids):
+        pos = np.minimum(np.searchsorted(debut_ids, fighter_ids), len(debut_ids) - 1)
+        found = debut_ids[pos] == fighter_ids
+        debut_of[found] = debut[pos[found]]
+    dob = pd.to_datetime(fighter['fighter_dob']).to_numpy(dtype='datetime64[D]')
+    bad = ~np.isnat(dob) & ~np.isnat(debut_of) & (dob > debut_of)
+    return len(fighter), bad, fighter['fighter_id'].to_numpy()
+
+
+def _stat_fight_unknown(t):
+    stat = t['fight_stat']
+    return len(stat), _unknown(_ids(stat['fight_id']), _ids(t['fight']['fight_id'])), stat['fight_stat_id'].to_numpy()
+
+
+def _stat_fighter_unknown(t):
+    stat = t['fight_stat']
+    return len(stat), _unknown(_ids(stat['fighter_id']), _ids(t['fighter']['fighter_id'])), stat['fight_stat_id'].to_numpy()
+
+
+def _stat_fighter_not_in_fight(t):
+    # (fight_id, fighter_id) pairs must be one of the fight's corners; compare composite keys
+    stat, fight = t['fight_stat'], t['fight']
+    corners = [_pair_keys(fight['fight_id'], fight[corner]) for corner in ('f_1', 'f_2')]
+    corners = np.unique(np.concatenate([keys[present] for keys, present in corners]))
+    keys, present = _pair_keys(stat['fight_id'], stat['fighter_id'])
+    known_fight = ~_unknown(_ids(stat['fight_id']), _ids(fight['fight_id']))
+    return len(stat), known_fight & present & ~np.isin(keys, corners), stat['fight_stat_id'].to_numpy()
+
+
+def _stat_negative(t):
+    stat = t['fight_stat']
+    values = stat[STAT_VALUE_COLUMNS].to_numpy(dtype='float64', na_value=np.nan)
+    return len(stat), (values < 0).any(axis=1), stat['fight_stat_id'].to_numpy()
+
+
+def _stat_succ_above_att(t):
+    stat = t['fight_stat']
+    bad = np.zeros(len(stat), dtype=bool)
+    for succ, att in ATTEMPT_PAIRS:
+        bad |= stat[succ].to_numpy(dtype='float64', na_value=np.nan) > stat[att].to_numpy(dtype='float64', na_value=np.nan)
+    return len(stat), bad, stat['fight_stat_id'].to_numpy()
+
+
+def _stat_duplicate_rows(t):
+    stat = t['fight_stat']
+    keys, present = _pair_keys(stat['fight_id'], stat['fighter_id'])
+    duplicated = np.zeros(len(stat), dtype=bool)
+    duplicated[present] = _duplicated(keys[present])
+    return len(stat), duplicated, stat['fight_stat_id'].to_numpy()
+
+
+# (name, severity, tables read, check)
+CHECKS = [
+    ('event.event_id unique', 'error', ('event',), _event_id_unique),
+    ('event.event_date missing', 'warning', ('event',), _event_date_missing),
+    ('event.event_date in event_id order', 'warning', ('event',), _event_date_order),
+    ('fight.fight_id unique', 'error', ('fight',), _fight_id_unique),
+    ('fight.event_id known', 'error', ('fight', 'event'), _fight_event_unknown),
+    ('fight.f_1 known', 'error', ('fight', 'fighter'), _fighter_unknown('f_1')),
+    ('fight.f_2 known', 'error', ('fight', 'fighter'), _fighter_unknown('f_2')),
+    ('fight.winner known', 'error', ('fight', 'fighter'), _fighter_unknown('winner')),
+    ('fight.f_1/f_2 present', 'warning', ('fight',), _fight_corner_missing),
+    ('fight.winner is f_1 or f_2', 'error', ('fight',), _winner_not_in_fight),
+    ('fight.f_1 differs from f_2', 'error', ('fight',), _same_fighter_both_corners),
+    ('fighter.fighter_id unique', 'error', ('fighter',), _fighter_id_unique),
+    ('fighter.record non-negative', 'error', ('fighter',), _negative_record),
+    ('fighter.measurements in range', 'warning', ('fighter',), _measurement_range),
+    ('fighter.fighter_dob before debut', 'error', ('fighter', 'fight', 'event'), _dob_after_debut),
+    ('fight_stat.fight_id known', 'error', ('fight_stat', 'fight'), _stat_fight_unknown),
+    ('fight_stat.fighter_id known', 'error', ('fight_stat', 'fighter'), _stat_fighter_unknown),
+    ('fight_stat.fighter_id fought in fight_id', 'error', ('fight_stat', 'fight'), _stat_fighter_not_in_fight),
+    ('fight_stat.stats non-negative', 'error', ('fight_stat',), _stat_negative),
+    ('fight_stat.succ <= att', 'error', ('fight_stat',), _stat_succ_above_att),
+    ('fight_stat.one row per fighter per fight', 'warning', ('fight_stat',), _stat_duplicate_rows),
+]
+
+
+def check_base_path(base_path):
+    """
+    Problems with base_path itself, as a list of messages (empty when it is usable).
+
+    Catches typos such as ',/data/' for './data/' before anything tries to read or
+    create files under it, and suggests the intended path when the typo is obvious.
+    """
+    if os.path.isdir(base_path):
+        missing = [filename for filename in TABLES.values() if not os.path.isfile(os.path.join(base_path, filename))]
+        problems = [f"{base_path!r} has no {', '.join(missing)}"] if missing else []
+    else:
+        problems = [f"base path {base_path!r} is not a directory"]
+    suggestion = re.sub(r'^[,;:`\'"]+/', './', base_path.strip())
+    if problems and suggestion != base_path and os.path.isdir(suggestion):
+        problems[0] += f" (did you mean {suggestion!r}?)"
+    return problems
+
+
+def _read_report(path):
+    try:
+        with open(path) as f:
+            report = json.load(f)
+        return report['checks'] if report.get('version') == VALIDATION_VERSION else {}
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def run_check(check, tables):
+    """Run one check; returns the cacheable result (rows checked, failures, example keys)."""
+    checked, failed, keys = check(tables)
+    failed = np.asarray(failed, dtype=bool)
+    return {'checked': int(checked), 'failures': int(failed.sum()),
+            'examples': [int(key) for key in np.asarray(keys)[failed][:MAX_EXAMPLES]]}
+
+
+def validate(base_path, use_cache=True, report_path=None):
+    """
+    Run every check, reusing cached results whose tables are unchanged.
+
+    Returns one row per check: name, severity, tables, rows checked, failures, example
+    IDs of failing rows and whether the result came from the cache. Raises
+    FileNotFoundError when base_path itself is unusable.
+    """
+    problems = check_base_path(base_path)
+    if problems:
+        raise FileNotFoundError('; '.join(problems))
+
+    report_path = report_path or os.path.join(base_path, CACHE_DIR, REPORT_FILE)
+    cached = _read_report(report_path) if use_cache else {}
+    fingerprints = {table: table_fingerprint(base_path, table) for table in TABLES}
+
+    stale = [(name, tables) for name, _, tables, _ in CHECKS
+             if cached.get(name, {}).get('fingerprint') != {table: fingerprints[table] for table in tables}]
+    needed = sorted({table for _, tables in stale for table in tables}, key=list(TABLES).index)
+    loaded = dict(zip(needed, load_tables(base_path, *needed)))
+
+    results, rows = {}, []
+    stale_names = {name for name, _ in stale}
+    for name, severity, tables, check in CHECKS:
+        if name in stale_names:
+            result = run_check(check, loaded)
+            results[name] = {'fingerprint': {table: fingerprints[table] for table in tables}, **result}
+        else:
+            result = results[name] = cached[name]
+        rows.append({'check': name, 'severity': severity, 'tables': ', '.join(tables), 'checked': result['checked'],
+                     'failures': result['failures'], 'examples': result['examples'], 'cached': name not in stale_names})
+
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    with open(report_path, 'w') as f:
+        json.dump({'version': VALIDATION_VERSION, 'checks': results}, f, indent=2)
+    return pd.DataFrame(rows)
+
+
+def failed_errors(report):
+    """The error-level checks that found problems."""
+    return report[(report['severity'] == 'error') & (report['failures'] > 0)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate the ufcstats tables and their cross references.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--json', metavar='PATH', help="also write the report to PATH")
+    parser.add_argument('--no-cache', action='store_true', help="re-run every check even if its tables are unchanged")
+    args = parser.parse_args(argv)
+
+    try:
+        report = validate(args.base_path, use_cache=not args.no_cache)
+    except FileNotFoundError as error:
+        print(f"Invalid data path: {error}", file=sys.stderr)
+        sys.exit(2)
+    print(report.to_string(index=False))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report.to_dict(orient='records'), f, indent=2)
+
+    errors = failed_errors(report)
+    print(f"\n{len(report)} checks ({int(report['cached'].sum())} cached), "
+          f"{int((report['failures'] > 0).sum())} with findings, {len(errors)} failing at error level")
+    if len(errors):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import traced
+
+# Weight classes and divisions without the analysis libraries, so survival_analysis
+# and query_service get them without importing sklearn through the clustering module.
+#
+# assign_weight_class buckets a recorded weight into the UFC classes with one
+# searchsorted over the class limits. That is only the fighter's current listed
+# weight, though: fighters who moved divisions get the class they ended at.
+# fighter_divisions reads the weight_class recorded on each fight instead, through the
+# join index adjacency, and gives each fighter a primary division (the one fought
+# most, ties to the most recent), the last division fought and how many they fought
+# in; division_history gives the same per fighter per period.
+#
+#   python weight_classes.py [--base-path ./data/]    benchmark and division moves
+
+# Upper limit (lbs, inclusive) of each class; above the last is Super Heavyweight
+WEIGHT_CLASS_LIMITS = np.array([125, 135, 145, 155, 170, 185, 205, 265], dtype='float64')
+WEIGHT_CLASSES = ['Flyweight', 'Bantamweight', 'Featherweight', 'Lightweight', 'Welterweight',
+                  'Middleweight', 'Light Heavyweight', 'Heavyweight', 'Super Heavyweight']
+# Fight weight classes that are divisions; Catch Weight, Open Weight and missing
+# values say nothing about where a fighter competes and are left out
+DIVISIONS = WEIGHT_CLASSES[:-1] + ["Women's Strawweight", "Women's Flyweight", "Women's Bantamweight",
+                                   "Women's Featherweight"]
+
+
+def weight_class_codes(weights):
+    """Index into WEIGHT_CLASSES for each weight, -1 where the weight is missing."""
+    weights = np.asarray(weights, dtype='float64')
+    # side='left': a weight exactly on a limit belongs to the lighter class
+    codes = np.searchsorted(WEIGHT_CLASS_LIMITS, weights, side='left')
+    return np.where(np.isnan(weights), -1, codes)
+
+
+def assign_weight_class(weight):
+    """
+    UFC weight class of a weight in lbs, or of every weight in an array or Series.
+
+    Missing weights get a missing class (None for a scalar).
+    """
+    if np.ndim(weight) == 0:
+        code = int(weight_class_codes(weight))
+        return None if code < 0 else WEIGHT_CLASSES[code]
+    labels = np.array(WEIGHT_CLASSES + [None], dtype=object)[weight_class_codes(weight)]
+    if isinstance(weight, pd.Series):
+        return pd.Series(labels, index=weight.index, dtype='str', name='fighter_weight_class')
+    return labels
+
+
+@traced
+def prepare_fighter_data(fighter_data):
+    fighter_data['fighter_weight_class'] = assign_weight_class(fighter_data['fighter_weight_lbs'])
+    return fighter_data
+
+
+def division_codes(fight_weight_class):
+    """Index into DIVISIONS for each fight, -1 for non-division bouts and missing values."""
+    divisions = pd.Index(DIVISIONS)
+    if isinstance(fight_weight_class.dtype, pd.CategoricalDtype):
+        # Look up the few categories and gather by code instead of hashing every row
+        lookup = np.append(divisions.get_indexer(fight_weight_class.cat.categories), -1)
+        return lookup[fight_weight_class.cat.codes.to_numpy()].astype(np.int64)
+    return divisions.get_indexer(np.asarray(fight_weight_class, dtype=object)).astype(np.int64)
+
+
+def _division_appearances(fight_data, index):
+    """(fighter_id, division code, date) per divisional fight appearance, in fight order per fighter."""
+    fighters = np.repeat(np.arange(len(index.indptr) - 1), np.diff(index.indptr))
+    division = division_codes(fight_data['weight_class'])[index.fight_row]
+    keep = division >= 0
+    return fighters[keep], division[keep], index.fight_date[keep]
+
+
+def _run_starts(*keys):
+    """Positions where any of the (sorted) key arrays changes value."""
+    change = np.zeros(len(keys[0]), dtype=bool)
+    change[:1] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    return np.flatnonzero(change)
+
+
+def _modal_division(group, division):
+    """
+    Per group (non-decreasing ids): the division with the most fights, ties to the most
+    recently fought; its fight count, the group's fight count and number of divisions.
+
+    Rows must be in fight order within a group (the join index adjacency order: date,
+    then fight), so the latest row position decides a tie, even between same-day bouts.
+    """
+    order = np.lexsort((division, group))
+    group, division = group[order], division[order]
+    pairs = _run_starts(group, division)
+    size = np.diff(np.append(pairs, len(group)))
+    last = np.maximum.reduceat(order, pairs) if len(pairs) else order[:0]
+    pair_group, pair_division = group[pairs], division[pairs]
+
+    groups = _run_starts(pair_group)
+    group_end = np.append(groups[1:], len(pair_group)) - 1
+    # Ascending by (group, size, last date): the modal division is each group's last pair
+    best = np.lexsort((last, size, pair_group))[group_end]
+    return pd.DataFrame({
+        'group': pair_group[groups],
+        'division': pair_division[best],
+        'division_fights': size[best],
+        'fights': np.add.reduceat(size, groups) if len(groups) else size[:0],
+        'divisions_fought': np.diff(np.append(groups, len(pair_group))),
+    })
+
+
+def _division_labels(codes):
+    # -1 (no division) becomes missing
+    return np.array(DIVISIONS + [None], dtype=object)[codes]
+
+
+@traced
+def fighter_divisions(fighter_data, fight_data, index):
+    """
+    Add each fighter's divisions from the fight weight classes.
+
+    Adds primary_division (most fights, ties to the most recent), last_division,
+    divisions_fought and division_source: 'fights', or 'weight' for fighters without a
+    divisional bout, whose primary and last division fall back to the weight class of
+    their listed weight.
+
+    Parameters:
+        fighter_data (pd.DataFrame): Fighter table with fighter_id and fighter_weight_lbs.
+        fight_data (pd.DataFrame): Fight table with weight_class, f_1 and f_2.
+        index (join_index.JoinIndex): Index built from the same tables.
+    """
+    fighters, division, date = _division_appearances(fight_data, index)
+    modal = _modal_division(fighters, division)
+    # Dense per-fighter_id codes; the adjacency is date-ordered per fighter, so the
+    # last entry of each fighter's run is the latest fight
+    size = len(index.indptr) - 1
+    primary, last, fought_in = np.full(size, -1), np.full(size, -1), np.zeros(size, dtype=np.int64)
+    primary[modal['group']] = modal['division']
+    fought_in[modal['group']] = modal['divisions_fought']
+    ends = np.append(_run_starts(fighters)[1:], len(fighters)) - 1
+    last[fighters[ends]] = division[ends]
+
+    fighter_data = fighter_data.copy()
+    ids = fighter_data['fighter_id'].to_numpy(dtype=np.int64)
+    known = (ids >= 0) & (ids < size)
+    rows = np.where(known, ids, 0)
+    fought = known & (primary[rows] >= 0)
+    by_weight = assign_weight_class(fighter_data['fighter_weight_lbs'].to_numpy())
+    for column, codes in [('primary_division', primary), ('last_division', last)]:
+        labels = np.where(fought, _division_labels(codes[rows]), by_weight)
+        fighter_data[column] = pd.Series(labels, index=fighter_data.index, dtype='str')
+    fighter_data['divisions_fought'] = np.where(known, fought_in[rows], 0)
+    fighter_data['division_source'] = np.where(fought, 'fights', 'weight')
+    return fighter_data
+
+
+@traced
+def division_history(fight_data, index, period='Y'):
+    """
+    Each fighter's division per period of their career.
+
+    Parameters:
+        period (str): numpy datetime unit of the periods, e.g. 'Y' (calendar years) or 'M'.
+
+    Returns:
+        pd.DataFrame: fighter_id, period (start date), division (most fights in the
+        period, ties to the most recent), division_fights, fights (divisional fights in
+        the period) and divisions_fought, sorted by fighter and period.
+    """
+    fighters, division, date = _division_appearances(fight_data, index)
+    known = ~np.isnat(date)
+    fighters, division, date = fighters[known], division[known], date[known]
+    periods = date.astype(f'datetime64[{period}]')
+    # Sorted by fighter then date, so each (fighter, period) is one contiguous run
+    starts = _run_starts(fighters, periods)
+    group = np.zeros(len(fighters), dtype=np.int64)
+    group[starts[1:]] = 1
+    group = np.cumsum(group)
+    history = _modal_division(group, division)
+    history.insert(0, 'fighter_id', fighters[starts][history['group']])
+    history.insert(1, 'period', periods[starts][history['group']].astype('datetime64[ns]'))
+    history['division'] = pd.Categorical.from_codes(history['division'], categories=DIVISIONS)
+    return history.drop(columns='group')
+
+
+def division_moves(history):
+    """Rows of division_history where the division differs from the fighter's previous period."""
+    division = history['division'].astype(object)
+    previous = division.groupby(history['fighter_id']).shift()
+    moved = previous.notna() & (division != previous)
+    return history[moved].assign(previous_division=previous[moved])
+
+
+def benchmark(fighter_data, repeat=5):
+    """Per-row if/elif .apply against the searchsorted bucketing; both must agree."""
+    def classify(weight):
+        for limit, name in zip(WEIGHT_CLASS_LIMITS, WEIGHT_CLASSES):
+            if weight <= limit:
+                return name
+        return None if np.isnan(weight) else WEIGHT_CLASSES[-1]
+
+    weights = fighter_data['fighter_weight_lbs']
+    timings = {}
+    for name, fn in [('apply', lambda: weights.apply(classify)), ('searchsorted', lambda: assign_weight_class(weights))]:
+        best = np.inf
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = fn()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = (best, result)
+    (apply_s, expected), (vector_s, actual) = timings['apply'], timings['searchsorted']
+    return {'rows': len(weights), 'apply_s': apply_s, 'searchsorted_s': vector_s,
+            'mismatches': int((expected.fillna('') != actual.fillna('')).sum())}
+
+
+def main():
+    from data_loader import load_tables
+    from join_index import load_join_index
+
+    parser = argparse.ArgumentParser(description="Weight classes from weights and divisions from fight history.")
+    parser.add_argument('--base-path', default='./data/')
+    parser.add_argument('--period', default='Y', help="numpy datetime unit of the division history periods")
+    args = parser.parse_args()
+
+    fight_data, fighter_data = load_tables(args.base_path, 'fight', 'fighter')
+    index = load_join_index(args.base_path)
+    result = benchmark(fighter_data)
+    print(f"Weight class of {result['rows']} fighters: apply {result['apply_s'] * 1000:.1f}ms, "
+          f"searchsorted {result['searchsorted_s'] * 1000:.2f}ms ({result['apply_s'] / result['searchsorted_s']:.0f}x), "
+          f"{result['mismatches']} mismatches")
+
+    start = time.perf_counter()
+    fighters = fighter_divisions(fighter_data, fight_data, index)
+    history = division_history(fight_data, index, args.period)
+    print(f"Divisions from fight history in {time.perf_counter() - start:.3f}s")
+    by_fights = fighters[fighters['division_source'] == 'fights']
+    by_weight = assign_weight_class(by_fights['fighter_weight_lbs'])
+    print(f"  {len(by_fights)} fighters with divisional fights, {(by_fights['divisions_fought'] > 1).sum()} in more than one; "
+          f"listed weight class differs from the primary division for {(by_weight != by_fights['primary_division']).sum()}")
+    print(f"  {len(division_moves(history))} period-to-period division moves")
+    print(fighters['primary_division'].value_counts(dropna=False).to_string())
+
+
+if __name__ == "__main__":
+    main()